@@ -0,0 +1,223 @@
+"""
+Copy-on-write import of a public anime into a user's collection
+
+An import copies the anime row and every character row in one transaction,
+in a constant number of queries however many characters the source has:
+a lock on the owner's user row, a re-read of the source and the
+duplicate check, one read of the source characters, one INSERT for the
+anime (with its statistics computed from those rows, see api.anime_stats)
+and one bulk INSERT per IMPORT_BATCH_SIZE characters. Images are shared
+with the source, not copied.
+
+Very large sources can be imported in the background instead: the request
+returns a job ID right away and the job's status is kept in
+CACHES['default'] until IMPORT_JOB_TIMEOUT. Background imports run on a
+thread pool inside the web process and are not durable: jobs queued or
+running when the process exits are lost. Each job records the process that
+owns it, and a process keeps a heartbeat in the cache while it is alive, so
+a job whose owner stopped beating is reported as failed instead of staying
+'pending' forever.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from game.models import Anime, Character
+from .anime_stats import compute_anime_stats
+from .catalog_cache import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 1000  # characters per bulk INSERT
+IMPORT_JOB_TIMEOUT = 60 * 60  # 1 hour
+IMPORT_JOB_KEY = 'anime_import_job:{}'
+IMPORT_WORKERS = 2  # background imports running at once per process
+IMPORT_HEARTBEAT_KEY = 'anime_import_worker:{}'
+IMPORT_HEARTBEAT_INTERVAL = 30  # seconds between heartbeats
+IMPORT_HEARTBEAT_TIMEOUT = 3 * IMPORT_HEARTBEAT_INTERVAL  # owner presumed gone after this
+
+IMPORT_EXECUTOR = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix='anime-import')
+WORKER_ID = uuid.uuid4().hex  # owner of the jobs queued on this process's IMPORT_EXECUTOR
+
+_heartbeat_lock = threading.Lock()
+_heartbeat_thread = None
+
+
+class ImportRejected(Exception):
+    """The import cannot be made; the message is safe to show the user"""
+
+
+class AlreadyImported(ImportRejected):
+    """The owner already has a copy of the source anime"""
+
+    def __init__(self):
+        super().__init__('You have already imported this anime')
+
+
+class SourceUnavailable(ImportRejected):
+    """The source anime is no longer public (or is now the owner's own)"""
+
+    def __init__(self):
+        super().__init__('This anime is no longer available for import')
+
+
+def is_already_imported(source_anime, owner):
+    """Whether owner already has a copy of source_anime (one query)"""
+    return Anime.objects.filter(
+        owner=owner,
+        name=source_anime.name,
+        original_creator_username=source_anime.owner.username
+    ).exists()
+
+
+def import_anime_copy(source_anime, owner):
+    """
+    Copy an anime and all its characters to owner's collection
+
+    The owner's user row is locked for the transaction, so concurrent
+    imports by the same user run one after the other and the duplicate
+    check cannot race (requests and background jobs alike). The source is
+    re-read under the same lock, so a job queued before the source was made
+    private does not copy it.
+
+    Returns:
+        The new, private Anime
+
+    Raises:
+        SourceUnavailable: source is no longer public, or is owner's own
+        AlreadyImported: owner already has a copy
+    """
+    with transaction.atomic():
+        User.objects.select_for_update().get(pk=owner.pk)
+        source_anime = (
+            Anime.objects.select_related('owner')
+            .filter(pk=source_anime.pk, owner__isnull=False, is_public=True)
+            .exclude(owner=owner)
+            .first()
+        )
+        if source_anime is None:
+            raise SourceUnavailable()
+        if is_already_imported(source_anime, owner):
+            raise AlreadyImported()
+
+        characters = list(
+            source_anime.characters.values_list('name', 'image', 'character_power', 'specialties')
+        )
+        new_anime = Anime.objects.create(
+            owner=owner,
+            name=source_anime.name,
+            image=source_anime.image,
+            anime_power_scale=source_anime.anime_power_scale,
+            is_public=False,  # Default to private
+            original_creator_username=source_anime.owner.username,
+            **compute_anime_stats(characters, source_anime.anime_power_scale),
+        )
+        # bulk_create skips the Character signals: the statistics are
+        # already set above, and the catalog is invalidated on commit
+        Character.objects.bulk_create([
+            Character(
+                owner=owner,
+                anime=new_anime,
+                name=name,
+                image=image,
+                character_power=character_power,
+                specialties=specialties,
+            )
+            for name, image, character_power, specialties in characters
+        ], batch_size=IMPORT_BATCH_SIZE)
+        transaction.on_commit(lambda: bump_catalog_version(owner.pk))
+
+    return new_anime
+
+
+def start_import_job(source_anime, owner):
+    """
+    Queue an import to run in the background
+
+    Returns:
+        Job ID for get_import_job()
+    """
+    start_heartbeat()
+    job_id = uuid.uuid4().hex
+    set_import_job(job_id, {
+        'status': 'pending', 'owner_id': owner.pk, 'anime_id': None, 'error': None, 'worker': WORKER_ID,
+    })
+    IMPORT_EXECUTOR.submit(run_import_job_in_worker, job_id, source_anime.pk, owner.pk)
+    return job_id
+
+
+def run_import_job(job_id, source_anime_id, owner_id):
+    """Run a queued import and record its outcome"""
+    job = {'status': 'running', 'owner_id': owner_id, 'anime_id': None, 'error': None, 'worker': WORKER_ID}
+    set_import_job(job_id, job)
+    try:
+        new_anime = import_anime_copy(Anime(pk=source_anime_id), User.objects.get(pk=owner_id))
+        job.update(status='completed', anime_id=new_anime.pk)
+    except ImportRejected as e:
+        job.update(status='failed', error=str(e))
+    except Exception as e:
+        logger.exception(f'Anime import job {job_id} failed: {e}')
+        job.update(status='failed', error='Import failed')
+    set_import_job(job_id, job)
+
+
+def run_import_job_in_worker(job_id, source_anime_id, owner_id):
+    try:
+        run_import_job(job_id, source_anime_id, owner_id)
+    finally:
+        # Worker threads are not request threads: close their connection
+        connection.close()
+
+
+def get_import_job(job_id):
+    """
+    Status dict of an import job, or None if unknown or expired
+
+    A 'pending' or 'running' job whose process has stopped its heartbeat
+    was lost with that process, and is marked failed.
+    """
+    job = cache.get(IMPORT_JOB_KEY.format(job_id))
+    if (job is not None and job['status'] in ('pending', 'running')
+            and cache.get(IMPORT_HEARTBEAT_KEY.format(job.get('worker'))) is None):
+        job.update(status='failed', error='Import was interrupted, please try again')
+        set_import_job(job_id, job)
+    return job
+
+
+def set_import_job(job_id, job):
+    cache.set(IMPORT_JOB_KEY.format(job_id), job, timeout=IMPORT_JOB_TIMEOUT)
+
+
+def start_heartbeat():
+    """
+    Start this process's heartbeat, if it is not running yet
+
+    The first beat is written before returning, so jobs queued right after
+    are never taken for lost.
+    """
+    global _heartbeat_thread
+    with _heartbeat_lock:
+        if _heartbeat_thread is not None and _heartbeat_thread.is_alive():
+            return
+        beat()
+        _heartbeat_thread = threading.Thread(target=run_heartbeat, name='anime-import-heartbeat', daemon=True)
+        _heartbeat_thread.start()
+
+
+def beat():
+    cache.set(IMPORT_HEARTBEAT_KEY.format(WORKER_ID), True, timeout=IMPORT_HEARTBEAT_TIMEOUT)
+
+
+def run_heartbeat():
+    while True:
+        time.sleep(IMPORT_HEARTBEAT_INTERVAL)
+        try:
+            beat()
+        except Exception as e:
+            logger.warning(f'Anime import heartbeat failed: {e}')
@@ -0,0 +1,219 @@
+"""
+Maintained character pool statistics on Anime
+
+Anime carries denormalized aggregates of its characters (see
+Anime.STATS_FIELDS) so the library, admin, publish check and pool rating
+read a plain column instead of counting or aggregating characters:
+
+- character_count / complete_character_count
+- min_draw_score / max_draw_score / draw_score_total (mean = total / count)
+
+A character save or delete applies its own contribution as an atomic F()
+delta, so concurrent edits never lose an update. Only the bounds can need a
+recompute: when the character that held the min or max is removed or
+moved inwards, one aggregate over that anime's characters restores them.
+A save passes the bounds it read with the character, so edits that leave
+the bounds alone skip the aggregate.
+
+Bulk paths (imports, APS changes) and drift repair use rebuild_anime_stats(),
+also exposed as `python manage.py rebuild_anime_stats`.
+"""
+from collections import namedtuple
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from django.db.models import Count, DecimalField, F, Max, Min, Q, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from game.models import Anime, Character
+from .catalog_cache import bump_catalog_version
+from .scoring import calculate_draw_score
+
+STATS_BATCH_SIZE = 500
+
+# Character fields a contribution depends on (plus the anime's APS)
+CONTRIBUTION_FIELDS = ('anime_id', 'name', 'image', 'character_power', 'specialties')
+
+Contribution = namedtuple('Contribution', ['complete', 'draw_score'])
+
+# An anime's stored min/max draw score and APS, read before a character change
+DrawScoreBounds = namedtuple('DrawScoreBounds', ['min_draw_score', 'max_draw_score', 'anime_power_scale'])
+
+
+def is_complete(name, image, character_power, specialties) -> bool:
+    """Same rule as the publish check: name, image, power and specialties filled"""
+    return bool(
+        name is not None
+        and image
+        and character_power is not None
+        and specialties
+    )
+
+
+def character_contribution(name, image, character_power, specialties, anime_power_scale) -> Contribution:
+    """What a single character adds to its anime's statistics"""
+    return Contribution(
+        complete=is_complete(name, image, character_power, specialties),
+        draw_score=calculate_draw_score(character_power, anime_power_scale),
+    )
+
+
+def _score_value(score: Decimal) -> Value:
+    return Value(score, output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def bounds_need_refresh(removed: Optional[Contribution], added: Optional[Contribution],
+                        bounds: Optional[DrawScoreBounds] = None) -> bool:
+    """
+    Whether the min/max draw score must be recomputed after a change
+
+    A bound can only shrink through a removal: when the removed score was
+    the min (max) and the added one, if any, is above (below) it. Without
+    the stored bounds any removal that changes the score counts.
+    """
+    if removed is None or (added is not None and added.draw_score == removed.draw_score):
+        return False
+    if bounds is None:
+        return True
+    score = removed.draw_score
+    return (
+        (score == bounds.min_draw_score and (added is None or added.draw_score > score))
+        or (score == bounds.max_draw_score and (added is None or added.draw_score < score))
+    )
+
+
+def apply_character_delta(anime_id, removed: Optional[Contribution], added: Optional[Contribution],
+                          bounds: Optional[DrawScoreBounds] = None):
+    """
+    Atomically apply one character's change to an anime's statistics
+
+    Args:
+        anime_id: Anime to update (None is ignored)
+        removed: The character's previous contribution, None if it is new here
+        added: The character's new contribution, None if it left this anime
+        bounds: The anime's bounds and APS as read before the change, if
+            known; spares the bounds recompute (and its APS read) when the
+            change cannot shrink them
+    """
+    if anime_id is None or (removed is None and added is None):
+        return
+
+    count_delta = (added is not None) - (removed is not None)
+    complete_delta = int(bool(added and added.complete)) - int(bool(removed and removed.complete))
+    total_delta = (added.draw_score if added else Decimal('0')) - (removed.draw_score if removed else Decimal('0'))
+
+    updates = {}
+    if count_delta:
+        updates['character_count'] = F('character_count') + count_delta
+    if complete_delta:
+        updates['complete_character_count'] = F('complete_character_count') + complete_delta
+    if total_delta:
+        updates['draw_score_total'] = F('draw_score_total') + total_delta
+    if added is not None:
+        score = _score_value(added.draw_score)
+        updates['min_draw_score'] = Least(Coalesce('min_draw_score', score), score)
+        updates['max_draw_score'] = Greatest(Coalesce('max_draw_score', score), score)
+
+    if updates:
+        Anime.objects.filter(pk=anime_id).update(**updates)
+
+    if bounds_need_refresh(removed, added, bounds):
+        refresh_draw_score_bounds(anime_id, bounds.anime_power_scale if bounds else None)
+
+
+def refresh_draw_score_bounds(anime_id, anime_power_scale=None):
+    """
+    Recompute min/max draw score of one anime with a single aggregate
+
+    Draw score is CP x APS with a shared APS, so the bounds follow from the
+    CP bounds (swapped for a negative APS); a null CP scores 0. The APS is
+    read from the anime unless given.
+    """
+    if anime_power_scale is None:
+        anime_power_scale = Anime.objects.filter(pk=anime_id).values_list('anime_power_scale', flat=True).first()
+    stats = Character.objects.filter(anime_id=anime_id).aggregate(
+        min_cp=Min('character_power'),
+        max_cp=Max('character_power'),
+        total=Count('id'),
+        without_cp=Count('id', filter=Q(character_power__isnull=True)),
+    )
+
+    if not stats['total']:
+        bounds = (None, None)
+    else:
+        scores = [
+            calculate_draw_score(cp, anime_power_scale)
+            for cp in (stats['min_cp'], stats['max_cp']) if cp is not None
+        ]
+        if stats['without_cp']:
+            scores.append(Decimal('0.00'))
+        bounds = (min(scores), max(scores))
+
+    Anime.objects.filter(pk=anime_id).update(min_draw_score=bounds[0], max_draw_score=bounds[1])
+
+
+def compute_anime_stats(character_rows, anime_power_scale) -> dict:
+    """
+    Statistics of one anime from its characters' (name, image, character_power, specialties)
+
+    Returns:
+        Dict with a value for every Anime.STATS_FIELDS entry
+    """
+    contributions = [
+        character_contribution(name, image, cp, specialties, anime_power_scale)
+        for name, image, cp, specialties in character_rows
+    ]
+    scores = [contribution.draw_score for contribution in contributions]
+
+    return {
+        'character_count': len(contributions),
+        'complete_character_count': sum(contribution.complete for contribution in contributions),
+        'min_draw_score': min(scores) if scores else None,
+        'max_draw_score': max(scores) if scores else None,
+        'draw_score_total': sum(scores, Decimal('0.00')),
+    }
+
+
+def rebuild_anime_stats(anime_ids: Optional[Iterable[int]] = None, dry_run: bool = False) -> int:
+    """
+    Recompute statistics from scratch, in batches of STATS_BATCH_SIZE anime
+
+    Args:
+        anime_ids: Anime to rebuild (default: all)
+        dry_run: Only count drifted anime, do not write
+
+    Returns:
+        Number of anime whose stored statistics were out of date
+    """
+    queryset = Anime.objects.order_by('pk')
+    if anime_ids is not None:
+        queryset = queryset.filter(pk__in=list(anime_ids))
+
+    drifted = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_pk)
+            .only('pk', 'owner', 'anime_power_scale', *Anime.STATS_FIELDS)[:STATS_BATCH_SIZE]
+        )
+        if not batch:
+            return drifted
+        last_pk = batch[-1].pk
+
+        rows_by_anime = {anime.pk: [] for anime in batch}
+        for anime_id, *row in Character.objects.filter(anime_id__in=rows_by_anime).values_list(*CONTRIBUTION_FIELDS):
+            rows_by_anime[anime_id].append(row)
+
+        changed = []
+        for anime in batch:
+            stats = compute_anime_stats(rows_by_anime[anime.pk], anime.anime_power_scale)
+            if any(getattr(anime, field) != value for field, value in stats.items()):
+                for field, value in stats.items():
+                    setattr(anime, field, value)
+                changed.append(anime)
+
+        drifted += len(changed)
+        if changed and not dry_run:
+            Anime.objects.bulk_update(changed, Anime.STATS_FIELDS)
+            for owner_id in {anime.owner_id for anime in changed}:
+                bump_catalog_version(owner_id)
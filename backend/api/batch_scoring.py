@@ -0,0 +1,243 @@
+"""
+Batch scoring engine for AniFight
+
+Scores many matches at once (replays, simulations, leaderboard recomputes)
+using NumPy integer fixed-point arithmetic instead of one Decimal per role.
+
+All inputs are held as int64 hundredths (CP, APS and the specialty
+multiplier all have 2 decimal places), so for one role:
+
+    cp_h * aps_h * mult_h = role_score * 10^6
+
+and the role score in hundredths is that product divided by 10^4, rounded
+half away from zero. This is exactly what Decimal ROUND_HALF_UP does, so
+results are bit-identical to api.scoring.calculate_match_result.
+
+Overflow bound: 999999 * 999999 * 9999 < 10^16, well inside int64.
+"""
+
+from decimal import Decimal
+from typing import Any, Dict, List
+
+import numpy as np
+
+from .scoring import check_specialty_match
+
+NO_MATCH_MULTIPLIER = 100  # 1.00 in hundredths
+SCALE = 10_000  # hundredths^3 -> hundredths
+HALF_SCALE = SCALE // 2
+
+
+def to_hundredths(value) -> int:
+    """
+    Convert a 2-decimal value (Decimal, str, int, float) into integer hundredths
+
+    Null is treated as 0. Values that are not exact to 2 decimal places are
+    rejected, since the fixed-point engine could not reproduce them.
+    """
+    if value is None:
+        return 0
+
+    scaled = Decimal(str(value)).scaleb(2)
+    if scaled != scaled.to_integral_value():
+        raise ValueError(f'{value!r} has more than 2 decimal places')
+    return int(scaled)
+
+
+def from_hundredths(value: int) -> Decimal:
+    """Convert integer hundredths back into a 2-decimal Decimal"""
+    return Decimal(int(value)).scaleb(-2)
+
+
+def role_scores_hundredths(cp, aps, multiplier) -> np.ndarray:
+    """
+    Vectorized role score: round(cp * aps * multiplier, 2) in hundredths
+
+    Args:
+        cp, aps, multiplier: int64 arrays (or scalars) of hundredths
+
+    Returns:
+        int64 array of role scores in hundredths, ROUND_HALF_UP
+    """
+    product = (
+        np.asarray(cp, dtype=np.int64)
+        * np.asarray(aps, dtype=np.int64)
+        * np.asarray(multiplier, dtype=np.int64)
+    )
+    magnitude = (np.abs(product) + HALF_SCALE) // SCALE
+    return np.where(product < 0, -magnitude, magnitude)
+
+
+def team_totals_hundredths(role_scores, team_sizes) -> np.ndarray:
+    """
+    Sum consecutive runs of role scores into team totals
+
+    Args:
+        role_scores: int64 array of role scores, grouped team by team
+        team_sizes: Number of role slots of each team (may be 0)
+
+    Returns:
+        int64 array with one total per team
+    """
+    boundaries = np.concatenate(([0], np.cumsum(team_sizes, dtype=np.int64)))
+    running = np.concatenate(([0], np.cumsum(role_scores, dtype=np.int64)))
+    return running[boundaries[1:]] - running[boundaries[:-1]]
+
+
+def winners_from_totals(left_totals, right_totals) -> List[str]:
+    """Map team totals onto 'left' / 'right' / 'draw'"""
+    comparison = np.sign(np.asarray(left_totals) - np.asarray(right_totals))
+    labels = {1: 'left', -1: 'right', 0: 'draw'}
+    return [labels[int(c)] for c in comparison]
+
+
+class CharacterTable:
+    """
+    Column-oriented view of characters_data
+
+    Maps character IDs onto row indexes of int64 CP / APS arrays and
+    memoizes specialty matches per (character, role) pair, so each pair is
+    checked once per batch no matter how many slots use it.
+    """
+
+    def __init__(self, characters_data: Dict[int, Dict[str, Any]]):
+        self.characters_data = characters_data
+        # Row 0 is the "missing character" row (all values null -> 0)
+        self.rows = {character_id: row for row, character_id in enumerate(characters_data, start=1)}
+        self.cp = np.zeros(len(self.rows) + 1, dtype=np.int64)
+        self.aps = np.zeros(len(self.rows) + 1, dtype=np.int64)
+
+        for character_id, row in self.rows.items():
+            character = characters_data[character_id]
+            self.cp[row] = to_hundredths(character.get('character_power'))
+            self.aps[row] = to_hundredths(character.get('anime_power_scale'))
+
+        self._matches = {}
+
+    def row(self, character_id) -> int:
+        return self.rows.get(character_id, 0)
+
+    def specialty_match(self, character_id, role: str) -> bool:
+        key = (character_id, role)
+        match = self._matches.get(key)
+        if match is None:
+            specialties = self.characters_data.get(character_id, {}).get('specialties', [])
+            match = self._matches[key] = check_specialty_match(specialties, role)
+        return match
+
+
+def calculate_match_results_batch(
+    matches: List[Dict[str, Any]],
+    templates_data: Dict[int, Dict[str, Any]],
+    characters_data: Dict[int, Dict[str, Any]],
+    include_breakdown: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Score N matches in one vectorized pass
+
+    Args:
+        matches: List of {'template_id', 'left', 'right'} where left/right are
+            lists of {role, characterId} assignments
+        templates_data: Dict mapping template IDs to template data
+            (specialty_match_multiplier, roles_json)
+        characters_data: Dict mapping character IDs to character data
+        include_breakdown: Build the per-role breakdown dicts. Disable for
+            simulations and recomputes that only need totals and winners.
+
+    Returns:
+        One result per match, in order, shaped like calculate_match_result.
+        Without breakdown, each team is just {'total': Decimal}.
+    """
+    table = CharacterTable(characters_data)
+    multipliers = {
+        template_id: to_hundredths(template.get('specialty_match_multiplier', '1.20'))
+        for template_id, template in templates_data.items()
+    }
+
+    # Flatten every role slot of every team into parallel arrays
+    slot_rows = []
+    slot_multipliers = []
+    slot_matches = []
+    team_sizes = []  # slots per team, left then right for every match
+
+    for match in matches:
+        template_multiplier = multipliers[match['template_id']]
+        for team_key in ('left', 'right'):
+            team_sizes.append(len(match[team_key]))
+            for assignment in match[team_key]:
+                character_id = assignment.get('characterId')
+                specialty_match = table.specialty_match(character_id, assignment.get('role', ''))
+                slot_rows.append(table.row(character_id))
+                slot_matches.append(specialty_match)
+                slot_multipliers.append(template_multiplier if specialty_match else NO_MATCH_MULTIPLIER)
+
+    slot_rows = np.asarray(slot_rows, dtype=np.int64)
+    slot_multipliers = np.asarray(slot_multipliers, dtype=np.int64)
+
+    role_scores = role_scores_hundredths(table.cp[slot_rows], table.aps[slot_rows], slot_multipliers)
+    team_totals = team_totals_hundredths(role_scores, team_sizes)
+
+    left_totals = team_totals[0::2]
+    right_totals = team_totals[1::2]
+    winners = winners_from_totals(left_totals, right_totals)
+
+    results = []
+    slot = 0
+    for match_index, match in enumerate(matches):
+        teams = {}
+        for side, team_key in enumerate(('left', 'right')):
+            assignments = match[team_key]
+            team = {}
+            if include_breakdown:
+                end = slot + len(assignments)
+                team['breakdown'] = _build_breakdown(
+                    assignments,
+                    characters_data,
+                    slot_matches[slot:end],
+                    slot_multipliers[slot:end],
+                    role_scores[slot:end],
+                )
+            team['total'] = from_hundredths(team_totals[match_index * 2 + side])
+            slot += len(assignments)
+            teams[team_key] = team
+
+        results.append({
+            'leftTeam': teams['left'],
+            'rightTeam': teams['right'],
+            'winner': winners[match_index],
+        })
+
+    return results
+
+
+def _build_breakdown(
+    assignments: List[Dict[str, Any]],
+    characters_data: Dict[int, Dict[str, Any]],
+    specialty_matches: List[bool],
+    multipliers: np.ndarray,
+    role_scores: np.ndarray
+) -> List[Dict[str, Any]]:
+    """Per-role breakdown entries, identical to calculate_team_score's"""
+    breakdown = []
+    for assignment, specialty_match, multiplier, role_score in zip(
+        assignments, specialty_matches, multipliers.tolist(), role_scores.tolist()
+    ):
+        character_id = assignment.get('characterId')
+        character = characters_data.get(character_id, {})
+        cp = character.get('character_power')
+        aps = character.get('anime_power_scale')
+
+        breakdown.append({
+            'role': assignment.get('role', ''),
+            'character_id': character_id,
+            'character_name': character.get('name', ''),
+            'character_image': character.get('image'),
+            'anime_name': character.get('anime', {}).get('name') if character.get('anime') else None,
+            'anime_power_scale': aps if aps is not None else Decimal('0'),
+            'character_power': cp if cp is not None else Decimal('0'),
+            'specialties': character.get('specialties', []),
+            'specialty_match': specialty_match,
+            'specialty_multiplier': from_hundredths(multiplier),
+            'role_score': from_hundredths(role_score),
+        })
+    return breakdown
@@ -0,0 +1,37 @@
+"""
+Version counters for invalidating derived data in CACHES['default']
+
+Cached values embed the versions they were built from in their cache key,
+so bumping a version makes old entries unreachable and they expire on
+their own. Used by the draw pool index and the catalog response cache.
+"""
+import time
+from typing import List
+
+from django.core.cache import cache
+
+
+def get_cache_versions(keys: List[str]) -> List[int]:
+    """
+    Get the current value of every version key (one cache round trip)
+
+    Missing versions are initialised to a time-based value rather than 0,
+    so an evicted counter can never roll back onto a stale cached entry.
+    """
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+
+    return [versions[key] for key in keys]
+
+
+def bump_cache_version(key: str):
+    """Invalidate every cached entry built against this version key"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No version yet: nothing can be cached against it
+        cache.add(key, time.time_ns(), timeout=None)
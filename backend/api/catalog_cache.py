@@ -0,0 +1,138 @@
+"""
+Versioned, ETag-aware response cache for the gameplay catalog endpoints
+
+GET /api/templates/, /api/anime/ and /api/characters/ return the same admin
+catalog (plus the user's own content) to every visitor. Their serialized
+data is cached in CACHES['default'] keyed by:
+
+- endpoint, anime_ids filter and page (limit and cursor)
+- visibility scope: the admin catalog, plus the user's own content when
+  authenticated
+- the content version of every owner in that scope
+
+A content version is bumped (see api.signals) whenever an Anime, Character,
+GameTemplate or rating of that owner is written, so a write simply makes
+old entries unreachable. Each entry carries an ETag, and a matching
+If-None-Match is answered with 304 Not Modified.
+
+An anonymous hit reads two cache keys and never touches the database.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache_versions import bump_cache_version, get_cache_versions
+
+CATALOG_CACHE_TIMEOUT = 60 * 60  # 1 hour
+CATALOG_VERSION_KEY = 'catalog_version:{}'
+CATALOG_CACHE_KEY = 'catalog:{}'
+ADMIN_SCOPE = 'admin'
+
+
+def owner_scope(owner_id):
+    """Version scope of content owned by owner_id (None = admin content)"""
+    return ADMIN_SCOPE if owner_id is None else str(owner_id)
+
+
+def bump_catalog_version(owner_id):
+    """Invalidate every cached catalog response containing this owner's content"""
+    bump_cache_version(CATALOG_VERSION_KEY.format(owner_scope(owner_id)))
+
+
+def request_scopes(request):
+    """Owners whose content the request can see in the gameplay catalog"""
+    scopes = [ADMIN_SCOPE]
+    if request.user and request.user.is_authenticated:
+        scopes.append(str(request.user.pk))
+    return scopes
+
+
+def normalize_anime_ids(raw):
+    """
+    Canonical form of the anime_ids query parameter for the cache key
+
+    Raises:
+        ValueError: on a malformed list (the view reports the error)
+    """
+    if not raw:
+        return ''
+    anime_ids = sorted({int(id_str.strip()) for id_str in raw.split(',') if id_str.strip()})
+    return ','.join(str(anime_id) for anime_id in anime_ids)
+
+
+def catalog_cache_key(request, endpoint, anime_ids):
+    scopes = request_scopes(request)
+    versions = get_cache_versions([CATALOG_VERSION_KEY.format(scope) for scope in scopes])
+    # Image URLs are absolute, so the host is part of the response
+    raw = '|'.join([
+        endpoint,
+        request.scheme,
+        request.get_host(),
+        anime_ids,
+        # A page (see api.pagination) is cached separately from the full list
+        request.query_params.get('limit', '-'),
+        request.query_params.get('cursor', '-'),
+        ','.join(f'{scope}:{version}' for scope, version in zip(scopes, versions)),
+    ])
+    return CATALOG_CACHE_KEY.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def compute_etag(data):
+    payload = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return '"{}"'.format(hashlib.md5(payload.encode()).hexdigest())
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    # Weak comparison, as for GET conditional requests
+    candidates = {tag.removeprefix('W/') for tag in parse_etags(header)}
+    return '*' in candidates or etag in candidates
+
+
+def catalog_cached(endpoint):
+    """
+    Serve a catalog view from the versioned cache, with ETag / 304 support
+
+    Place below @api_view. Only 200 responses are cached; a malformed
+    anime_ids parameter bypasses the cache so the view can report it.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                anime_ids = normalize_anime_ids(request.query_params.get('anime_ids'))
+            except ValueError:
+                return view(request, *args, **kwargs)
+
+            cache_key = catalog_cache_key(request, endpoint, anime_ids)
+            entry = cache.get(cache_key)
+
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                data = dict(response.data) if isinstance(response.data, dict) else list(response.data)
+                entry = {'data': data, 'etag': compute_etag(data)}
+                cache.set(cache_key, entry, timeout=CATALOG_CACHE_TIMEOUT)
+
+            if etag_matches(request, entry['etag']):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = Response(entry['data'])
+
+            response['ETag'] = entry['etag']
+            response['Cache-Control'] = 'no-cache'
+            patch_vary_headers(response, ['Authorization'])
+            return response
+
+        return wrapper
+    return decorator
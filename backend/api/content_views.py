@@ -9,6 +9,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 
 from game.models import Anime, Character, GameTemplate, AnimeRating
 from .serializers import (
@@ -23,6 +24,11 @@ from .serializers import (
     AnimeRatingSerializer,
     MyAnimeRatingSerializer,
 )
+from .anime_import import (
+    AlreadyImported, ImportRejected, get_import_job, import_anime_copy, is_already_imported, start_import_job
+)
+from .library_search import search_anime, search_terms
+from .pagination import keyset_page_response, wants_page
 from .permissions import IsOwnerOrReadOnly
 
 
@@ -91,11 +97,14 @@ def my_template_detail(request, pk):
 @parser_classes([MultiPartParser, FormParser, JSONParser])
 def my_anime_list(request):
     """
-    GET: List all anime owned by current user
+    GET: List all anime owned by current user; by name, one page at a time,
+         if limit or cursor is given
     POST: Create a new anime
     """
     if request.method == 'GET':
-        anime = Anime.objects.filter(owner=request.user)
+        anime = Anime.objects.select_related('owner').filter(owner=request.user)
+        if wants_page(request):
+            return keyset_page_response(request, anime, ['name', 'id'], AnimeSerializer)
         serializer = AnimeSerializer(anime, many=True, context={'request': request})
         return Response(serializer.data)
 
@@ -131,14 +140,8 @@ def my_anime_detail(request, pk):
     elif request.method == 'PUT':
         # If trying to make anime public, validate character requirements
         if request.data.get('is_public') == 'true' or request.data.get('is_public') is True:
-            # Get all characters for this anime with complete fields
-            complete_characters = anime.characters.filter(
-                name__isnull=False,
-                image__isnull=False,
-                character_power__isnull=False
-            ).exclude(image='').exclude(specialties=[])
-
-            complete_count = complete_characters.count()
+            # Characters with all fields filled (maintained on Anime, see api.anime_stats)
+            complete_count = anime.complete_character_count
 
             # Check if anime was imported
             if anime.original_creator_username:
@@ -187,13 +190,16 @@ def my_anime_detail(request, pk):
 @parser_classes([MultiPartParser, FormParser, JSONParser])
 def my_anime_characters(request, anime_id):
     """
-    GET: List all characters for user's anime
+    GET: List all characters for user's anime; by name, one page at a
+         time, if limit or cursor is given
     POST: Add a new character to user's anime
     """
     anime = get_object_or_404(Anime, pk=anime_id, owner=request.user)
 
     if request.method == 'GET':
-        characters = anime.characters.all()
+        characters = anime.characters.select_related('anime__owner')
+        if wants_page(request):
+            return keyset_page_response(request, characters, ['name', 'id'], CharacterListSerializer)
         serializer = CharacterListSerializer(characters, many=True, context={'request': request})
         return Response(serializer.data)
 
@@ -246,10 +252,13 @@ def import_anime(request, pk):
     """
     POST: Import a public anime to user's collection
     Creates a copy of the anime with all its characters
+    Query params:
+      - async: 'true' to import in the background; returns 202 with a job_id
+        to poll at /api/my/anime/import/jobs/<job_id>/
     """
     # Get the source anime (must be public and not owned by current user)
     source_anime = get_object_or_404(
-        Anime.objects.filter(Q(owner__isnull=False) & Q(is_public=True)),
+        Anime.objects.select_related('owner').filter(Q(owner__isnull=False) & Q(is_public=True)),
         pk=pk
     )
 
@@ -260,50 +269,53 @@ def import_anime(request, pk):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Check if user already has this anime imported
-    existing_import = Anime.objects.filter(
-        owner=request.user,
-        name=source_anime.name,
-        original_creator_username=source_anime.owner.username
-    ).first()
-
-    if existing_import:
+    # Check if user already has this anime imported (checked again, under
+    # a lock, when the copy is made)
+    if is_already_imported(source_anime, request.user):
         return Response(
-            {'detail': 'You have already imported this anime'},
+            {'detail': str(AlreadyImported())},
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # Create a copy of the anime
-    new_anime = Anime.objects.create(
-        owner=request.user,
-        name=source_anime.name,
-        anime_power_scale=source_anime.anime_power_scale,
-        is_public=False,  # Default to private
-        original_creator_username=source_anime.owner.username
-    )
+    if request.query_params.get('async', '').lower() in ('1', 'true'):
+        job_id = start_import_job(source_anime, request.user)
+        return Response({
+            'job_id': job_id,
+            'status': 'pending',
+            'status_url': request.build_absolute_uri(reverse('api:import_anime_job', args=[job_id])),
+        }, status=status.HTTP_202_ACCEPTED)
 
-    # Copy the image if it exists
-    if source_anime.image:
-        new_anime.image = source_anime.image
-        new_anime.save()
-
-    # Copy all characters
-    source_characters = source_anime.characters.all()
-    for char in source_characters:
-        Character.objects.create(
-            owner=request.user,
-            anime=new_anime,
-            name=char.name,
-            character_power=char.character_power,
-            specialties=char.specialties,
-            image=char.image
-        )
+    # Copy the anime and all its characters in one transaction
+    try:
+        new_anime = import_anime_copy(source_anime, request.user)
+    except ImportRejected as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     # Return the new anime
     serializer = AnimeSerializer(new_anime, context={'request': request})
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def import_anime_job(request, job_id):
+    """
+    GET: Status of a background import
+    Returns status ('pending', 'running', 'completed' or 'failed'), plus the
+    new anime once completed
+    """
+    job = get_import_job(job_id)
+    if job is None or job['owner_id'] != request.user.pk:
+        return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    data = {'job_id': job_id, 'status': job['status'], 'error': job['error'], 'anime': None}
+    if job['status'] == 'completed':
+        new_anime = Anime.objects.filter(pk=job['anime_id'], owner=request.user).first()
+        if new_anime is not None:
+            data['anime'] = AnimeSerializer(new_anime, context={'request': request}).data
+    return Response(data)
+
+
 # ============================================
 # PUBLIC LIBRARY (/api/library/anime/)
 # ============================================
@@ -314,25 +326,51 @@ def library_anime_list(request):
     GET: List all public anime (admin + user public)
     Query params:
       - sort: 'newest', 'highest_rated', 'most_rated' (default: newest)
+      - limit: page size (default: 20, max: 100)
+      - cursor: next_cursor of the previous page
+    With limit or cursor the response is one page,
+    {"results": [...], "next_cursor": "..." or null}; otherwise the full list.
     """
     # Filter: admin anime (owner=null) OR public user anime
-    anime = Anime.objects.filter(
+    anime = Anime.objects.select_related('owner').filter(
         Q(owner__isnull=True) | Q(is_public=True)
     )
 
-    # Sorting
+    # Sorting (id last, so every row has a unique position for the cursor)
     sort_by = request.query_params.get('sort', 'newest')
     if sort_by == 'highest_rated':
-        anime = anime.order_by('-average_rating', '-created_at')
+        ordering = ['-average_rating', '-created_at', '-id']
     elif sort_by == 'most_rated':
-        anime = anime.order_by('-total_ratings', '-created_at')
+        ordering = ['-total_ratings', '-created_at', '-id']
     else:  # newest (default)
-        anime = anime.order_by('-created_at')
+        ordering = ['-created_at', '-id']
 
-    serializer = AnimeLibrarySerializer(anime, many=True, context={'request': request})
+    if wants_page(request):
+        return keyset_page_response(request, anime, ordering, AnimeLibrarySerializer)
+    serializer = AnimeLibrarySerializer(anime.order_by(*ordering), many=True, context={'request': request})
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+def library_search(request):
+    """
+    GET: Search public anime by anime or character name, best match first
+    Query params:
+      - q: search text (prefix and typo tolerant)
+      - limit: page size (default: 20, max: 100)
+      - cursor: next_cursor of the previous page
+    """
+    query = request.query_params.get('q', '')
+    if not search_terms(query):
+        return Response({'detail': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    anime = search_anime(
+        Anime.objects.select_related('owner').filter(Q(owner__isnull=True) | Q(is_public=True)),
+        query
+    )
+    return keyset_page_response(request, anime, ['-relevance', '-id'], AnimeLibrarySerializer)
+
+
 @api_view(['GET'])
 def library_anime_detail(request, pk):
     """
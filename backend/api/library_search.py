@@ -0,0 +1,110 @@
+"""
+Search over the public library's anime and character names
+
+On PostgreSQL matching is index backed (see game migration 0010):
+
+- pg_trgm word similarity (`<%`) on anime and character names, through GIN
+  trigram indexes: typo tolerant and matches prefixes of words
+- a 'simple' tsvector GIN index on anime names, queried with a prefix
+  tsquery ('one pi' matches 'One Piece')
+
+An anime matches if its own name does or one of its characters' does.
+Relevance is the best word similarity, with character matches weighted
+down, so the cost of a page depends on the matches, not the library size.
+
+Other databases (SQLite in tests) fall back to case-insensitive substring
+matching with a coarse relevance: name prefix > name substring >
+character name.
+"""
+import re
+
+from django.db import connection
+from django.db.models import (
+    BooleanField, Case, Exists, F, FloatField, Func, OuterRef, Q, Subquery, Value, When,
+)
+from django.db.models.functions import Coalesce, Greatest
+
+from game.models import Character
+
+CHARACTER_MATCH_WEIGHT = 0.8  # a character match ranks below an equally good anime name match
+MAX_QUERY_LENGTH = 100
+
+
+class WordSimilar(Func):
+    """`query <% field`: query is word-similar to part of field (GIN trigram indexable)"""
+    arg_joiner = ' <%% '
+    template = '%(expressions)s'
+    output_field = BooleanField()
+
+
+class WordSimilarity(Func):
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+
+class PrefixMatch(Func):
+    """Every word of the tsquery prefix-matches the 'simple' tsvector of field"""
+    template = "to_tsvector('simple'::regconfig, %(expressions)s) @@ to_tsquery('simple'::regconfig, %%s)"
+    output_field = BooleanField()
+
+    def __init__(self, field, tsquery):
+        super().__init__(field)
+        self.tsquery = tsquery
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = super().as_sql(compiler, connection, **extra_context)
+        return sql, (*params, self.tsquery)
+
+
+def search_terms(query):
+    """Words of a search query, or [] if it has none"""
+    return re.findall(r'\w+', query[:MAX_QUERY_LENGTH].lower())
+
+
+def search_anime(queryset, query):
+    """
+    Anime of `queryset` whose name or a character's name matches `query`
+
+    Returns:
+        `queryset` filtered and annotated with a float `relevance`
+    """
+    terms = search_terms(query)
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(queryset, ' '.join(terms), terms)
+    return _search_fallback(queryset, ' '.join(terms), terms)
+
+
+def _search_postgresql(queryset, text, terms):
+    characters = Character.objects.filter(WordSimilar(Value(text), F('name')))
+    best_character = (
+        characters.filter(anime=OuterRef('pk'))
+        .annotate(similarity=WordSimilarity(Value(text), F('name')))
+        .order_by('-similarity')
+        .values('similarity')[:1]
+    )
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+
+    return queryset.filter(
+        Q(WordSimilar(Value(text), F('name')))
+        | Q(PrefixMatch(F('name'), tsquery))
+        | Q(pk__in=characters.values('anime_id'))
+    ).annotate(relevance=Greatest(
+        WordSimilarity(Value(text), F('name')),
+        Coalesce(Subquery(best_character, output_field=FloatField()), Value(0.0)) * CHARACTER_MATCH_WEIGHT,
+    ))
+
+
+def _search_fallback(queryset, text, terms):
+    name_match = Q()
+    character_match = Q()
+    for term in terms:
+        name_match &= Q(name__icontains=term)
+        character_match &= Q(name__icontains=term)
+    has_character = Exists(Character.objects.filter(character_match, anime=OuterRef('pk')))
+
+    return queryset.filter(name_match | Q(has_character)).annotate(relevance=Case(
+        When(name__istartswith=text, then=Value(1.0)),
+        When(name_match, then=Value(0.75)),
+        default=Value(0.5),
+        output_field=FloatField(),
+    ))
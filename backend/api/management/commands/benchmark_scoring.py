@@ -0,0 +1,117 @@
+"""
+Management command to benchmark the scoring engines
+Usage: python manage.py benchmark_scoring --matches 100000
+"""
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from api.batch_scoring import calculate_match_results_batch
+from api.scoring import calculate_match_result
+
+ROLES = ["CAPTAIN", "VICE CAPTAIN", "TANK", "HEALER", "SUPPORT", "SUPPORT"]
+
+
+class Command(BaseCommand):
+    help = 'Compare single-core throughput of the Decimal and NumPy batch scoring engines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--matches',
+            type=int,
+            default=100000,
+            help='Number of matches to score (default: 100000)',
+        )
+        parser.add_argument(
+            '--characters',
+            type=int,
+            default=2000,
+            help='Size of the synthetic character pool (default: 2000)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for the synthetic data (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        match_count = options['matches']
+        characters_data, templates_data, matches = self.build_data(rng, options['characters'], match_count)
+
+        self.stdout.write(f'Scoring {match_count} matches ({len(ROLES)} roles per team) on one core...')
+
+        start = time.perf_counter()
+        expected = [
+            calculate_match_result(
+                match['template_id'], match['left'], match['right'],
+                templates_data[match['template_id']], characters_data
+            )
+            for match in matches
+        ]
+        decimal_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with_breakdown = calculate_match_results_batch(matches, templates_data, characters_data)
+        breakdown_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        totals_only = calculate_match_results_batch(
+            matches, templates_data, characters_data, include_breakdown=False
+        )
+        totals_seconds = time.perf_counter() - start
+
+        for label, seconds in [
+            ('Decimal engine', decimal_seconds),
+            ('NumPy batch (with breakdown)', breakdown_seconds),
+            ('NumPy batch (totals only)', totals_seconds),
+        ]:
+            self.stdout.write(
+                f'  {label:<30} {seconds:8.3f}s  {match_count / seconds:12,.0f} matches/s/core'
+            )
+
+        identical = with_breakdown == expected and all(
+            fast['winner'] == slow['winner'] and fast['leftTeam']['total'] == slow['leftTeam']['total']
+            for fast, slow in zip(totals_only, expected)
+        )
+        if identical:
+            self.stdout.write(self.style.SUCCESS('✓ Results are identical across engines'))
+        else:
+            self.stdout.write(self.style.ERROR('✗ Results differ between engines'))
+
+    def build_data(self, rng, character_count, match_count):
+        """Synthetic pool, templates and random 6v6 matches"""
+        def hundredths(low, high):
+            return Decimal(rng.randint(low * 100, high * 100)).scaleb(-2)
+
+        characters_data = {
+            character_id: {
+                'id': character_id,
+                'name': f'Character {character_id}',
+                'image': None,
+                'anime': None,
+                'anime_power_scale': hundredths(1, 10),
+                'character_power': hundredths(1, 100),
+                'specialties': rng.sample(ROLES[:5], rng.randint(0, 2)),
+            }
+            for character_id in range(1, character_count + 1)
+        }
+
+        templates_data = {
+            1: {'specialty_match_multiplier': Decimal('1.20'), 'roles_json': ROLES},
+            2: {'specialty_match_multiplier': Decimal('1.50'), 'roles_json': ROLES},
+        }
+
+        matches = []
+        for _ in range(match_count):
+            ids = rng.sample(range(1, character_count + 1), len(ROLES) * 2)
+            matches.append({
+                'template_id': rng.choice((1, 2)),
+                'left': [{'role': role, 'characterId': c} for role, c in zip(ROLES, ids[:6])],
+                'right': [{'role': role, 'characterId': c} for role, c in zip(ROLES, ids[6:])],
+            })
+
+        return characters_data, templates_data, matches
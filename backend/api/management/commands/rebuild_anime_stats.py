@@ -0,0 +1,39 @@
+"""
+Management command to repair drift in the maintained Anime statistics
+Usage: python manage.py rebuild_anime_stats [--anime-ids 1,2,3] [--dry-run]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from api.anime_stats import rebuild_anime_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute character counts and draw score statistics of anime from their characters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--anime-ids',
+            type=str,
+            default='',
+            help='Comma-separated anime IDs to rebuild (default: all anime)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many anime have drifted, without writing',
+        )
+
+    def handle(self, *args, **options):
+        anime_ids = None
+        if options['anime_ids']:
+            try:
+                anime_ids = [int(anime_id) for anime_id in options['anime_ids'].split(',') if anime_id.strip()]
+            except ValueError:
+                raise CommandError('Invalid --anime-ids format. Expected comma-separated integers.')
+
+        drifted = rebuild_anime_stats(anime_ids, dry_run=options['dry_run'])
+
+        if options['dry_run']:
+            self.stdout.write(f'{drifted} anime have out-of-date statistics')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt statistics, {drifted} anime corrected'))
@@ -0,0 +1,161 @@
+"""
+Management command to balance-test a template with Monte Carlo drafts
+Usage: python manage.py simulate_template 1 --anime-ids 1,2,3 --matches 1000000
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from game.models import Anime, Character, GameTemplate
+from api.batch_scoring import to_hundredths
+from api.scoring import PoolScoreIndex, calculate_draw_score, check_specialty_match
+from api.simulation import TIERS, DraftSimulation, simulate_chunk, summarize
+
+
+class Command(BaseCommand):
+    help = 'Simulate random drafts of a template against an anime pool and report balance statistics'
+
+    def add_arguments(self, parser):
+        parser.add_argument('template_id', type=int, help='ID of the GameTemplate to simulate')
+        parser.add_argument(
+            '--anime-ids',
+            type=str,
+            default='',
+            help='Comma-separated anime IDs making up the pool (default: all admin anime)',
+        )
+        parser.add_argument(
+            '--matches',
+            type=int,
+            default=1000000,
+            help='Number of matches to simulate (default: 1000000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes (default: all cores)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=50000,
+            help='Matches per vectorized chunk (default: 50000)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=None,
+            help='Random seed for reproducible runs',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            template = GameTemplate.objects.get(id=options['template_id'])
+        except GameTemplate.DoesNotExist:
+            raise CommandError(f"Template with ID {options['template_id']} not found")
+        if not template.roles_json:
+            raise CommandError(f'Template "{template.name}" has no roles to draft')
+        if options['matches'] < 1:
+            raise CommandError('--matches must be at least 1')
+
+        anime_ids = self.parse_anime_ids(options['anime_ids'])
+        simulation = self.build_simulation(template, anime_ids)
+
+        if simulation.pool_size < simulation.role_count * 2:
+            raise CommandError(
+                f'Pool has {simulation.pool_size} characters but a match needs {simulation.role_count * 2}'
+            )
+
+        match_count = options['matches']
+        chunk_size = max(1, options['chunk_size'])
+        chunk_sizes = [min(chunk_size, match_count - start) for start in range(0, match_count, chunk_size)]
+        seeds = np.random.SeedSequence(options['seed']).spawn(len(chunk_sizes))
+        workers = max(1, options['workers'])
+
+        self.stdout.write(
+            f'Simulating {match_count:,} matches of "{template.name}" '
+            f'({simulation.role_count} roles) over {simulation.pool_size} characters '
+            f'on {workers} worker(s)...'
+        )
+
+        start = time.perf_counter()
+        if workers == 1:
+            chunks = [simulate_chunk(simulation, seed, size) for seed, size in zip(seeds, chunk_sizes)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunks = list(executor.map(
+                    simulate_chunk, [simulation] * len(chunk_sizes), seeds, chunk_sizes
+                ))
+        elapsed = time.perf_counter() - start
+
+        self.report(summarize(chunks, simulation.role_count), elapsed)
+
+    def parse_anime_ids(self, raw):
+        """Comma-separated IDs, or every admin anime when empty"""
+        if not raw:
+            return list(Anime.objects.filter(owner__isnull=True).values_list('id', flat=True))
+        try:
+            return [int(anime_id) for anime_id in raw.split(',') if anime_id.strip()]
+        except ValueError:
+            raise CommandError('Invalid --anime-ids format. Expected comma-separated integers.')
+
+    def build_simulation(self, template, anime_ids):
+        """Load the pool once and precompute every per-character input"""
+        characters = list(
+            Character.objects.filter(anime_id__in=anime_ids).values_list(
+                'character_power', 'anime__anime_power_scale', 'specialties'
+            )
+        )
+        roles = template.roles_json
+
+        index = PoolScoreIndex.from_power_pairs((cp, aps) for cp, aps, _ in characters)
+        tiers = [
+            TIERS.index(index.rating_tier(calculate_draw_score(cp, aps), template.rating_bands_json)[0])
+            for cp, aps, _ in characters
+        ]
+
+        return DraftSimulation(
+            cp=[to_hundredths(cp) for cp, _, _ in characters],
+            aps=[to_hundredths(aps) for _, aps, _ in characters],
+            specialty_matches=np.array([
+                [check_specialty_match(specialties or [], role) for role in roles]
+                for _, _, specialties in characters
+            ], dtype=bool).reshape(len(characters), len(roles)),
+            specialty_match_multiplier=to_hundredths(template.specialty_match_multiplier),
+            tiers=tiers,
+        )
+
+    def report(self, summary, elapsed):
+        """Print the balance report"""
+        matches = summary['matches']
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Done in {elapsed:.2f}s ({matches / elapsed:,.0f} matches/s)'
+        ))
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write('Win rates')
+        self.stdout.write('=' * 50)
+        self.stdout.write(f"  Left (draws first): {summary['left_win_rate']:.2%}")
+        self.stdout.write(f"  Right:              {summary['right_win_rate']:.2%}")
+        self.stdout.write(f"  Draw:               {summary['draw_rate']:.2%}")
+        skew = summary['left_win_rate'] - summary['right_win_rate']
+        self.stdout.write(f'  First-pick skew:    {skew:+.2%}')
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write('Score distributions')
+        self.stdout.write('=' * 50)
+        columns = ['mean', 'std', 'min', 'p5', 'p25', 'median', 'p75', 'p95', 'max']
+        self.stdout.write('  ' + f"{'':<8}" + ''.join(f'{c:>10}' for c in columns))
+        for label, key in [('Left', 'left_scores'), ('Right', 'right_scores'), ('Margin', 'margin')]:
+            values = summary[key]
+            self.stdout.write('  ' + f'{label:<8}' + ''.join(f'{values[c]:>10.2f}' for c in columns))
+
+        self.stdout.write('\n' + '=' * 50)
+        self.stdout.write('Draw tier frequencies')
+        self.stdout.write('=' * 50)
+        for tier, frequency in summary['tier_frequencies'].items():
+            self.stdout.write(f'  {tier}: {frequency:.2%}')
+        self.stdout.write(f"\nSpecialty match rate: {summary['specialty_match_rate']:.2%}")
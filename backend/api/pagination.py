@@ -0,0 +1,138 @@
+"""
+Keyset (cursor) pagination
+
+A page is the first `limit` rows after the last row of the previous page in
+a fixed, unique ordering, so it is read with an index range scan instead of
+skipping OFFSET rows: deep pages cost the same as the first one. The cursor
+handed to clients is the ordering values of that last row, encoded as
+opaque URL-safe base64 JSON.
+"""
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.response import Response
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidPage(ValueError):
+    """Malformed cursor or limit (the view reports a 400)"""
+
+
+def cursor_value(value):
+    """JSON form of an ordering value; exact, so keyset equality still holds"""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()  # full microseconds, unlike DjangoJSONEncoder
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([cursor_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Ordering values of a cursor, checked to have one value per key"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidPage('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidPage('Invalid cursor')
+    return values
+
+
+def parse_limit(raw):
+    if raw in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise InvalidPage('limit must be an integer')
+    if limit < 1:
+        raise InvalidPage('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def after_cursor(ordering, values):
+    """
+    Filter for the rows strictly after `values` in `ordering`
+
+    Args:
+        ordering: Field names, '-' prefixed for descending; the last one
+            must make the ordering unique (normally the primary key)
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def paginate_keyset(queryset, ordering, cursor=None, limit=None):
+    """
+    One page of `queryset` in keyset order
+
+    Args:
+        ordering: See after_cursor(); fields may be annotations
+        cursor: Cursor from the previous page, None for the first page
+        limit: Raw limit query parameter
+
+    Returns:
+        (rows, next cursor or None on the last page)
+
+    Raises:
+        InvalidPage: on a malformed cursor or limit
+    """
+    limit = parse_limit(limit)
+    queryset = queryset.order_by(*ordering)
+    try:
+        if cursor:
+            queryset = queryset.filter(after_cursor(ordering, decode_cursor(cursor, len(ordering))))
+        rows = list(queryset[:limit + 1])
+    except (TypeError, ValueError, ValidationError):
+        # A decodable cursor holding values of the wrong type
+        raise InvalidPage('Invalid cursor')
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, field.lstrip('-')) for field in ordering])
+
+
+def keyset_page_response(request, queryset, ordering, serializer_class):
+    """
+    Paginated response for a list endpoint
+
+    Reads the cursor and limit query parameters and returns
+    {"results": [...], "next_cursor": "..." or null}, or a 400 on a
+    malformed cursor or limit.
+    """
+    try:
+        rows, next_cursor = paginate_keyset(
+            queryset, ordering,
+            cursor=request.query_params.get('cursor'), limit=request.query_params.get('limit')
+        )
+    except InvalidPage as e:
+        return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = serializer_class(rows, many=True, context={'request': request})
+    return Response({'results': serializer.data, 'next_cursor': next_cursor})
+
+
+def wants_page(request):
+    """Whether a list endpoint that defaults to a full list was asked for a page"""
+    return 'cursor' in request.query_params or 'limit' in request.query_params
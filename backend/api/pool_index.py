@@ -0,0 +1,77 @@
+"""
+Cached draw-score indexes for gameplay character pools
+
+A pool is the set of characters belonging to a list of anime. Building its
+PoolScoreIndex needs one query plus a Decimal pass over every character, so
+the result is cached in CACHES['default'] and reused for every draw.
+
+Invalidation is version based: every anime has a version counter that is
+bumped (see api.signals) whenever one of its characters is created, updated
+or deleted, or the anime's power scale changes. The cache key of a pool
+embeds the versions of all its anime, so a bump simply makes old entries
+unreachable and they expire on their own.
+"""
+import hashlib
+from typing import Iterable, List
+
+from django.core.cache import cache
+
+from game.models import Character
+from .cache_versions import bump_cache_version, get_cache_versions
+from .scoring import PoolScoreIndex
+
+POOL_INDEX_TIMEOUT = 60 * 60  # 1 hour
+POOL_VERSION_KEY = 'pool_version:anime:{}'
+POOL_INDEX_KEY = 'pool_index:{}'
+
+
+def normalize_pool_ids(anime_ids: Iterable[int]) -> List[int]:
+    """Return sorted, de-duplicated anime IDs identifying a pool"""
+    return sorted({int(anime_id) for anime_id in anime_ids})
+
+
+def _version_keys(anime_ids: List[int]) -> List[str]:
+    return [POOL_VERSION_KEY.format(anime_id) for anime_id in anime_ids]
+
+
+def get_pool_versions(anime_ids: List[int]) -> List[int]:
+    """Get the current version of every anime in the pool (one cache round trip)"""
+    return get_cache_versions(_version_keys(anime_ids))
+
+
+def bump_pool_version(anime_id):
+    """Invalidate every cached pool index that contains this anime"""
+    if anime_id is not None:
+        bump_cache_version(POOL_VERSION_KEY.format(anime_id))
+
+
+def _pool_cache_key(anime_ids: List[int], versions: List[int]) -> str:
+    raw = ','.join(f'{anime_id}:{version}' for anime_id, version in zip(anime_ids, versions))
+    return POOL_INDEX_KEY.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def build_pool_index(anime_ids: List[int]) -> PoolScoreIndex:
+    """Build a PoolScoreIndex straight from the database (single query)"""
+    pairs = Character.objects.filter(anime_id__in=anime_ids).values_list(
+        'character_power', 'anime__anime_power_scale'
+    )
+    return PoolScoreIndex.from_power_pairs(pairs)
+
+
+def get_pool_index(anime_ids: Iterable[int]) -> PoolScoreIndex:
+    """
+    Get the PoolScoreIndex for the characters of the given anime
+
+    Served from cache when no character or power scale in the pool has
+    changed since it was built; otherwise rebuilt and cached.
+    """
+    anime_ids = normalize_pool_ids(anime_ids)
+    versions = get_pool_versions(anime_ids)
+    cache_key = _pool_cache_key(anime_ids, versions)
+
+    index = cache.get(cache_key)
+    if index is None:
+        index = build_pool_index(anime_ids)
+        cache.set(cache_key, index, timeout=POOL_INDEX_TIMEOUT)
+
+    return index
@@ -15,8 +15,10 @@ Edge cases handled:
 - Supports both single specialty (string) and multiple specialties (array)
 """
 
-from decimal import Decimal, ROUND_HALF_UP
-from typing import Dict, List, Any, Optional
+from array import array
+from bisect import bisect_right
+from decimal import Decimal, ROUND_FLOOR, ROUND_HALF_UP
+from typing import Dict, List, Any, Iterable, Optional
 
 
 def normalize_specialty(specialty: str) -> str:
@@ -102,6 +104,99 @@ def calculate_draw_score(
     return score.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
 
+def score_to_hundredths(score: Decimal) -> int:
+    """
+    Convert a score into an integer number of hundredths
+    (e.g. Decimal('867.25') -> 86725)
+
+    Scores with more than 2 decimal places are floored, which keeps
+    "pool score <= draw score" comparisons exact.
+    """
+    return int(score.scaleb(2).to_integral_value(rounding=ROUND_FLOOR))
+
+
+class PoolScoreIndex:
+    """
+    Sorted, array-backed table of draw scores for one character pool
+
+    Draw scores are stored as integer hundredths in ascending order, so the
+    percentile of any draw score is a single bisect instead of a full
+    recompute + sort + scan of the pool.
+
+    The index only depends on the pool (CP and APS of its characters); the
+    template's rating bands are applied at lookup time, so one index serves
+    every template played against the same pool.
+    """
+
+    __slots__ = ('scores',)
+
+    def __init__(self, scores: Iterable[int] = ()):
+        self.scores = array('q', sorted(scores))
+
+    @classmethod
+    def from_characters(cls, character_pool: List[Dict[str, Any]]) -> 'PoolScoreIndex':
+        """
+        Build an index from character dicts with character_power and
+        anime_power_scale keys (null values treated as 0)
+        """
+        return cls.from_power_pairs(
+            (char.get('character_power'), char.get('anime_power_scale'))
+            for char in character_pool
+        )
+
+    @classmethod
+    def from_power_pairs(cls, pairs: Iterable[tuple]) -> 'PoolScoreIndex':
+        """
+        Build an index from (character_power, anime_power_scale) pairs
+        """
+        return cls(
+            score_to_hundredths(calculate_draw_score(cp or Decimal('0'), aps or Decimal('0')))
+            for cp, aps in pairs
+        )
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def percentile(self, draw_score: Decimal) -> float:
+        """
+        Percentage of the pool whose draw score is <= draw_score
+        """
+        count_below_or_equal = bisect_right(self.scores, score_to_hundredths(draw_score))
+        return (count_below_or_equal / len(self.scores)) * 100
+
+    def rating_tier(
+        self,
+        draw_score: Decimal,
+        rating_bands: Dict[str, Dict[str, Any]]
+    ) -> tuple[str, str]:
+        """
+        Determine the rating tier (S/A/B/C/D) for a draw score
+
+        Args:
+            draw_score: Draw score rounded to 2 decimal places
+            rating_bands: Rating band configuration from template
+
+        Returns:
+            Tuple of (tier, label) e.g., ('S', 'INSANE PULL!')
+        """
+        # Handle edge case: empty pool
+        if not self.scores:
+            return ('C', rating_bands.get('C', {}).get('label', 'Meh…'))
+
+        percentile = self.percentile(draw_score)
+
+        # Determine tier based on percentile
+        # Bands are checked from highest to lowest
+        for tier in ['S', 'A', 'B', 'C', 'D']:
+            band = rating_bands.get(tier, {})
+            min_percentile = band.get('min', 0)
+            if percentile >= min_percentile:
+                return (tier, band.get('label', ''))
+
+        # Fallback to D tier
+        return ('D', rating_bands.get('D', {}).get('label', 'Oof.'))
+
+
 def get_rating_tier(
     draw_score: Decimal,
     character_pool: List[Dict[str, Any]],
@@ -111,6 +206,10 @@ def get_rating_tier(
     Determine the rating tier (S/A/B/C/D) for a drawn character
     based on percentile within the available character pool
 
+    Builds a throwaway PoolScoreIndex; callers that rate many draws against
+    the same pool should build (or fetch a cached) index once and call
+    PoolScoreIndex.rating_tier directly.
+
     Args:
         draw_score: The draw score of the character
         character_pool: List of all characters in the pool
@@ -119,34 +218,7 @@ def get_rating_tier(
     Returns:
         Tuple of (tier, label) e.g., ('S', 'INSANE PULL!')
     """
-    # Calculate draw scores for all characters in pool
-    pool_scores = []
-    for char in character_pool:
-        cp = char.get('character_power') or Decimal('0')
-        aps = char.get('anime_power_scale') or Decimal('0')
-        pool_scores.append(calculate_draw_score(cp, aps))
-
-    # Handle edge case: empty pool
-    if not pool_scores:
-        return ('C', rating_bands.get('C', {}).get('label', 'Meh…'))
-
-    # Sort scores
-    pool_scores.sort()
-
-    # Calculate percentile (what percentage of pool is <= this score)
-    count_below_or_equal = sum(1 for s in pool_scores if s <= draw_score)
-    percentile = (count_below_or_equal / len(pool_scores)) * 100
-
-    # Determine tier based on percentile
-    # Bands are checked from highest to lowest
-    for tier in ['S', 'A', 'B', 'C', 'D']:
-        band = rating_bands.get(tier, {})
-        min_percentile = band.get('min', 0)
-        if percentile >= min_percentile:
-            return (tier, band.get('label', ''))
-
-    # Fallback to D tier
-    return ('D', rating_bands.get('D', {}).get('label', 'Oof.'))
+    return PoolScoreIndex.from_characters(character_pool).rating_tier(draw_score, rating_bands)
 
 
 def calculate_team_score(
@@ -162,7 +234,8 @@ def calculate_team_score(
         assignments: List of {role, characterId} assignments
         template_roles: List of role names from template
         specialty_match_multiplier: Multiplier from template for specialty matches
-        characters_data: Dict mapping character IDs to character data
+        characters_data: Dict mapping character IDs to character data; may
+            carry a precomputed 'specialty_set' of normalized specialties
 
     Returns:
         Dict with 'breakdown' (list of role details) and 'total' score
@@ -183,7 +256,11 @@ def calculate_team_score(
         specialties = character.get('specialties', [])
 
         # Check specialty match
-        specialty_match = check_specialty_match(specialties, role)
+        specialty_set = character.get('specialty_set')
+        if specialty_set is not None:
+            specialty_match = bool(role) and normalize_specialty(role) in specialty_set
+        else:
+            specialty_match = check_specialty_match(specialties, role)
         multiplier = specialty_match_multiplier if specialty_match else Decimal('1.00')
 
         # Calculate role score
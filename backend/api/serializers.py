@@ -14,7 +14,6 @@ class AnimeSerializer(serializers.ModelSerializer):
     """
     image = serializers.SerializerMethodField()
     owner_username = serializers.SerializerMethodField()
-    character_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Anime
@@ -24,7 +23,9 @@ class AnimeSerializer(serializers.ModelSerializer):
             'average_rating', 'total_ratings', 'character_count',
             'original_creator_username'
         ]
-        read_only_fields = ['owner', 'average_rating', 'total_ratings', 'original_creator_username']
+        read_only_fields = [
+            'owner', 'average_rating', 'total_ratings', 'character_count', 'original_creator_username'
+        ]
 
     def get_image(self, obj):
         """Return full URL for image or None"""
@@ -41,10 +42,6 @@ class AnimeSerializer(serializers.ModelSerializer):
             return obj.owner.username
         return 'Admin'
 
-    def get_character_count(self, obj):
-        """Return number of characters for this anime"""
-        return obj.characters.count()
-
 
 class CharacterListSerializer(serializers.ModelSerializer):
     """
@@ -148,6 +145,16 @@ class DrawRequestSerializer(serializers.Serializer):
         allow_null=True,
         help_text='Optional random seed for reproducibility'
     )
+    templateId = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        help_text='Optional template ID; when given the response includes the rating tier'
+    )
+    animeIds = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        help_text='Anime IDs making up the full pool (defaults to the anime of the remaining characters)'
+    )
 
 
 class RoleAssignmentSerializer(serializers.Serializer):
@@ -174,6 +181,36 @@ class ScoreRequestSerializer(serializers.Serializer):
     rightTeam = TeamAssignmentSerializer(help_text='Player 2 (right) assignments')
 
 
+class BatchScoreRequestSerializer(serializers.Serializer):
+    """
+    Serializer for batch score calculation request
+    """
+    matches = ScoreRequestSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=1000,
+        help_text='Matches to score, each shaped like a POST /api/score/ body'
+    )
+
+
+class OptimalLineupRequestSerializer(serializers.Serializer):
+    """
+    Serializer for best possible lineup request
+    """
+    templateId = serializers.IntegerField(help_text='ID of the game template used')
+    characterIds = serializers.ListField(
+        child=serializers.IntegerField(),
+        min_length=1,
+        max_length=50,
+        help_text='IDs of the drawn characters'
+    )
+    assignments = RoleAssignmentSerializer(
+        many=True,
+        required=False,
+        help_text='Optional actual assignments, scored for comparison'
+    )
+
+
 class RoleScoreBreakdownSerializer(serializers.Serializer):
     """
     Serializer for individual role score breakdown
@@ -199,6 +236,14 @@ class TeamScoreSerializer(serializers.Serializer):
     total = serializers.DecimalField(max_digits=10, decimal_places=2)
 
 
+class OptimalLineupResponseSerializer(serializers.Serializer):
+    """
+    Serializer for best possible lineup response
+    """
+    best = TeamScoreSerializer()
+    actual = TeamScoreSerializer(required=False)
+
+
 class ScoreResponseSerializer(serializers.Serializer):
     """
     Serializer for score calculation response
@@ -326,7 +371,7 @@ class AnimeDetailSerializer(serializers.ModelSerializer):
 
     def get_characters(self, obj):
         """Return all characters for this anime"""
-        characters = obj.characters.all()
+        characters = obj.characters.select_related('anime__owner')
         return CharacterListSerializer(characters, many=True, context=self.context).data
 
 
@@ -337,16 +382,19 @@ class AnimeLibrarySerializer(serializers.ModelSerializer):
     """
     image = serializers.SerializerMethodField()
     owner_username = serializers.SerializerMethodField()
-    character_count = serializers.SerializerMethodField()
+    mean_draw_score = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = Anime
         fields = [
             'id', 'name', 'image', 'anime_power_scale',
             'owner', 'owner_username', 'average_rating', 'total_ratings',
-            'character_count', 'created_at', 'original_creator_username'
+            'character_count', 'min_draw_score', 'max_draw_score', 'mean_draw_score',
+            'created_at', 'original_creator_username'
+        ]
+        read_only_fields = [
+            'owner', 'character_count', 'min_draw_score', 'max_draw_score', 'original_creator_username'
         ]
-        read_only_fields = ['owner', 'original_creator_username']
 
     def get_image(self, obj):
         """Return full URL for image or None"""
@@ -363,10 +411,6 @@ class AnimeLibrarySerializer(serializers.ModelSerializer):
             return obj.owner.username
         return 'Official'
 
-    def get_character_count(self, obj):
-        """Return number of characters"""
-        return obj.characters.count()
-
 
 class AnimeCreateSerializer(serializers.ModelSerializer):
     """
@@ -0,0 +1,210 @@
+"""
+Signal handlers keeping API-level caches and maintained statistics in sync
+with game content
+
+Cache versions are bumped on commit, never inside the writing transaction:
+a request that misses the cache in between would otherwise rebuild it from
+the old rows and store that under the new version.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from game.models import Anime, AnimeRating, Character, GameTemplate
+from .catalog_cache import bump_catalog_version
+from .anime_stats import (
+    CONTRIBUTION_FIELDS, DrawScoreBounds, apply_character_delta, character_contribution, rebuild_anime_stats
+)
+from .pool_index import bump_pool_version
+
+# The character's anime, as read with the character in pre_save
+PREVIOUS_ANIME_FIELDS = (
+    'anime__anime_power_scale', 'anime__owner_id', 'anime__min_draw_score', 'anime__max_draw_score'
+)
+PreviousAnime = namedtuple('PreviousAnime', ['anime_power_scale', 'owner_id', 'min_draw_score', 'max_draw_score'])
+
+
+def _bump_pool_versions_on_commit(*anime_ids):
+    def bump():
+        for anime_id in set(anime_ids):
+            bump_pool_version(anime_id)
+    transaction.on_commit(bump)
+
+
+def _bump_catalog_versions_on_commit(*owner_ids):
+    def bump():
+        for owner_id in set(owner_ids):
+            bump_catalog_version(owner_id)
+    transaction.on_commit(bump)
+
+
+def _previous_anime(character):
+    """Row of the character's anime read in pre_save, if it is still the same anime"""
+    previous = getattr(character, '_previous_anime', None)
+    if previous is not None and character.anime_id == getattr(character, '_previous_anime_id', None):
+        return previous
+    return None
+
+
+def _anime_power_scale(character):
+    """APS of the character's anime, without a query when the anime is loaded or was read in pre_save"""
+    if character.anime_id is None:
+        return None
+    if Character._meta.get_field('anime').is_cached(character) and character.anime is not None:
+        return character.anime.anime_power_scale
+    previous = _previous_anime(character)
+    if previous is not None:
+        return previous.anime_power_scale
+    return Anime.objects.filter(pk=character.anime_id).values_list('anime_power_scale', flat=True).first()
+
+
+def _current_contribution(character):
+    return character_contribution(
+        character.name, character.image.name if character.image else None,
+        character.character_power, character.specialties, _anime_power_scale(character),
+    )
+
+
+@receiver(pre_save, sender=Character)
+def remember_previous_anime(sender, instance, **kwargs):
+    """
+    Remember the character's previous anime and stats contribution, so a move
+    invalidates both pools and the anime statistics get an exact delta
+
+    The same query reads the anime's APS, owner and draw score bounds, which
+    the post_save handlers reuse instead of querying the anime again.
+    """
+    instance._previous_anime_id = None
+    instance._previous_contribution = None
+    instance._previous_anime = None
+    if instance.pk:
+        previous = Character.objects.filter(pk=instance.pk).values_list(
+            *CONTRIBUTION_FIELDS, *PREVIOUS_ANIME_FIELDS
+        ).first()
+        if previous:
+            anime_id, name, image, character_power, specialties = previous[:len(CONTRIBUTION_FIELDS)]
+            anime = PreviousAnime(*previous[len(CONTRIBUTION_FIELDS):])
+            instance._previous_anime_id = anime_id
+            instance._previous_anime = anime if anime_id is not None else None
+            instance._previous_contribution = character_contribution(
+                name, image, character_power, specialties, anime.anime_power_scale
+            )
+
+
+@receiver(post_save, sender=Character)
+@receiver(post_delete, sender=Character)
+def invalidate_character_pool(sender, instance, **kwargs):
+    """Character added, changed or removed: its pool's draw scores changed"""
+    _bump_pool_versions_on_commit(instance.anime_id, getattr(instance, '_previous_anime_id', None))
+
+
+@receiver(post_save, sender=Character)
+def update_anime_stats_on_save(sender, instance, **kwargs):
+    """Apply the character's change to the maintained Anime statistics"""
+    previous_anime_id = getattr(instance, '_previous_anime_id', None)
+    previous = getattr(instance, '_previous_contribution', None)
+    previous_anime = getattr(instance, '_previous_anime', None)
+    current = _current_contribution(instance) if instance.anime_id is not None else None
+
+    bounds = None
+    if previous_anime is not None:
+        bounds = DrawScoreBounds(
+            previous_anime.min_draw_score, previous_anime.max_draw_score, previous_anime.anime_power_scale
+        )
+    if previous_anime_id == instance.anime_id:
+        apply_character_delta(instance.anime_id, previous, current, bounds)
+    else:
+        apply_character_delta(previous_anime_id, previous, None, bounds)
+        apply_character_delta(instance.anime_id, None, current)
+
+
+@receiver(post_delete, sender=Character)
+def update_anime_stats_on_delete(sender, instance, **kwargs):
+    """Remove the deleted character from the maintained Anime statistics"""
+    if instance.anime_id is not None:
+        apply_character_delta(instance.anime_id, _current_contribution(instance), None)
+
+
+@receiver(pre_save, sender=Anime)
+def remember_previous_power_scale(sender, instance, **kwargs):
+    """Remember the anime's previous APS, which every draw score depends on"""
+    instance._previous_power_scale = None
+    update_fields = kwargs.get('update_fields')
+    if instance.pk and (update_fields is None or 'anime_power_scale' in update_fields):
+        instance._previous_power_scale = (
+            Anime.objects.filter(pk=instance.pk).values_list('anime_power_scale', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Anime)
+def rebuild_stats_on_power_scale_change(sender, instance, created, **kwargs):
+    """An APS change rescales every draw score of the anime"""
+    previous = getattr(instance, '_previous_power_scale', None)
+    if not created and previous is not None and previous != instance.anime_power_scale:
+        rebuild_anime_stats([instance.pk])
+
+
+@receiver(post_save, sender=Anime)
+@receiver(post_delete, sender=Anime)
+def invalidate_anime_pool(sender, instance, **kwargs):
+    """Anime power scale (APS) feeds every character's draw score"""
+    _bump_pool_versions_on_commit(instance.pk)
+
+
+def _bump_anime_owners(*anime_ids):
+    """
+    Bump, on commit, the catalog version of the owners of these anime
+
+    The owners are looked up now (one query), while the anime still exist.
+    """
+    anime_ids = {anime_id for anime_id in anime_ids if anime_id is not None}
+    if not anime_ids:
+        return
+    _bump_catalog_versions_on_commit(*Anime.objects.filter(pk__in=anime_ids).values_list('owner_id', flat=True))
+
+
+@receiver(post_save, sender=Anime)
+@receiver(post_delete, sender=Anime)
+@receiver(post_save, sender=GameTemplate)
+@receiver(post_delete, sender=GameTemplate)
+def invalidate_owner_catalog(sender, instance, **kwargs):
+    """Anime or template written: its owner's catalog responses changed"""
+    _bump_catalog_versions_on_commit(instance.owner_id)
+
+
+@receiver(post_save, sender=Character)
+@receiver(post_delete, sender=Character)
+def invalidate_character_catalog(sender, instance, **kwargs):
+    """
+    Characters are listed under (and counted on) their anime's owner
+
+    The owner is taken from the loaded anime or the pre_save row when there
+    is one, and only looked up otherwise.
+    """
+    previous_anime_id = getattr(instance, '_previous_anime_id', None)
+    previous_anime = getattr(instance, '_previous_anime', None)
+    known_owners = {}
+    if previous_anime is not None:
+        known_owners[previous_anime_id] = previous_anime.owner_id
+    if Character._meta.get_field('anime').is_cached(instance) and instance.anime is not None:
+        known_owners[instance.anime_id] = instance.anime.owner_id
+
+    unknown = {instance.anime_id, previous_anime_id} - set(known_owners) - {None}
+    if known_owners:
+        _bump_catalog_versions_on_commit(*known_owners.values())
+    _bump_anime_owners(*unknown)
+
+
+@receiver(post_save, sender=AnimeRating)
+@receiver(post_delete, sender=AnimeRating)
+def invalidate_rating_catalog(sender, instance, **kwargs):
+    """
+    Catalog anime carry average_rating / total_ratings
+
+    AnimeRating.save() and delete() apply the rating delta to the anime
+    after this signal, in the same transaction; bumping on commit means the
+    new catalog version is only ever built from the updated aggregates.
+    """
+    _bump_anime_owners(instance.anime_id)
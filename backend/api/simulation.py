@@ -0,0 +1,153 @@
+"""
+Monte Carlo draft simulation for template balancing
+
+Plays random drafts under the real game rules, vectorized over thousands of
+matches at a time:
+
+- Both players draw without replacement from one shared pool, alternating
+  left (host) first, until each has one character per template role
+- Each drawn character is placed into a random empty role
+- Teams are scored with the same fixed-point engine as api.batch_scoring
+- Every draw is rated against the full pool like POST /api/draw/
+
+Because draws are uniformly random, placing the k-th drawn character into a
+random empty role is equivalent to placing it into role k, so no explicit
+placement shuffle is needed.
+
+This module has no Django imports so process-pool workers start cheaply.
+"""
+
+import numpy as np
+
+from .batch_scoring import role_scores_hundredths, NO_MATCH_MULTIPLIER
+
+TIERS = ['S', 'A', 'B', 'C', 'D']
+
+
+class DraftSimulation:
+    """
+    Immutable, picklable description of one (template, pool) simulation
+
+    Attributes:
+        cp, aps: int64 arrays of character power / APS in hundredths
+        multipliers: int64 (pool size x roles) specialty multiplier per slot
+        tiers: int8 array, index into TIERS of each character's draw rating
+    """
+
+    def __init__(self, cp, aps, specialty_matches, specialty_match_multiplier, tiers):
+        self.cp = np.asarray(cp, dtype=np.int64)
+        self.aps = np.asarray(aps, dtype=np.int64)
+        self.multipliers = np.where(
+            np.asarray(specialty_matches, dtype=bool), specialty_match_multiplier, NO_MATCH_MULTIPLIER
+        ).astype(np.int64)
+        self.tiers = np.asarray(tiers, dtype=np.int8)
+
+    @property
+    def pool_size(self):
+        return len(self.cp)
+
+    @property
+    def role_count(self):
+        return self.multipliers.shape[1]
+
+
+def draw_without_replacement(rng, pool_size, match_count, draws):
+    """
+    Sample `draws` distinct pool indexes for each of `match_count` matches
+
+    Samples with replacement and redraws only the rows that contain a
+    duplicate; for pools much larger than a hand this converges in one or
+    two rounds and avoids a full shuffle of the pool per match.
+    """
+    if draws > pool_size:
+        raise ValueError(f'Pool of {pool_size} characters cannot fill {draws} draws')
+
+    picks = rng.integers(0, pool_size, size=(match_count, draws))
+    while True:
+        ordered = np.sort(picks, axis=1)
+        duplicated = np.any(ordered[:, 1:] == ordered[:, :-1], axis=1)
+        if not duplicated.any():
+            return picks
+        rows = np.flatnonzero(duplicated)
+        if pool_size < draws * 4:
+            # Small pool: rejection would be slow, shuffle these rows instead
+            picks[rows] = np.argsort(rng.random((len(rows), pool_size)), axis=1)[:, :draws]
+        else:
+            picks[rows] = rng.integers(0, pool_size, size=(len(rows), draws))
+
+
+def simulate_chunk(simulation, seed, match_count):
+    """
+    Simulate `match_count` random drafts
+
+    Args:
+        simulation: DraftSimulation
+        seed: Seed (or SeedSequence) for this chunk's generator
+        match_count: Number of matches to play
+
+    Returns:
+        Dict with left/right team totals (int64 hundredths), tier counts and
+        the number of specialty-matched slots
+    """
+    rng = np.random.default_rng(seed)
+    roles = simulation.role_count
+
+    picks = draw_without_replacement(rng, simulation.pool_size, match_count, roles * 2)
+    role_index = np.arange(roles)
+
+    totals = []
+    specialty_matched = 0
+    for team_picks in (picks[:, 0::2], picks[:, 1::2]):  # left draws first
+        multipliers = simulation.multipliers[team_picks, role_index]
+        scores = role_scores_hundredths(simulation.cp[team_picks], simulation.aps[team_picks], multipliers)
+        totals.append(scores.sum(axis=1))
+        specialty_matched += int(np.count_nonzero(multipliers != NO_MATCH_MULTIPLIER))
+
+    return {
+        'left_totals': totals[0],
+        'right_totals': totals[1],
+        'tier_counts': np.bincount(simulation.tiers[picks].ravel(), minlength=len(TIERS)),
+        'specialty_matched': specialty_matched,
+    }
+
+
+def summarize(chunks, role_count):
+    """
+    Merge chunk results into win rates, score distributions and tier frequencies
+    """
+    left = np.concatenate([chunk['left_totals'] for chunk in chunks])
+    right = np.concatenate([chunk['right_totals'] for chunk in chunks])
+    tier_counts = np.sum([chunk['tier_counts'] for chunk in chunks], axis=0)
+    matches = len(left)
+
+    def distribution(totals):
+        percentiles = np.percentile(totals, [5, 25, 50, 75, 95]) / 100
+        return {
+            'mean': float(totals.mean()) / 100,
+            'std': float(totals.std()) / 100,
+            'min': float(totals.min()) / 100,
+            'p5': percentiles[0],
+            'p25': percentiles[1],
+            'median': percentiles[2],
+            'p75': percentiles[3],
+            'p95': percentiles[4],
+            'max': float(totals.max()) / 100,
+        }
+
+    left_wins = int(np.count_nonzero(left > right))
+    right_wins = int(np.count_nonzero(right > left))
+    margin = np.abs(left - right)
+
+    return {
+        'matches': matches,
+        'left_win_rate': left_wins / matches,
+        'right_win_rate': right_wins / matches,
+        'draw_rate': (matches - left_wins - right_wins) / matches,
+        'left_scores': distribution(left),
+        'right_scores': distribution(right),
+        'margin': distribution(margin),
+        'tier_frequencies': {
+            tier: int(count) / int(tier_counts.sum()) for tier, count in zip(TIERS, tier_counts)
+        },
+        'specialty_match_rate': sum(chunk['specialty_matched'] for chunk in chunks) / (matches * role_count * 2),
+    }
@@ -1,8 +1,32 @@
 """
 Unit tests for AniFight API, focusing on scoring logic
 """
+import itertools
+import json
 from decimal import Decimal
-from django.test import TestCase
+from io import StringIO
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from game.models import Anime, AnimeRating, Character, GameTemplate
+import random
+from unittest.mock import patch
+
+from api import anime_import
+from api.batch_scoring import calculate_match_results_batch, role_scores_hundredths, to_hundredths
+from api.lineup_solver import solve_best_lineup
+from api.anime_stats import rebuild_anime_stats
+from api.pagination import encode_cursor
+from api.pool_index import get_pool_index
+from api.simulation import DraftSimulation, draw_without_replacement, simulate_chunk
 from api.scoring import (
     normalize_specialty,
     check_specialty_match,
@@ -10,8 +34,24 @@ from api.scoring import (
     calculate_draw_score,
     calculate_team_score,
     calculate_match_result,
+    get_rating_tier,
+    PoolScoreIndex,
 )
 
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+DEFAULT_RATING_BANDS = {
+    "S": {"min": 90, "label": "INSANE PULL!"},
+    "A": {"min": 70, "label": "HUGE WIN!"},
+    "B": {"min": 40, "label": "Nice pick"},
+    "C": {"min": 10, "label": "Meh…"},
+    "D": {"min": 0, "label": "Oof."}
+}
+
 
 class ScoringTestCase(TestCase):
     """Test cases for scoring logic"""
@@ -286,3 +326,1090 @@ class ScoringTestCase(TestCase):
 
         self.assertFalse(result['breakdown'][0]['specialty_match'])
         self.assertEqual(result['breakdown'][0]['specialty_multiplier'], Decimal('1.00'))
+
+
+class PoolScoreIndexTestCase(TestCase):
+    """Test the bisect-based percentile index used for draw ratings"""
+
+    def reference_tier(self, draw_score, character_pool, rating_bands):
+        """Original O(n log n) implementation: recompute, sort and scan"""
+        pool_scores = sorted(
+            calculate_draw_score(
+                c.get('character_power') or Decimal('0'),
+                c.get('anime_power_scale') or Decimal('0')
+            )
+            for c in character_pool
+        )
+        if not pool_scores:
+            return ('C', rating_bands['C']['label'])
+        count = sum(1 for s in pool_scores if s <= draw_score)
+        percentile = (count / len(pool_scores)) * 100
+        for tier in ['S', 'A', 'B', 'C', 'D']:
+            if percentile >= rating_bands[tier]['min']:
+                return (tier, rating_bands[tier]['label'])
+        return ('D', rating_bands['D']['label'])
+
+    def test_matches_linear_scan(self):
+        """Index lookups agree with the full recompute for every pool member"""
+        pool = [
+            {'character_power': Decimal(cp), 'anime_power_scale': Decimal(aps)}
+            for cp, aps in [
+                ('33.33', '3.33'), ('50.00', '2.00'), ('85.00', '8.50'),
+                ('50.00', '2.00'), ('1.00', '1.00'), ('100.00', '9.99'),
+                ('12.34', '5.67'), ('70.00', '5.00'), ('90.00', '8.00'),
+                ('45.50', '1.10'),
+            ]
+        ] + [{'character_power': None, 'anime_power_scale': Decimal('5.00')}]
+
+        index = PoolScoreIndex.from_characters(pool)
+        for char in pool:
+            score = calculate_draw_score(char['character_power'], char['anime_power_scale'])
+            expected = self.reference_tier(score, pool, DEFAULT_RATING_BANDS)
+            self.assertEqual(index.rating_tier(score, DEFAULT_RATING_BANDS), expected)
+            self.assertEqual(get_rating_tier(score, pool, DEFAULT_RATING_BANDS), expected)
+
+    def test_scores_between_pool_members(self):
+        """Scores not present in the pool still count everything <= them"""
+        index = PoolScoreIndex([100, 200, 300, 400])
+        self.assertEqual(index.percentile(Decimal('2.50')), 50.0)
+        self.assertEqual(index.percentile(Decimal('0.99')), 0.0)
+        self.assertEqual(index.percentile(Decimal('4.00')), 100.0)
+        self.assertEqual(index.percentile(Decimal('3.999')), 75.0)
+
+    def test_empty_pool(self):
+        """Empty pool falls back to C tier"""
+        index = PoolScoreIndex()
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.rating_tier(Decimal('100.00'), DEFAULT_RATING_BANDS), ('C', 'Meh…'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PoolIndexCacheTestCase(TestCase):
+    """Test caching and invalidation of pool indexes"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+        self.anime = Anime.objects.create(name='Naruto', anime_power_scale=Decimal('2.00'))
+        self.other = Anime.objects.create(name='Bleach', anime_power_scale=Decimal('3.00'))
+        self.weak = Character.objects.create(name='Weak', anime=self.anime, character_power=Decimal('10.00'))
+        self.strong = Character.objects.create(name='Strong', anime=self.anime, character_power=Decimal('90.00'))
+        Character.objects.create(name='Other', anime=self.other, character_power=Decimal('50.00'))
+
+    def test_index_is_cached(self):
+        """Second lookup for the same pool does not touch the database"""
+        index = get_pool_index([self.anime.id, self.other.id])
+        self.assertEqual(list(index.scores), [2000, 15000, 18000])
+
+        with self.assertNumQueries(0):
+            cached = get_pool_index([self.other.id, self.anime.id])
+        self.assertEqual(list(cached.scores), list(index.scores))
+
+    def test_character_power_change_invalidates(self):
+        """Changing a character's power rebuilds the index"""
+        get_pool_index([self.anime.id])
+
+        self.weak.character_power = Decimal('95.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.weak.save()
+
+        self.assertEqual(list(get_pool_index([self.anime.id]).scores), [18000, 19000])
+
+    def test_anime_power_scale_change_invalidates(self):
+        """Changing an anime's APS rebuilds every pool containing it"""
+        get_pool_index([self.anime.id, self.other.id])
+
+        self.anime.anime_power_scale = Decimal('1.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.anime.save()
+
+        self.assertEqual(
+            list(get_pool_index([self.anime.id, self.other.id]).scores),
+            [1000, 9000, 15000]
+        )
+
+    def test_character_delete_and_move_invalidate(self):
+        """Removing or moving a character updates both affected pools"""
+        get_pool_index([self.anime.id])
+        get_pool_index([self.other.id])
+
+        self.strong.anime = self.other
+        with self.captureOnCommitCallbacks(execute=True):
+            self.strong.save()
+        self.assertEqual(list(get_pool_index([self.anime.id]).scores), [2000])
+        self.assertEqual(list(get_pool_index([self.other.id]).scores), [15000, 27000])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.weak.delete()
+        self.assertEqual(list(get_pool_index([self.anime.id]).scores), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DrawEndpointTestCase(APITestCase):
+    """Test POST /api/draw/ with server-side rating"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+        self.template = GameTemplate.objects.create(name='Standard', is_published=True)
+        self.anime = Anime.objects.create(name='Naruto', anime_power_scale=Decimal('1.00'))
+        self.characters = [
+            Character.objects.create(name=f'Char {i}', anime=self.anime, character_power=Decimal(i * 10))
+            for i in range(1, 11)
+        ]
+        self.url = reverse('api:draw_character')
+
+    def test_draw_without_template_has_no_rating(self):
+        """Backwards compatible: no templateId, no rating"""
+        response = self.client.post(self.url, {
+            'remainingCharacterIds': [self.characters[0].id],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['character']['id'], self.characters[0].id)
+        self.assertNotIn('rating', response.data)
+
+    def test_draw_rates_against_full_pool(self):
+        """Top character of the pool is an S pull, bottom one is a D pull"""
+        top, bottom = self.characters[-1], self.characters[0]
+
+        response = self.client.post(self.url, {
+            'remainingCharacterIds': [top.id],
+            'templateId': self.template.id,
+            'animeIds': [self.anime.id],
+        }, format='json')
+        self.assertEqual(response.data['rating'], {'tier': 'S', 'label': 'INSANE PULL!'})
+
+        response = self.client.post(self.url, {
+            'remainingCharacterIds': [bottom.id],
+            'templateId': self.template.id,
+        }, format='json')
+        self.assertEqual(response.data['rating'], {'tier': 'C', 'label': 'Meh…'})
+
+    def test_draw_unknown_template(self):
+        """Unknown templateId returns 404"""
+        response = self.client.post(self.url, {
+            'remainingCharacterIds': [self.characters[0].id],
+            'templateId': 9999,
+        }, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class BatchScoringParityTestCase(TestCase):
+    """Batch NumPy engine must be bit-identical to the Decimal engine"""
+
+    ROLES = ['CAPTAIN', 'VICE CAPTAIN', 'TANK', 'HEALER', 'SUPPORT', 'SUPPORT']
+
+    def random_hundredths(self, rng, low, high):
+        return Decimal(rng.randint(low * 100, high * 100)).scaleb(-2)
+
+    def build_fixture(self, seed, character_count=60, match_count=200):
+        rng = random.Random(seed)
+        specialties = ['CAPTAIN', ' tank ', 'Healer', 'SUPPORT', 'vice captain', 'SNIPER']
+
+        characters_data = {}
+        for character_id in range(1, character_count + 1):
+            characters_data[character_id] = {
+                'id': character_id,
+                'name': f'Char {character_id}',
+                'image': None,
+                'anime': {'id': 1, 'name': 'Anime', 'image': None} if character_id % 3 else None,
+                'anime_power_scale': None if character_id % 17 == 0 else self.random_hundredths(rng, -2, 20),
+                'character_power': None if character_id % 13 == 0 else self.random_hundredths(rng, 1, 100),
+                'specialties': rng.sample(specialties, rng.randint(0, 3)),
+            }
+
+        templates_data = {
+            template_id: {
+                'specialty_match_multiplier': self.random_hundredths(rng, 1, 3),
+                'roles_json': self.ROLES,
+            }
+            for template_id in (1, 2, 3)
+        }
+
+        matches = []
+        for _ in range(match_count):
+            ids = rng.sample(range(1, character_count + 3), len(self.ROLES) * 2)  # includes unknown IDs
+            matches.append({
+                'template_id': rng.choice(list(templates_data)),
+                'left': [{'role': r, 'characterId': c} for r, c in zip(self.ROLES, ids[:6])],
+                'right': [{'role': r, 'characterId': c} for r, c in zip(self.ROLES, ids[6:])],
+            })
+
+        return matches, templates_data, characters_data
+
+    def test_parity_with_decimal_engine(self):
+        """Random matches: identical breakdowns, totals and winners"""
+        for seed in range(5):
+            matches, templates_data, characters_data = self.build_fixture(seed)
+            batch_results = calculate_match_results_batch(matches, templates_data, characters_data)
+
+            for match, batch_result in zip(matches, batch_results):
+                expected = calculate_match_result(
+                    match['template_id'], match['left'], match['right'],
+                    templates_data[match['template_id']], characters_data
+                )
+                self.assertEqual(batch_result, expected)
+                self.assertEqual(str(batch_result['leftTeam']['total']), str(expected['leftTeam']['total']))
+
+    def test_parity_on_rounding_boundaries(self):
+        """Exhaustive CP sweep around .xx5 boundaries, positive and negative APS"""
+        cps = [Decimal(v).scaleb(-2) for v in range(100, 10001, 7)]
+        for aps in (Decimal('3.33'), Decimal('0.05'), Decimal('-1.15'), Decimal('9.99')):
+            for multiplier in (Decimal('1.00'), Decimal('1.25'), Decimal('1.15')):
+                expected = [calculate_role_score(cp, aps, multiplier) for cp in cps]
+                actual = role_scores_hundredths(
+                    [to_hundredths(cp) for cp in cps], to_hundredths(aps), to_hundredths(multiplier)
+                )
+                self.assertEqual([Decimal(int(v)).scaleb(-2) for v in actual], expected)
+
+    def test_totals_only_mode(self):
+        """include_breakdown=False returns totals and winners only"""
+        matches, templates_data, characters_data = self.build_fixture(42, match_count=20)
+        full = calculate_match_results_batch(matches, templates_data, characters_data)
+        totals = calculate_match_results_batch(matches, templates_data, characters_data, include_breakdown=False)
+
+        for full_result, totals_result in zip(full, totals):
+            self.assertEqual(totals_result['leftTeam'], {'total': full_result['leftTeam']['total']})
+            self.assertEqual(totals_result['rightTeam'], {'total': full_result['rightTeam']['total']})
+            self.assertEqual(totals_result['winner'], full_result['winner'])
+
+    def test_empty_teams_and_batch(self):
+        """Empty teams score 0 and draw; empty batch returns no results"""
+        self.assertEqual(calculate_match_results_batch([], {}, {}), [])
+
+        result = calculate_match_results_batch(
+            [{'template_id': 1, 'left': [], 'right': []}],
+            {1: {'specialty_match_multiplier': Decimal('1.20')}},
+            {}
+        )[0]
+        self.assertEqual(result['leftTeam']['total'], Decimal('0.00'))
+        self.assertEqual(result['winner'], 'draw')
+
+    def test_rejects_sub_hundredth_values(self):
+        """Values the fixed-point engine cannot represent are rejected"""
+        with self.assertRaises(ValueError):
+            to_hundredths(Decimal('1.005'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BatchScoreEndpointTestCase(APITestCase):
+    """Test POST /api/score/batch/"""
+
+    def setUp(self):
+        self.template = GameTemplate.objects.create(
+            name='Duel', roles_json=['CAPTAIN', 'TANK'], specialty_match_multiplier=Decimal('1.20')
+        )
+        anime = Anime.objects.create(name='Naruto', anime_power_scale=Decimal('8.00'))
+        self.characters = [
+            Character.objects.create(
+                name=f'Char {i}', anime=anime,
+                character_power=Decimal(10 * i), specialties=['CAPTAIN'] if i % 2 else ['TANK']
+            )
+            for i in range(1, 7)
+        ]
+        self.url = reverse('api:calculate_score_batch')
+
+    def match(self, left, right, template_id=None):
+        return {
+            'templateId': template_id or self.template.id,
+            'leftTeam': {'assignments': [
+                {'role': 'CAPTAIN', 'characterId': self.characters[left[0]].id},
+                {'role': 'TANK', 'characterId': self.characters[left[1]].id},
+            ]},
+            'rightTeam': {'assignments': [
+                {'role': 'CAPTAIN', 'characterId': self.characters[right[0]].id},
+                {'role': 'TANK', 'characterId': self.characters[right[1]].id},
+            ]},
+        }
+
+    def read_lines(self, response):
+        content = b''.join(response.streaming_content).decode()
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_batch_matches_single_endpoint(self):
+        """Each streamed result equals the single-match endpoint's response"""
+        matches = [self.match((0, 1), (2, 3)), self.match((4, 5), (0, 3)), self.match((1, 0), (1, 0))]
+
+        with self.assertNumQueries(2):
+            response = self.client.post(self.url, {'matches': matches}, format='json')
+            lines = self.read_lines(response)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([line['index'] for line in lines], [0, 1, 2])
+
+        for match, line in zip(matches, lines):
+            single = self.client.post(reverse('api:calculate_score'), match, format='json')
+            result = line['result']
+            self.assertEqual(result['winner'], single.data['winner'])
+            self.assertEqual(result['leftTeam']['total'], single.data['leftTeam']['total'])
+            self.assertEqual(result['rightTeam']['total'], single.data['rightTeam']['total'])
+            self.assertEqual(
+                [entry['role_score'] for entry in result['leftTeam']['breakdown']],
+                [entry['role_score'] for entry in single.data['leftTeam']['breakdown']]
+            )
+
+    def test_unknown_template_reports_per_match_error(self):
+        """A bad template fails only its own match"""
+        response = self.client.post(self.url, {
+            'matches': [self.match((0, 1), (2, 3), template_id=9999), self.match((0, 1), (2, 3))]
+        }, format='json')
+        lines = self.read_lines(response)
+
+        self.assertEqual(lines[0], {'index': 0, 'error': 'Template with ID 9999 not found'})
+        self.assertIn('result', lines[1])
+
+    def test_invalid_batch(self):
+        """Empty or malformed batches are rejected up front"""
+        response = self.client.post(self.url, {'matches': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(self.url, {'matches': [{'templateId': 1}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class LineupSolverTestCase(TestCase):
+    """Hungarian lineup solver must find the brute-force optimum"""
+
+    ROLES = ['CAPTAIN', 'VICE CAPTAIN', 'TANK', 'HEALER', 'SUPPORT', 'SUPPORT']
+
+    def random_characters(self, rng, count):
+        return {
+            character_id: {
+                'id': character_id,
+                'name': f'Char {character_id}',
+                'anime': None,
+                'image': None,
+                'character_power': Decimal(rng.randint(100, 10000)).scaleb(-2),
+                'anime_power_scale': Decimal(rng.randint(100, 1000)).scaleb(-2),
+                'specialties': rng.sample(self.ROLES[:5], rng.randint(0, 2)),
+            }
+            for character_id in range(1, count + 1)
+        }
+
+    def brute_force_best(self, roles, multiplier, characters_data):
+        ids = list(characters_data)
+        slots = min(len(roles), len(ids))
+        best = Decimal('0.00')
+        for role_subset in itertools.combinations(range(len(roles)), slots):
+            for chosen in itertools.permutations(ids, slots):
+                assignments = [
+                    {'role': roles[r], 'characterId': c} for r, c in zip(role_subset, chosen)
+                ]
+                best = max(best, calculate_team_score(assignments, roles, multiplier, characters_data)['total'])
+        return best
+
+    def test_matches_brute_force(self):
+        """Random hands, including hands smaller and larger than the roster"""
+        rng = random.Random(7)
+        for count in (3, 6, 7):
+            for _ in range(5):
+                characters_data = self.random_characters(rng, count)
+                multiplier = Decimal(rng.randint(100, 200)).scaleb(-2)
+
+                lineup = solve_best_lineup(self.ROLES, multiplier, characters_data, list(characters_data))
+                total = calculate_team_score(lineup, self.ROLES, multiplier, characters_data)['total']
+
+                self.assertEqual(total, self.brute_force_best(self.ROLES, multiplier, characters_data))
+                self.assertEqual(len(lineup), min(count, len(self.ROLES)))
+                self.assertEqual(len({a['characterId'] for a in lineup}), len(lineup))
+
+    def test_specialists_go_to_their_roles(self):
+        """Duplicate roles: both supports are filled by SUPPORT specialists"""
+        characters_data = {
+            1: {'character_power': Decimal('50.00'), 'anime_power_scale': Decimal('1.00'), 'specialties': ['SUPPORT']},
+            2: {'character_power': Decimal('50.00'), 'anime_power_scale': Decimal('1.00'), 'specialties': ['support ']},
+            3: {'character_power': Decimal('50.00'), 'anime_power_scale': Decimal('1.00'), 'specialties': ['TANK']},
+        }
+        lineup = solve_best_lineup(['TANK', 'SUPPORT', 'SUPPORT'], Decimal('2.00'), characters_data, [1, 2, 3])
+
+        self.assertEqual(lineup[0], {'role': 'TANK', 'characterId': 3})
+        self.assertEqual({a['characterId'] for a in lineup[1:]}, {1, 2})
+
+    def test_empty_inputs(self):
+        """No roles or no characters means no lineup"""
+        self.assertEqual(solve_best_lineup([], Decimal('1.20'), {}, [1]), [])
+        self.assertEqual(solve_best_lineup(['CAPTAIN'], Decimal('1.20'), {}, []), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OptimalLineupEndpointTestCase(APITestCase):
+    """Test POST /api/lineup/optimal/"""
+
+    def setUp(self):
+        self.template = GameTemplate.objects.create(
+            name='Duel', roles_json=['CAPTAIN', 'TANK'], specialty_match_multiplier=Decimal('2.00')
+        )
+        anime = Anime.objects.create(name='Naruto', anime_power_scale=Decimal('1.00'))
+        self.captain = Character.objects.create(
+            name='Captain', anime=anime, character_power=Decimal('50.00'), specialties=['CAPTAIN']
+        )
+        self.tank = Character.objects.create(
+            name='Tank', anime=anime, character_power=Decimal('40.00'), specialties=['TANK']
+        )
+        self.url = reverse('api:optimal_lineup')
+
+    def test_best_and_actual(self):
+        """Swapped roles score less than the optimum"""
+        response = self.client.post(self.url, {
+            'templateId': self.template.id,
+            'characterIds': [self.tank.id, self.captain.id],
+            'assignments': [
+                {'role': 'CAPTAIN', 'characterId': self.tank.id},
+                {'role': 'TANK', 'characterId': self.captain.id},
+            ],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['best']['total'], '180.00')
+        self.assertEqual(response.data['actual']['total'], '90.00')
+        self.assertEqual(
+            [entry['character_id'] for entry in response.data['best']['breakdown']],
+            [self.captain.id, self.tank.id]
+        )
+
+    def test_without_assignments(self):
+        """actual is omitted when no assignments are sent"""
+        response = self.client.post(self.url, {
+            'templateId': self.template.id,
+            'characterIds': [self.captain.id],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['best']['total'], '100.00')
+        self.assertNotIn('actual', response.data)
+
+    def test_unknown_template(self):
+        """Unknown templateId returns 404"""
+        response = self.client.post(self.url, {'templateId': 9999, 'characterIds': [1]}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DraftSimulationTestCase(TestCase):
+    """Test the vectorized Monte Carlo draft simulation"""
+
+    def test_draws_are_distinct_per_match(self):
+        """Every simulated hand draws distinct characters, also from tiny pools"""
+        rng = np.random.default_rng(0)
+        for pool_size in (12, 20, 500):
+            picks = draw_without_replacement(rng, pool_size, 2000, 12)
+            self.assertEqual(picks.shape, (2000, 12))
+            self.assertTrue((picks < pool_size).all())
+            self.assertTrue(all(len(set(row)) == 12 for row in picks.tolist()))
+
+        with self.assertRaises(ValueError):
+            draw_without_replacement(rng, 5, 1, 6)
+
+    def test_chunk_scores_match_batch_engine(self):
+        """Simulated totals equal the batch engine on the same drafts"""
+        roles = ['CAPTAIN', 'TANK', 'SUPPORT']
+        rng = random.Random(3)
+        characters_data = {
+            i: {
+                'character_power': Decimal(rng.randint(100, 10000)).scaleb(-2),
+                'anime_power_scale': Decimal(rng.randint(100, 1000)).scaleb(-2),
+                'specialties': rng.sample(roles, rng.randint(0, 2)),
+            }
+            for i in range(30)
+        }
+        simulation = DraftSimulation(
+            cp=[to_hundredths(c['character_power']) for c in characters_data.values()],
+            aps=[to_hundredths(c['anime_power_scale']) for c in characters_data.values()],
+            specialty_matches=[
+                [check_specialty_match(c['specialties'], role) for role in roles]
+                for c in characters_data.values()
+            ],
+            specialty_match_multiplier=125,
+            tiers=[0] * len(characters_data),
+        )
+
+        result = simulate_chunk(simulation, 11, 50)
+        picks = draw_without_replacement(np.random.default_rng(11), 30, 50, 6)
+        matches = [
+            {
+                'template_id': 1,
+                'left': [{'role': r, 'characterId': int(c)} for r, c in zip(roles, row[0::2])],
+                'right': [{'role': r, 'characterId': int(c)} for r, c in zip(roles, row[1::2])],
+            }
+            for row in picks
+        ]
+        expected = calculate_match_results_batch(
+            matches, {1: {'specialty_match_multiplier': Decimal('1.25')}}, characters_data,
+            include_breakdown=False
+        )
+
+        self.assertEqual(
+            [int(total) for total in result['left_totals']],
+            [to_hundredths(e['leftTeam']['total']) for e in expected]
+        )
+        self.assertEqual(
+            [int(total) for total in result['right_totals']],
+            [to_hundredths(e['rightTeam']['total']) for e in expected]
+        )
+        self.assertEqual(int(result['tier_counts'][0]), 50 * 6)
+
+    def test_simulate_template_command(self):
+        """Command runs end to end and reports every section"""
+        template = GameTemplate.objects.create(name='Standard 6v6', is_published=True)
+        anime = Anime.objects.create(name='Naruto', anime_power_scale=Decimal('5.00'))
+        for i in range(1, 21):
+            Character.objects.create(
+                name=f'Char {i}', anime=anime, character_power=Decimal(i * 5), specialties=['TANK']
+            )
+
+        out = StringIO()
+        call_command(
+            'simulate_template', template.id, anime_ids=str(anime.id),
+            matches=1000, workers=1, chunk_size=300, seed=1, stdout=out
+        )
+        output = out.getvalue()
+
+        self.assertIn('Win rates', output)
+        self.assertIn('Score distributions', output)
+        self.assertIn('Draw tier frequencies', output)
+
+    def test_simulate_template_command_rejects_empty_runs(self):
+        """No matches, or a template without roles, is a CommandError"""
+        template = GameTemplate.objects.create(name='Standard 6v6', is_published=True)
+        empty = GameTemplate.objects.create(name='Empty')
+        GameTemplate.objects.filter(pk=empty.pk).update(roles_json=[])  # save() fills in default roles
+        anime = Anime.objects.create(name='Naruto', anime_power_scale=Decimal('5.00'))
+
+        with self.assertRaisesMessage(CommandError, '--matches must be at least 1'):
+            call_command('simulate_template', template.id, anime_ids=str(anime.id), matches=0, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'has no roles'):
+            call_command('simulate_template', empty.id, anime_ids=str(anime.id), stdout=StringIO())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ListEndpointQueryCountTestCase(APITestCase):
+    """List endpoints must run a fixed number of queries regardless of size"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@test.com', 'password')
+
+    def create_content(self, anime_count, characters_per_anime=3):
+        for i in range(anime_count):
+            for owner in (None, self.user):
+                anime = Anime.objects.create(
+                    name=f'Anime {owner} {i}', owner=owner, is_public=True,
+                    anime_power_scale=Decimal('1.00')
+                )
+                for j in range(characters_per_anime):
+                    Character.objects.create(
+                        name=f'Char {i}-{j}', anime=anime, owner=owner, character_power=Decimal('10.00')
+                    )
+        return anime
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response
+
+    def assert_flat_query_count(self, url_for, maximum):
+        """Query count for a small and a 5x larger dataset must be equal"""
+        anime = self.create_content(2)
+        small, _ = self.count_queries(url_for(anime))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            anime = self.create_content(10)
+        large, response = self.count_queries(url_for(anime))
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, maximum)
+        return response
+
+    def test_list_anime(self):
+        """GET /api/anime/ reads stored counts and joins owners"""
+        self.client.force_authenticate(self.user)
+        response = self.assert_flat_query_count(lambda anime: reverse('api:list_anime'), 1)
+        self.assertEqual({a['character_count'] for a in response.data}, {3})
+        self.assertIn('owner', {a['owner_username'] for a in response.data})
+
+    def test_list_characters(self):
+        """GET /api/characters/ no longer counts once per character"""
+        self.client.force_authenticate(self.user)
+        response = self.assert_flat_query_count(lambda anime: reverse('api:list_characters'), 1)
+        self.assertEqual({c['anime']['character_count'] for c in response.data}, {3})
+
+    def test_library_anime_list(self):
+        """GET /api/library/anime/ reads stored counts and joins owners"""
+        response = self.assert_flat_query_count(lambda anime: reverse('api:library_anime_list'), 1)
+        self.assertEqual({a['character_count'] for a in response.data}, {3})
+
+    def test_my_anime_list(self):
+        """GET /api/my/anime/ reads stored counts and joins owners"""
+        self.client.force_authenticate(self.user)
+        self.assert_flat_query_count(lambda anime: reverse('api:my_anime_list'), 1)
+
+    def test_my_anime_characters(self):
+        """GET /api/my/anime/{id}/characters/ is independent of character count"""
+        self.client.force_authenticate(self.user)
+        anime = self.create_content(1, characters_per_anime=2)
+        small, _ = self.count_queries(reverse('api:my_anime_characters', args=[anime.id]))
+
+        anime = self.create_content(1, characters_per_anime=12)
+        large, response = self.count_queries(reverse('api:my_anime_characters', args=[anime.id]))
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 2)
+        self.assertEqual({c['anime']['character_count'] for c in response.data}, {12})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AnimeStatsTestCase(TestCase):
+    """Maintained character_count / draw score statistics on Anime"""
+
+    def setUp(self):
+        self.anime = Anime.objects.create(name='Stats Anime', anime_power_scale=Decimal('2.00'))
+        self.other = Anime.objects.create(name='Other Anime', anime_power_scale=Decimal('1.00'))
+
+    def create_character(self, power, anime=None, **kwargs):
+        return Character.objects.create(
+            name=kwargs.pop('name', f'Char {power}'), anime=anime or self.anime,
+            character_power=power, **kwargs
+        )
+
+    def assert_stats_match_rebuild(self):
+        """Incrementally maintained values equal a from-scratch rebuild"""
+        self.assertEqual(rebuild_anime_stats(dry_run=True), 0)
+
+    def test_counts_and_bounds_on_create(self):
+        """Creating characters updates count, bounds and mean"""
+        self.create_character(Decimal('10.00'))
+        self.create_character(Decimal('30.00'), image='characters/a.png', specialties=['TANK'])
+        self.anime.refresh_from_db()
+
+        self.assertEqual(self.anime.character_count, 2)
+        self.assertEqual(self.anime.complete_character_count, 1)
+        self.assertEqual(self.anime.min_draw_score, Decimal('20.00'))
+        self.assertEqual(self.anime.max_draw_score, Decimal('60.00'))
+        self.assertEqual(self.anime.mean_draw_score, Decimal('40.00'))
+        self.assert_stats_match_rebuild()
+
+    def test_update_and_delete_shrink_bounds(self):
+        """Lowering or deleting the max character recomputes the bounds"""
+        low = self.create_character(Decimal('10.00'))
+        high = self.create_character(Decimal('50.00'))
+
+        high.character_power = Decimal('20.00')
+        high.save()
+        self.anime.refresh_from_db()
+        self.assertEqual(self.anime.max_draw_score, Decimal('40.00'))
+
+        high.delete()
+        low.delete()
+        self.anime.refresh_from_db()
+        self.assertEqual(self.anime.character_count, 0)
+        self.assertIsNone(self.anime.min_draw_score)
+        self.assertIsNone(self.anime.mean_draw_score)
+        self.assert_stats_match_rebuild()
+
+    def test_update_queries(self):
+        """An update reuses the pre_save row; only a shrinking bound is recomputed"""
+        self.create_character(Decimal('10.00'))
+        middle = Character.objects.get(pk=self.create_character(Decimal('30.00')).pk)
+        high = Character.objects.get(pk=self.create_character(Decimal('50.00')).pk)
+
+        # pre_save SELECT, character UPDATE, statistics UPDATE
+        middle.character_power = Decimal('40.00')
+        with self.assertNumQueries(3):
+            middle.save()
+
+        # ... plus the bounds aggregate and UPDATE
+        high.character_power = Decimal('20.00')
+        with self.assertNumQueries(5):
+            high.save()
+
+        self.anime.refresh_from_db()
+        self.assertEqual(self.anime.max_draw_score, Decimal('80.00'))
+        self.assert_stats_match_rebuild()
+
+    def test_move_between_anime(self):
+        """Moving a character updates both anime"""
+        character = self.create_character(Decimal('10.00'))
+        character.anime = self.other
+        character.save()
+
+        self.anime.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.anime.character_count, 0)
+        self.assertEqual(self.other.character_count, 1)
+        self.assertEqual(self.other.max_draw_score, Decimal('10.00'))
+        self.assert_stats_match_rebuild()
+
+    def test_power_scale_change_rescales(self):
+        """Changing APS rebuilds every draw score of the anime"""
+        self.create_character(Decimal('10.00'))
+        self.anime.anime_power_scale = Decimal('3.00')
+        self.anime.save()
+
+        self.anime.refresh_from_db()
+        self.assertEqual(self.anime.max_draw_score, Decimal('30.00'))
+        self.assertEqual(self.anime.draw_score_total, Decimal('30.00'))
+
+    def test_stale_anime_save_keeps_stats(self):
+        """Saving a stale Anime instance does not overwrite the statistics"""
+        stale = Anime.objects.get(pk=self.anime.pk)
+        self.create_character(Decimal('10.00'))
+
+        stale.name = 'Renamed'
+        stale.save()
+
+        self.anime.refresh_from_db()
+        self.assertEqual(self.anime.name, 'Renamed')
+        self.assertEqual(self.anime.character_count, 1)
+
+    def test_rebuild_command_repairs_drift(self):
+        """rebuild_anime_stats fixes values changed behind the signals' back"""
+        self.create_character(Decimal('10.00'))
+        Anime.objects.filter(pk=self.anime.pk).update(character_count=99, max_draw_score=None)
+
+        out = StringIO()
+        call_command('rebuild_anime_stats', stdout=out)
+
+        self.assertIn('1 anime corrected', out.getvalue())
+        self.anime.refresh_from_db()
+        self.assertEqual(self.anime.character_count, 1)
+        self.assertEqual(self.anime.max_draw_score, Decimal('20.00'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogCacheTestCase(APITestCase):
+    """Versioned, ETag-aware cache of the gameplay catalog endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('player', 'player@test.com', 'password')
+        self.anime = Anime.objects.create(name='Catalog Anime', anime_power_scale=Decimal('1.00'))
+        Character.objects.create(name='Catalog Char', anime=self.anime, character_power=Decimal('10.00'))
+        GameTemplate.objects.create(name='Catalog Template', is_published=True)
+
+    def test_anonymous_hit_skips_database(self):
+        """A warm anonymous request runs zero queries"""
+        for name in ('api:list_templates', 'api:list_anime', 'api:list_characters'):
+            first = self.client.get(reverse(name))
+            with self.assertNumQueries(0):
+                second = self.client.get(reverse(name))
+            self.assertEqual(first.data, second.data)
+            self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_if_none_match_returns_304(self):
+        """A matching ETag is answered with 304 and no body"""
+        etag = self.client.get(reverse('api:list_anime'))['ETag']
+
+        response = self.client.get(reverse('api:list_anime'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(reverse('api:list_anime'), HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_writes_invalidate(self):
+        """Character, anime and template writes change the cached responses"""
+        url = reverse('api:list_characters') + f'?anime_ids={self.anime.id}'
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Character.objects.create(name='New Char', anime=self.anime, character_power=Decimal('5.00'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+        anime_etag = self.client.get(reverse('api:list_anime'))['ETag']
+        self.anime.name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.anime.save()
+        response = self.client.get(reverse('api:list_anime'))
+        self.assertNotEqual(response['ETag'], anime_etag)
+        self.assertEqual(response.data[0]['name'], 'Renamed')
+
+        self.assertEqual(len(self.client.get(reverse('api:list_templates')).data), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            GameTemplate.objects.create(name='Second Template', is_published=True)
+        self.assertEqual(len(self.client.get(reverse('api:list_templates')).data), 2)
+
+    def test_rating_invalidates_on_commit(self):
+        """The catalog is invalidated once the rating aggregates are committed"""
+        self.client.get(reverse('api:list_anime'))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            AnimeRating.objects.create(anime=self.anime, user=self.user, rating=4)
+        self.assertEqual(self.client.get(reverse('api:list_anime')).data[0]['total_ratings'], 0)
+
+        for callback in callbacks:
+            callback()
+        response = self.client.get(reverse('api:list_anime'))
+        self.assertEqual(response.data[0]['total_ratings'], 1)
+        self.assertEqual(response.data[0]['average_rating'], '4.00')
+
+    def test_user_scope(self):
+        """Authenticated users see their own content; other owners do not leak"""
+        self.client.get(reverse('api:list_anime'))
+        Anime.objects.create(name='Mine', owner=self.user)
+
+        self.assertEqual(len(self.client.get(reverse('api:list_anime')).data), 1)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(len(self.client.get(reverse('api:list_anime')).data), 2)
+
+        other = User.objects.create_user('other', 'other@test.com', 'password')
+        self.client.force_authenticate(other)
+        self.assertEqual(len(self.client.get(reverse('api:list_anime')).data), 1)
+
+    def test_invalid_anime_ids_not_cached(self):
+        """Malformed anime_ids still reports 400"""
+        response = self.client.get(reverse('api:list_characters') + '?anime_ids=abc')
+        self.assertEqual(response.status_code, 400)
+
+
+class ImportAnimeTestCase(APITestCase):
+    """Bulk, transactional import of a public anime"""
+
+    def setUp(self):
+        self.creator = User.objects.create_user(username='creator', password='pass12345')
+        self.user = User.objects.create_user(username='importer', password='pass12345')
+        self.source = Anime.objects.create(
+            owner=self.creator, name='Public Anime', anime_power_scale=Decimal('2.00'),
+            is_public=True, image='anime/source.png'
+        )
+        self.client.force_authenticate(self.user)
+
+    def add_characters(self, count):
+        for i in range(count):
+            Character.objects.create(
+                owner=self.creator, anime=self.source, name=f'Char {i}',
+                character_power=Decimal(i + 1), specialties=['TANK'], image='characters/c.png'
+            )
+
+    def import_queries(self, count):
+        self.add_characters(count)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('api:import_anime', args=[self.source.pk]))
+        self.assertEqual(response.status_code, 201)
+        Anime.objects.filter(owner=self.user).delete()
+        return len(queries)
+
+    def test_import_copies_characters_and_stats(self):
+        self.add_characters(3)
+        response = self.client.post(reverse('api:import_anime', args=[self.source.pk]))
+        self.assertEqual(response.status_code, 201)
+
+        copy = Anime.objects.get(owner=self.user)
+        self.assertFalse(copy.is_public)
+        self.assertEqual(copy.image.name, 'anime/source.png')
+        self.assertEqual(copy.original_creator_username, 'creator')
+        self.assertEqual(
+            sorted(copy.characters.values_list('name', 'character_power', 'specialties', 'owner_id')),
+            [(f'Char {i}', Decimal(i + 1), ['TANK'], self.user.pk) for i in range(3)]
+        )
+        self.assertEqual(copy.character_count, 3)
+        self.assertEqual(copy.max_draw_score, Decimal('6.00'))
+        self.assertEqual(rebuild_anime_stats(dry_run=True), 0)
+
+    def test_constant_queries(self):
+        """Importing many characters costs no more queries than a few"""
+        self.assertEqual(self.import_queries(2), self.import_queries(100))
+
+    def test_async_import(self):
+        """?async=true returns 202 and a job to poll"""
+        self.add_characters(2)
+        with patch.object(anime_import.IMPORT_EXECUTOR, 'submit') as submit:
+            response = self.client.post(reverse('api:import_anime', args=[self.source.pk]) + '?async=true')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['job_id']
+        status_url = reverse('api:import_anime_job', args=[job_id])
+        self.assertTrue(response.data['status_url'].endswith(status_url))
+        self.assertEqual(self.client.get(status_url).data['status'], 'pending')
+
+        anime_import.run_import_job(*submit.call_args.args[1:])
+        job = self.client.get(status_url).data
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual(job['anime']['name'], 'Public Anime')
+        self.assertEqual(Character.objects.filter(owner=self.user).count(), 2)
+
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(status_url).status_code, 404)
+
+    def test_duplicate_checked_when_job_runs(self):
+        """Two queued imports of the same anime produce one copy"""
+        self.add_characters(2)
+        url = reverse('api:import_anime', args=[self.source.pk]) + '?async=true'
+        with patch.object(anime_import.IMPORT_EXECUTOR, 'submit') as submit:
+            self.client.post(url)
+            self.client.post(url)
+        jobs = [call.args[1:] for call in submit.call_args_list]
+        self.assertEqual(len(jobs), 2)
+
+        for job in jobs:
+            anime_import.run_import_job(*job)
+        self.assertEqual(anime_import.get_import_job(jobs[0][0])['status'], 'completed')
+        self.assertEqual(
+            anime_import.get_import_job(jobs[1][0]),
+            {'status': 'failed', 'owner_id': self.user.pk, 'anime_id': None,
+             'error': 'You have already imported this anime', 'worker': anime_import.WORKER_ID}
+        )
+        self.assertEqual(Anime.objects.filter(owner=self.user).count(), 1)
+        self.assertEqual(Character.objects.filter(owner=self.user).count(), 2)
+
+    def test_visibility_checked_when_job_runs(self):
+        """A job queued before the source was made private copies nothing"""
+        self.add_characters(2)
+        with patch.object(anime_import.IMPORT_EXECUTOR, 'submit') as submit:
+            self.client.post(reverse('api:import_anime', args=[self.source.pk]) + '?async=true')
+        self.source.is_public = False
+        self.source.save()
+
+        job_id = submit.call_args.args[1]
+        anime_import.run_import_job(*submit.call_args.args[1:])
+        job = anime_import.get_import_job(job_id)
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], 'This anime is no longer available for import')
+        self.assertFalse(Anime.objects.filter(owner=self.user).exists())
+
+    def test_lost_job_reported_failed(self):
+        """A job whose process stopped its heartbeat does not stay pending"""
+        with patch.object(anime_import.IMPORT_EXECUTOR, 'submit') as submit:
+            self.client.post(reverse('api:import_anime', args=[self.source.pk]) + '?async=true')
+        job_id = submit.call_args.args[1]
+        status_url = reverse('api:import_anime_job', args=[job_id])
+        self.assertEqual(self.client.get(status_url).data['status'], 'pending')
+
+        job = anime_import.get_import_job(job_id)
+        anime_import.set_import_job(job_id, {**job, 'worker': 'restarted'})
+        response = self.client.get(status_url)
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertEqual(response.data['error'], 'Import was interrupted, please try again')
+
+
+class LibrarySearchTestCase(APITestCase):
+    """Library search over anime and character names (SQLite fallback path)"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='pass12345')
+        self.naruto = Anime.objects.create(name='Naruto Shippuden', anime_power_scale=Decimal('1.00'))
+        self.one_piece = Anime.objects.create(name='One Piece', anime_power_scale=Decimal('1.00'))
+        self.boruto = Anime.objects.create(name='Boruto', anime_power_scale=Decimal('1.00'))
+        Character.objects.create(name='Naruto Uzumaki', anime=self.boruto, character_power=Decimal('50.00'))
+        self.private = Anime.objects.create(
+            owner=self.user, name='Naruto Private', anime_power_scale=Decimal('1.00'), is_public=False
+        )
+        self.url = reverse('api:library_search')
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_prefix_and_character_matches(self):
+        """Anime name matches rank above anime matched through a character"""
+        data = self.search(q='naru')
+        self.assertEqual([anime['name'] for anime in data['results']], ['Naruto Shippuden', 'Boruto'])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_multi_word_query(self):
+        self.assertEqual([anime['name'] for anime in self.search(q='one pie')['results']], ['One Piece'])
+
+    def test_cursor_pagination(self):
+        """Pages follow each other without gaps or repeats"""
+        for i in range(5):
+            Anime.objects.create(name=f'Naruto Movie {i}', anime_power_scale=Decimal('1.00'))
+
+        seen = []
+        cursor = None
+        while True:
+            params = {'q': 'naruto', 'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.search(**params)
+            seen.extend(anime['id'] for anime in data['results'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+        self.assertNotIn(self.private.id, seen)
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'naruto', 'cursor': 'bogus'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'q': 'naruto', 'limit': 'x'}).status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class KeysetPaginationTestCase(APITestCase):
+    """Cursor pagination of the list endpoints"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@test.com', 'password')
+        self.anime = []
+        for i in range(7):
+            self.anime.append(Anime.objects.create(
+                name=f'Anime {i % 3}', owner=self.user, is_public=True,
+                anime_power_scale=Decimal('1.00'), average_rating=Decimal(i % 2),
+            ))
+        # Ties on every sort key but id
+        Anime.objects.filter(pk__in=[a.pk for a in self.anime[:4]]).update(created_at=self.anime[0].created_at)
+
+    def walk(self, url, **params):
+        """Every page of a list endpoint, checking the page size"""
+        ids, cursor = [], None
+        while True:
+            page_params = {**params, 'limit': 3, **({'cursor': cursor} if cursor else {})}
+            response = self.client.get(url, page_params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 3)
+            ids.extend(item['id'] for item in response.data['results'])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_library_sorts(self):
+        """Each sort pages through every anime once, in order"""
+        url = reverse('api:library_anime_list')
+        expected = {
+            'newest': Anime.objects.order_by('-created_at', '-id'),
+            'highest_rated': Anime.objects.order_by('-average_rating', '-created_at', '-id'),
+            'most_rated': Anime.objects.order_by('-total_ratings', '-created_at', '-id'),
+        }
+        for sort, queryset in expected.items():
+            self.assertEqual(self.walk(url, sort=sort), list(queryset.values_list('id', flat=True)))
+
+    def test_my_anime_and_characters(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(
+            self.walk(reverse('api:my_anime_list')),
+            list(Anime.objects.order_by('name', 'id').values_list('id', flat=True))
+        )
+
+        characters = [
+            Character.objects.create(name=f'Char {i % 2}', anime=self.anime[0], owner=self.user)
+            for i in range(5)
+        ]
+        self.assertEqual(
+            sorted(self.walk(reverse('api:my_anime_characters', args=[self.anime[0].id]))),
+            [c.id for c in characters]
+        )
+
+    def test_pages_are_opt_in(self):
+        """List endpoints stay complete unless a page is asked for"""
+        self.client.force_authenticate(self.user)
+        for name in ('api:library_anime_list', 'api:my_anime_list', 'api:list_anime'):
+            url = reverse(name)
+            self.assertEqual(len(self.client.get(url).data), 7, name)
+            self.assertEqual(sorted(self.walk(url)), sorted(a.id for a in self.anime), name)
+        # A catalog page is cached under its own key
+        self.assertEqual(len(self.client.get(url, {'limit': 2}).data['results']), 2)
+        self.assertEqual(len(self.client.get(url).data), 7)
+
+    def test_invalid_page(self):
+        url = reverse('api:library_anime_list')
+        bogus = encode_cursor(['not a date', 'x'])
+        for params in ({'cursor': 'garbage'}, {'cursor': bogus}, {'limit': 0}, {'limit': 'ten'}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
@@ -15,6 +15,8 @@ urlpatterns = [
     path('characters/', views.list_characters, name='list_characters'),
     path('draw/', views.draw_character, name='draw_character'),
     path('score/', views.calculate_score, name='calculate_score'),
+    path('score/batch/', views.calculate_score_batch, name='calculate_score_batch'),
+    path('lineup/optimal/', views.optimal_lineup, name='optimal_lineup'),
 
     # Authentication endpoints
     path('auth/register/', views.register_user, name='register'),
@@ -35,12 +37,14 @@ urlpatterns = [
     path('my/anime/', content_views.my_anime_list, name='my_anime_list'),
     path('my/anime/<int:pk>/', content_views.my_anime_detail, name='my_anime_detail'),
     path('my/anime/import/<int:pk>/', content_views.import_anime, name='import_anime'),
+    path('my/anime/import/jobs/<str:job_id>/', content_views.import_anime_job, name='import_anime_job'),
 
     path('my/anime/<int:anime_id>/characters/', content_views.my_anime_characters, name='my_anime_characters'),
     path('my/anime/<int:anime_id>/characters/<int:char_id>/', content_views.my_anime_character_detail, name='my_anime_character_detail'),
 
     # Public library endpoints
     path('library/anime/', content_views.library_anime_list, name='library_anime_list'),
+    path('library/search/', content_views.library_search, name='library_search'),
     path('library/anime/<int:pk>/', content_views.library_anime_detail, name='library_anime_detail'),
 
     # Rating endpoints (requires authentication)
@@ -1,6 +1,7 @@
 """
 API Views for AniFight
 """
+import json
 import random
 from decimal import Decimal
 
@@ -12,7 +13,9 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import Q
+from django.http import StreamingHttpResponse
 
 from game.models import Anime, Character, GameTemplate
 from .serializers import (
@@ -23,14 +26,26 @@ from .serializers import (
     DrawRequestSerializer,
     ScoreRequestSerializer,
     ScoreResponseSerializer,
+    BatchScoreRequestSerializer,
+    OptimalLineupRequestSerializer,
+    OptimalLineupResponseSerializer,
     UserSerializer,
     UserRegistrationSerializer,
     UserLoginSerializer,
 )
-from .scoring import calculate_match_result, get_rating_tier, calculate_draw_score
+from .scoring import calculate_match_result, calculate_draw_score, calculate_team_score
+from .lineup_solver import solve_best_lineup
+from .batch_scoring import calculate_match_results_batch
+from .catalog_cache import catalog_cached
+from .pagination import keyset_page_response, wants_page
+from .pool_index import get_pool_index
+
+# Matches scored per chunk of a streamed batch response
+SCORE_BATCH_CHUNK_SIZE = 100
 
 
 @api_view(['GET'])
+@catalog_cached('templates')
 def list_templates(request):
     """
     GET /api/templates/
@@ -70,6 +85,7 @@ def list_templates(request):
 
 
 @api_view(['GET'])
+@catalog_cached('anime')
 def list_anime(request):
     """
     GET /api/anime/
@@ -91,6 +107,10 @@ def list_anime(request):
     - All admin anime
     - User's own anime (both private and public, including imported ones)
 
+    Query Parameters:
+        limit, cursor (optional): Return one keyset page,
+            {"results": [...], "next_cursor": "..." or null}, instead of the full list
+
     Response:
         [
             {
@@ -113,12 +133,15 @@ def list_anime(request):
     if request.user and request.user.is_authenticated:
         anime_query |= Q(owner=request.user)
 
-    anime = Anime.objects.filter(anime_query)
+    anime = Anime.objects.select_related('owner').filter(anime_query)
+    if wants_page(request):
+        return keyset_page_response(request, anime, ['name', 'id'], AnimeSerializer)
     serializer = AnimeSerializer(anime, many=True, context={'request': request})
     return Response(serializer.data)
 
 
 @api_view(['GET'])
+@catalog_cached('characters')
 def list_characters(request):
     """
     GET /api/characters/?anime_ids=1,2,3
@@ -134,6 +157,8 @@ def list_characters(request):
 
     Query Parameters:
         anime_ids (optional): Comma-separated list of anime IDs
+        limit, cursor (optional): Return one keyset page,
+            {"results": [...], "next_cursor": "..." or null}, instead of the full list
 
     Response:
         [
@@ -159,7 +184,7 @@ def list_characters(request):
     if request.user and request.user.is_authenticated:
         anime_query |= Q(anime__owner=request.user)
 
-    characters = Character.objects.select_related('anime').filter(anime_query)
+    characters = Character.objects.select_related('anime__owner').filter(anime_query)
 
     # Filter by anime IDs if provided
     if anime_ids_param:
@@ -174,6 +199,8 @@ def list_characters(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    if wants_page(request):
+        return keyset_page_response(request, characters, ['name', 'id'], CharacterListSerializer)
     serializer = CharacterListSerializer(characters, many=True, context={'request': request})
     return Response(serializer.data)
 
@@ -188,17 +215,23 @@ def draw_character(request):
     Request body:
         {
             "remainingCharacterIds": [1, 2, 3, 4, ...],
-            "seed": 12345 (optional)
+            "seed": 12345 (optional),
+            "templateId": 1 (optional),
+            "animeIds": [1, 2] (optional)
         }
 
     Response:
         {
             "character": {...},  // Full character data with nested anime
-            "rating": {
+            "rating": {          // Only when templateId is given
                 "tier": "S",
                 "label": "INSANE PULL!"
             }
         }
+
+    The rating is the drawn character's draw score percentile within the full
+    pool (all characters of animeIds), looked up in a cached PoolScoreIndex.
+    When animeIds is omitted the pool is the anime of the remaining characters.
     """
     serializer = DrawRequestSerializer(data=request.data)
 
@@ -232,18 +265,33 @@ def draw_character(request):
 
     # Serialize character
     character_serializer = CharacterDetailSerializer(character, context={'request': request})
+    response_data = {'character': character_serializer.data}
 
-    # For rating, we need to know the full pool and template rating bands
-    # Since we don't have template context here, we'll return just the character
-    # Frontend can calculate the rating based on the pool it has
+    # Rate the pull server-side when the template is known
+    template_id = serializer.validated_data.get('templateId')
+    if template_id is not None:
+        try:
+            template = GameTemplate.objects.only('rating_bands_json').get(id=template_id)
+        except GameTemplate.DoesNotExist:
+            return Response(
+                {'error': f'Template with ID {template_id} not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
-    # However, if we want to calculate rating here, we'd need the full pool data
-    # For now, return character only and let frontend handle rating
-    # OR we can add template_id to the request and calculate it server-side
+        anime_ids = serializer.validated_data.get('animeIds')
+        if not anime_ids:
+            anime_ids = Character.objects.filter(
+                id__in=remaining_ids, anime_id__isnull=False
+            ).values_list('anime_id', flat=True).distinct()
 
-    return Response({
-        'character': character_serializer.data
-    })
+        draw_score = calculate_draw_score(
+            character.character_power,
+            character.anime.anime_power_scale if character.anime else None
+        )
+        tier, label = get_pool_index(anime_ids).rating_tier(draw_score, template.rating_bands_json)
+        response_data['rating'] = {'tier': tier, 'label': label}
+
+    return Response(response_data)
 
 
 @api_view(['POST'])
@@ -320,30 +368,10 @@ def calculate_score(request):
         all_character_ids.add(assignment['characterId'])
 
     # Fetch all characters at once
-    characters = Character.objects.select_related('anime').filter(id__in=all_character_ids)
-
-    # Build character data dict
-    characters_data = {}
-    for char in characters:
-        characters_data[char.id] = {
-            'id': char.id,
-            'name': char.name,
-            'image': request.build_absolute_uri(char.image.url) if char.image else None,
-            'anime': {
-                'id': char.anime.id,
-                'name': char.anime.name,
-                'image': request.build_absolute_uri(char.anime.image.url) if char.anime and char.anime.image else None
-            } if char.anime else None,
-            'anime_power_scale': char.anime.anime_power_scale if char.anime else None,
-            'character_power': char.character_power,
-            'specialties': char.specialties if char.specialties else []
-        }
+    characters_data = build_characters_data(request, all_character_ids)
 
     # Prepare template data
-    template_data = {
-        'specialty_match_multiplier': template.specialty_match_multiplier,
-        'roles_json': template.roles_json
-    }
+    template_data = build_template_data(template)
 
     # Calculate match result
     result = calculate_match_result(
@@ -359,6 +387,186 @@ def calculate_score(request):
     return Response(response_serializer.data)
 
 
+@api_view(['POST'])
+def calculate_score_batch(request):
+    """
+    POST /api/score/batch/
+
+    Scores many matches in one request (tournament tooling, replays)
+
+    All templates and all characters referenced by the batch are fetched
+    with one query each, matches are scored by the NumPy batch engine, and
+    results are streamed back as newline-delimited JSON, one line per match
+    in request order, as each chunk of matches is scored.
+
+    Request body:
+        {
+            "matches": [
+                {
+                    "templateId": 1,
+                    "leftTeam": {"assignments": [{"role": "CAPTAIN", "characterId": 1}, ...]},
+                    "rightTeam": {"assignments": [{"role": "CAPTAIN", "characterId": 2}, ...]}
+                },
+                ...
+            ]
+        }
+
+    Response (application/x-ndjson):
+        {"index": 0, "result": {"leftTeam": {...}, "rightTeam": {...}, "winner": "left"}}
+        {"index": 1, "error": "Template with ID 99 not found"}
+        ...
+    """
+    serializer = BatchScoreRequestSerializer(data=request.data)
+
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    matches = [
+        {
+            'template_id': match['templateId'],
+            'left': match['leftTeam']['assignments'],
+            'right': match['rightTeam']['assignments'],
+        }
+        for match in serializer.validated_data['matches']
+    ]
+
+    # Dedupe template and character fetches across the whole batch
+    template_ids = {match['template_id'] for match in matches}
+    templates_data = {
+        template.id: build_template_data(template)
+        for template in GameTemplate.objects.filter(id__in=template_ids)
+    }
+
+    all_character_ids = {
+        assignment['characterId']
+        for match in matches
+        for assignment in match['left'] + match['right']
+    }
+    characters_data = build_characters_data(request, all_character_ids)
+
+    def stream_results():
+        for chunk_start in range(0, len(matches), SCORE_BATCH_CHUNK_SIZE):
+            chunk = list(enumerate(
+                matches[chunk_start:chunk_start + SCORE_BATCH_CHUNK_SIZE],
+                start=chunk_start
+            ))
+            scorable = [(index, match) for index, match in chunk if match['template_id'] in templates_data]
+            results = iter(calculate_match_results_batch(
+                [match for _, match in scorable], templates_data, characters_data
+            ))
+
+            lines = []
+            for index, match in chunk:
+                if match['template_id'] in templates_data:
+                    line = {'index': index, 'result': next(results)}
+                else:
+                    line = {'index': index, 'error': f"Template with ID {match['template_id']} not found"}
+                lines.append(json.dumps(line, cls=DjangoJSONEncoder))
+            yield '\n'.join(lines) + '\n'
+
+    return StreamingHttpResponse(stream_results(), content_type='application/x-ndjson')
+
+
+@api_view(['POST'])
+def optimal_lineup(request):
+    """
+    POST /api/lineup/optimal/
+
+    Computes the best possible lineup for a drawn hand: the role assignment
+    that maximizes the team score under the template's rules. Optionally
+    scores the player's actual assignments too, so results can show
+    "you scored X of a possible Y".
+
+    Request body:
+        {
+            "templateId": 1,
+            "characterIds": [1, 2, 3, 4, 5, 6],
+            "assignments": [  // optional
+                {"role": "CAPTAIN", "characterId": 1},
+                ...
+            ]
+        }
+
+    Response:
+        {
+            "best": {
+                "breakdown": [...],  // same entries as POST /api/score/
+                "total": 5400.00
+            },
+            "actual": {...}  // only when assignments are given
+        }
+    """
+    serializer = OptimalLineupRequestSerializer(data=request.data)
+
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    template_id = serializer.validated_data['templateId']
+    character_ids = list(dict.fromkeys(serializer.validated_data['characterIds']))
+    assignments = serializer.validated_data.get('assignments')
+
+    try:
+        template = GameTemplate.objects.get(id=template_id)
+    except GameTemplate.DoesNotExist:
+        return Response(
+            {'error': f'Template with ID {template_id} not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    all_character_ids = set(character_ids)
+    for assignment in assignments or []:
+        all_character_ids.add(assignment['characterId'])
+    characters_data = build_characters_data(request, all_character_ids)
+
+    template_roles = template.roles_json
+    multiplier = template.specialty_match_multiplier
+
+    best_assignments = solve_best_lineup(template_roles, multiplier, characters_data, character_ids)
+    result = {
+        'best': calculate_team_score(best_assignments, template_roles, multiplier, characters_data)
+    }
+    if assignments is not None:
+        result['actual'] = calculate_team_score(assignments, template_roles, multiplier, characters_data)
+
+    return Response(OptimalLineupResponseSerializer(result).data)
+
+
+def build_template_data(template):
+    """Template configuration needed by the scoring engines"""
+    return {
+        'specialty_match_multiplier': template.specialty_match_multiplier,
+        'roles_json': template.roles_json
+    }
+
+
+def build_characters_data(request, character_ids):
+    """
+    Fetch characters (single query) into the dict shape used by scoring
+
+    Returns:
+        Dict mapping character IDs to character data
+    """
+    characters = Character.objects.select_related('anime').filter(id__in=character_ids)
+    return {char.id: character_scoring_data(request, char) for char in characters}
+
+
+def character_scoring_data(request, char):
+    """One character (with its anime selected) in the dict shape used by scoring"""
+    return {
+        'id': char.id,
+        'name': char.name,
+        'image': request.build_absolute_uri(char.image.url) if char.image else None,
+        'anime': {
+            'id': char.anime.id,
+            'name': char.anime.name,
+            'image': request.build_absolute_uri(char.anime.image.url) if char.anime and char.anime.image else None
+        } if char.anime else None,
+        'anime_power_scale': char.anime.anime_power_scale if char.anime else None,
+        'character_power': char.character_power,
+        'specialties': char.specialties if char.specialties else []
+    }
+
+
 # ============================================
 # AUTHENTICATION VIEWS
 # ============================================
@@ -146,10 +146,17 @@ class AnimeAdmin(ImportExportModelAdmin):
     search_fields = ('name', 'owner__username')  # Required for autocomplete
     list_filter = ('is_public', 'created_at', 'updated_at')
     ordering = ('name',)
+    list_select_related = ('owner',)
 
-    readonly_fields = ('created_at', 'updated_at', 'average_rating', 'total_ratings')
+    readonly_fields = (
+        'created_at', 'updated_at', 'average_rating', 'total_ratings',
+        'character_count', 'complete_character_count', 'min_draw_score', 'max_draw_score', 'mean_draw_score',
+    )
 
-    fields = ('owner', 'name', 'anime_power_scale', 'is_public', 'image', 'average_rating', 'total_ratings')
+    fields = (
+        'owner', 'name', 'anime_power_scale', 'is_public', 'image', 'average_rating', 'total_ratings',
+        'character_count', 'complete_character_count', 'min_draw_score', 'max_draw_score', 'mean_draw_score',
+    )
 
     def owner_display(self, obj):
         """Display owner or 'Admin' if null"""
@@ -158,11 +165,6 @@ class AnimeAdmin(ImportExportModelAdmin):
         return 'Admin'
     owner_display.short_description = 'Owner'
 
-    def character_count(self, obj):
-        """Display the number of characters for this anime"""
-        return obj.characters.count()
-    character_count.short_description = 'Characters'
-
     def image_preview(self, obj):
         """Show small image preview in list view"""
         if obj.image:
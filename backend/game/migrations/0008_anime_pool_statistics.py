@@ -0,0 +1,67 @@
+# Generated by Django 4.2.25 on 2026-10-16 22:42
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+
+
+def populate_pool_statistics(apps, schema_editor):
+    """Fill the new statistics columns from the existing characters"""
+    Anime = apps.get_model('game', 'Anime')
+    Character = apps.get_model('game', 'Character')
+
+    stats = {}
+    for anime_id, name, image, cp, specialties, aps in Character.objects.filter(
+        anime__isnull=False
+    ).values_list('anime_id', 'name', 'image', 'character_power', 'specialties', 'anime__anime_power_scale'):
+        entry = stats.setdefault(anime_id, {'count': 0, 'complete': 0, 'scores': []})
+        entry['count'] += 1
+        if name is not None and image and cp is not None and specialties:
+            entry['complete'] += 1
+        score = (cp or Decimal('0')) * (aps or Decimal('0'))
+        entry['scores'].append(score.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP))
+
+    for anime_id, entry in stats.items():
+        Anime.objects.filter(pk=anime_id).update(
+            character_count=entry['count'],
+            complete_character_count=entry['complete'],
+            min_draw_score=min(entry['scores']),
+            max_draw_score=max(entry['scores']),
+            draw_score_total=sum(entry['scores']),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0007_alter_anime_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anime',
+            name='character_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of characters (maintained automatically)'),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='complete_character_count',
+            field=models.PositiveIntegerField(default=0, help_text='Characters with name, image, power and specialties filled (maintained automatically)'),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='draw_score_total',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Sum of character draw scores, for the mean (maintained automatically)', max_digits=16),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='max_draw_score',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Highest character draw score (CP x APS) in this anime (maintained automatically)', max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='anime',
+            name='min_draw_score',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Lowest character draw score (CP x APS) in this anime (maintained automatically)', max_digits=12, null=True),
+        ),
+        migrations.RunPython(populate_pool_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.25 on 2026-10-16 22:46
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_rating_sum(apps, schema_editor):
+    """Seed the running sum from the existing ratings"""
+    Anime = apps.get_model('game', 'Anime')
+    AnimeRating = apps.get_model('game', 'AnimeRating')
+
+    sums = AnimeRating.objects.order_by().values('anime_id').annotate(total=Sum('rating')).values_list('anime_id', 'total')
+    for anime_id, total in sums:
+        Anime.objects.filter(pk=anime_id).update(rating_sum=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0008_anime_pool_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anime',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, help_text='Sum of all rating values, kept with total_ratings for the average'),
+        ),
+        migrations.RunPython(populate_rating_sum, migrations.RunPython.noop),
+    ]
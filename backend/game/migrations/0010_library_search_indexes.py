@@ -0,0 +1,38 @@
+# Generated by Django 4.2.25 on 2026-10-16 23:40
+
+from django.db import migrations
+
+# GIN indexes backing api.library_search on PostgreSQL. The expressions must
+# stay identical to the ones library_search queries with.
+SEARCH_INDEXES = [
+    ('game_anime_name_trgm', 'game_anime', 'name gin_trgm_ops'),
+    ('game_character_name_trgm', 'game_character', 'name gin_trgm_ops'),
+    ('game_anime_name_tsv', 'game_anime', "to_tsvector('simple'::regconfig, name)"),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    """PostgreSQL only: other databases use the unindexed fallback search"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, expression in SEARCH_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({expression})')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0009_anime_rating_sum'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
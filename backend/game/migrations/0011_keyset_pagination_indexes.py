@@ -0,0 +1,33 @@
+# Generated by Django 4.2.25 on 2026-10-16 23:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0010_library_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='anime',
+            index=models.Index(fields=['created_at', 'id'], name='anime_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='anime',
+            index=models.Index(fields=['average_rating', 'created_at', 'id'], name='anime_rating_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='anime',
+            index=models.Index(fields=['total_ratings', 'created_at', 'id'], name='anime_ratings_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='anime',
+            index=models.Index(fields=['owner', 'name', 'id'], name='anime_owner_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['anime', 'name', 'id'], name='character_anime_name_id_idx'),
+        ),
+    ]
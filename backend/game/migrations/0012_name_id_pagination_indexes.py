@@ -0,0 +1,21 @@
+# Generated by Django 4.2.25 on 2026-10-16 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0011_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='anime',
+            index=models.Index(fields=['name', 'id'], name='anime_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['name', 'id'], name='character_name_id_idx'),
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import models, transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Value, When
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
 
@@ -44,23 +47,96 @@ class Anime(models.Model):
         default=0,
         help_text='Total number of ratings received'
     )
+    rating_sum = models.PositiveIntegerField(
+        default=0,
+        help_text='Sum of all rating values, kept with total_ratings for the average'
+    )
     original_creator_username = models.CharField(
         max_length=255,
         null=True,
         blank=True,
         help_text='Original creator username if this anime was imported from another user'
     )
+
+    # Character pool statistics, maintained on Character save/delete (see api.anime_stats)
+    character_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Number of characters (maintained automatically)'
+    )
+    complete_character_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Characters with name, image, power and specialties filled (maintained automatically)'
+    )
+    min_draw_score = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text='Lowest character draw score (CP x APS) in this anime (maintained automatically)'
+    )
+    max_draw_score = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text='Highest character draw score (CP x APS) in this anime (maintained automatically)'
+    )
+    draw_score_total = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        help_text='Sum of character draw scores, for the mean (maintained automatically)'
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Only ever written by atomic updates, never by a full-row save
+    STATS_FIELDS = (
+        'character_count', 'complete_character_count',
+        'min_draw_score', 'max_draw_score', 'draw_score_total',
+    )
+    RATING_FIELDS = ('average_rating', 'total_ratings', 'rating_sum')
+
     class Meta:
         verbose_name = 'Anime'
         verbose_name_plural = 'Anime'
         ordering = ['name']
+        # Keyset pagination keys of the library sorts, the owner's list and
+        # the game setup list of admin plus own anime, which spans owners
+        # (see api.pagination); descending pages scan them backwards
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='anime_created_id_idx'),
+            models.Index(fields=['average_rating', 'created_at', 'id'], name='anime_rating_created_id_idx'),
+            models.Index(fields=['total_ratings', 'created_at', 'id'], name='anime_ratings_created_id_idx'),
+            models.Index(fields=['owner', 'name', 'id'], name='anime_owner_name_id_idx'),
+            models.Index(fields=['name', 'id'], name='anime_name_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # A full save of an existing row must not overwrite the maintained
+        # statistics with the (possibly stale) values loaded on this instance
+        if self.pk and not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.STATS_FIELDS
+                and field.name not in self.RATING_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def mean_draw_score(self):
+        """Average character draw score, or None without characters"""
+        if not self.character_count:
+            return None
+        return (self.draw_score_total / self.character_count).quantize(
+            Decimal('0.01'), rounding=ROUND_HALF_UP
+        )
+
 
 class Character(models.Model):
     """
@@ -109,6 +185,12 @@ class Character(models.Model):
         verbose_name = 'Character'
         verbose_name_plural = 'Characters'
         ordering = ['name']
+        indexes = [
+            # Keyset pagination of an anime's characters, and of the game
+            # setup list across anime (see api.pagination)
+            models.Index(fields=['anime', 'name', 'id'], name='character_anime_name_id_idx'),
+            models.Index(fields=['name', 'id'], name='character_name_id_idx'),
+        ]
 
     def __str__(self):
         if self.anime:
@@ -221,29 +303,83 @@ class AnimeRating(models.Model):
 
     def save(self, *args, **kwargs):
         """
-        When a rating is saved or updated, recalculate the anime's average rating
+        When a rating is saved or updated, apply the change to the anime's rating
         """
-        super().save(*args, **kwargs)
-        self.update_anime_rating()
+        with transaction.atomic():
+            previous = None
+            if self.pk and not self._state.adding:
+                # Lock our own row so a concurrent update cannot apply the same delta
+                previous = (
+                    AnimeRating.objects.select_for_update()
+                    .filter(pk=self.pk)
+                    .values_list('rating', flat=True)
+                    .first()
+                )
+            super().save(*args, **kwargs)
+
+            if previous is None:
+                self.apply_rating_delta(self.anime_id, count_delta=1, sum_delta=int(self.rating))
+            else:
+                self.apply_rating_delta(self.anime_id, count_delta=0, sum_delta=int(self.rating) - previous)
 
     def delete(self, *args, **kwargs):
         """
-        When a rating is deleted, recalculate the anime's average rating
+        When a rating is deleted, remove it from the anime's rating
         """
-        super().delete(*args, **kwargs)
-        self.update_anime_rating()
+        with transaction.atomic():
+            current = (
+                AnimeRating.objects.select_for_update()
+                .filter(pk=self.pk)
+                .values_list('rating', flat=True)
+                .first()
+            )
+            result = super().delete(*args, **kwargs)
+            if current is not None:
+                self.apply_rating_delta(self.anime_id, count_delta=-1, sum_delta=-current)
+        return result
+
+    @staticmethod
+    def apply_rating_delta(anime_id, count_delta, sum_delta):
+        """
+        Atomically apply a rating change to the anime's running sum and count
+
+        A single UPDATE with F() expressions, so concurrent raters never lose
+        an update and the cost does not grow with the number of ratings. The
+        average is recomputed from the new sum and count inside the same
+        statement, in integer hundredths rounded half up.
+        """
+        if not count_delta and not sum_delta:
+            return
+
+        new_sum = F('rating_sum') + sum_delta
+        new_total = F('total_ratings') + count_delta
+        average = ExpressionWrapper(
+            (new_sum * 200 + new_total) / (new_total * 2) * Value(Decimal('0.01')),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        )
+
+        Anime.objects.filter(pk=anime_id).update(
+            rating_sum=new_sum,
+            total_ratings=new_total,
+            average_rating=Case(
+                When(total_ratings__gt=-count_delta, then=average),
+                default=Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=3, decimal_places=2),
+            ),
+        )
 
     def update_anime_rating(self):
         """
-        Recalculate and update the parent anime's average_rating and total_ratings
+        Recalculate the parent anime's rating from scratch (repairs drift)
         """
-        from django.db.models import Avg, Count
+        from django.db.models import Count, Sum
 
-        ratings = AnimeRating.objects.filter(anime=self.anime).aggregate(
-            avg=Avg('rating'),
+        ratings = AnimeRating.objects.filter(anime_id=self.anime_id).aggregate(
+            total=Sum('rating'),
             count=Count('id')
         )
-
-        self.anime.average_rating = round(ratings['avg'] or 0, 2)
-        self.anime.total_ratings = ratings['count'] or 0
-        self.anime.save()
+        with transaction.atomic():
+            Anime.objects.filter(pk=self.anime_id).update(
+                rating_sum=0, total_ratings=0, average_rating=Decimal('0.00')
+            )
+            self.apply_rating_delta(self.anime_id, ratings['count'], ratings['total'] or 0)
@@ -1,3 +1,143 @@
-from django.test import TestCase
+import threading
+from decimal import ROUND_HALF_UP, Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.db.models import Avg, Count, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from .models import Anime, AnimeRating
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AnimeRatingAggregationTestCase(TestCase):
+    """average_rating / total_ratings are maintained incrementally"""
+
+    def setUp(self):
+        self.anime = Anime.objects.create(name='Rated Anime', is_public=True)
+        self.users = [User.objects.create(username=f'rater{i}') for i in range(3)]
+
+    def rating_state(self):
+        self.anime.refresh_from_db()
+        return self.anime.average_rating, self.anime.total_ratings, self.anime.rating_sum
+
+    def test_create_update_delete(self):
+        """Each operation applies an exact delta"""
+        first = AnimeRating.objects.create(anime=self.anime, user=self.users[0], rating=4)
+        self.assertEqual(self.rating_state(), (Decimal('4.00'), 1, 4))
+
+        AnimeRating.objects.create(anime=self.anime, user=self.users[1], rating=5)
+        AnimeRating.objects.create(anime=self.anime, user=self.users[2], rating=5)
+        self.assertEqual(self.rating_state(), (Decimal('4.67'), 3, 14))
+
+        first.rating = 1
+        first.save()
+        self.assertEqual(self.rating_state(), (Decimal('3.67'), 3, 11))
+
+        first.delete()
+        self.assertEqual(self.rating_state(), (Decimal('5.00'), 2, 10))
+
+        AnimeRating.objects.filter(anime=self.anime).first().delete()
+        AnimeRating.objects.filter(anime=self.anime).first().delete()
+        self.assertEqual(self.rating_state(), (Decimal('0.00'), 0, 0))
+
+    def test_resave_without_change(self):
+        """Saving an unchanged rating does not count it twice"""
+        rating = AnimeRating.objects.create(anime=self.anime, user=self.users[0], rating=3)
+        rating.save()
+        self.assertEqual(self.rating_state(), (Decimal('3.00'), 1, 3))
+
+    def test_stale_anime_save_keeps_rating(self):
+        """Saving a stale Anime instance does not overwrite the rating"""
+        stale = Anime.objects.get(pk=self.anime.pk)
+        AnimeRating.objects.create(anime=self.anime, user=self.users[0], rating=2)
+
+        stale.name = 'Renamed'
+        stale.save()
+        self.assertEqual(self.rating_state(), (Decimal('2.00'), 1, 2))
+
+    def test_update_anime_rating_repairs_drift(self):
+        """update_anime_rating recomputes from scratch"""
+        rating = AnimeRating.objects.create(anime=self.anime, user=self.users[0], rating=4)
+        Anime.objects.filter(pk=self.anime.pk).update(total_ratings=7, rating_sum=30, average_rating=Decimal('1.00'))
+
+        rating.update_anime_rating()
+        self.assertEqual(self.rating_state(), (Decimal('4.00'), 1, 4))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AnimeRatingConcurrencyTestCase(TransactionTestCase):
+    """Parallel raters must not lose updates"""
+
+    RATERS = 12
+
+    def setUp(self):
+        self.anime = Anime.objects.create(name='Popular Anime', is_public=True)
+        self.users = [User.objects.create(username=f'rater{i}') for i in range(self.RATERS)]
+
+    def run_in_parallel(self, operation):
+        """Run operation(index) for every rater at once, each on its own connection"""
+        barrier = threading.Barrier(self.RATERS)
+        errors = []
+
+        def worker(index):
+            try:
+                barrier.wait()
+                while True:
+                    try:
+                        operation(index)
+                        break
+                    except OperationalError as error:
+                        # SQLite's shared-cache test database rejects concurrent
+                        # writers instead of queueing them; retry the whole operation
+                        if 'locked' not in str(error):
+                            raise
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.RATERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def assert_matches_ratings(self):
+        self.anime.refresh_from_db()
+        expected = AnimeRating.objects.filter(anime=self.anime).aggregate(
+            avg=Avg('rating'), count=Count('id'), total=Sum('rating')
+        )
+        self.assertEqual(self.anime.total_ratings, expected['count'])
+        self.assertEqual(self.anime.rating_sum, expected['total'] or 0)
+        self.assertEqual(
+            self.anime.average_rating,
+            Decimal(expected['avg'] or 0).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+        )
+
+    def test_parallel_create_update_delete(self):
+        """Concurrent creates, updates and deletes all land"""
+        self.run_in_parallel(lambda i: AnimeRating.objects.create(
+            anime_id=self.anime.pk, user=self.users[i], rating=i % 5 + 1
+        ))
+        self.assert_matches_ratings()
+        self.assertEqual(self.anime.total_ratings, self.RATERS)
+
+        def update(i):
+            rating = AnimeRating.objects.get(anime_id=self.anime.pk, user=self.users[i])
+            rating.rating = 5 - i % 5
+            rating.save()
+
+        self.run_in_parallel(update)
+        self.assert_matches_ratings()
+
+        def delete_even(i):
+            if i % 2 == 0:
+                AnimeRating.objects.get(anime_id=self.anime.pk, user=self.users[i]).delete()
+
+        self.run_in_parallel(delete_even)
+        self.assert_matches_ratings()
+        self.assertEqual(self.anime.total_ratings, self.RATERS // 2)
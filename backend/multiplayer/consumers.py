@@ -2,14 +2,22 @@ import json
 import asyncio
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.core.cache import cache
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from redis.exceptions import ResponseError
 from .models import MultiplayerRoom, GameAction
-from .game_state_manager import GameStateManager
+from .game_state_manager import ACTION_FLUSH_INTERVAL, GameStateManager
+from .draw_pool import ScopeRequest, build_room_pool
+from .encoding import dumps
+from .presence import PresenceTracker, flush_presence_if_due
+from .scheduler import get_scheduler
 import logging
 
 logger = logging.getLogger(__name__)
 
+DISCONNECT_GRACE_PERIOD = 10  # seconds before a disconnected player ends the game
+
 
 class GameConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for multiplayer game communication"""
@@ -17,12 +25,16 @@ class GameConsumer(AsyncWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.room_code = None
+        self.room_id = None  # MultiplayerRoom PK, cached at connect
         self.room_group_name = None
         self.player_role = None  # 'host' or 'guest'
         self.session_id = None
-        self.heartbeat_task = None
-        self.disconnect_timer = None
+        self.heartbeat_registered = False
+        self.disconnect_timer = None  # scheduler.Timer
         self.game_state_manager = None
+        self.presence = None
+        self.flush_timer = None  # scheduler.Timer of the next time-based flush
+        self.size_flush_task = None
 
     async def connect(self):
         """Handle WebSocket connection"""
@@ -58,6 +70,7 @@ class GameConsumer(AsyncWebsocketConsumer):
                 return
 
             logger.info(f"[WS CONNECT] Room found: {room.id}")
+            self.room_id = room.id
 
             # Determine player role
             logger.info(f"[WS CONNECT] Determining role...")
@@ -81,14 +94,14 @@ class GameConsumer(AsyncWebsocketConsumer):
 
             logger.info(f"[WS CONNECT] Connection accepted!")
 
-            # Initialize game state manager
-            self.game_state_manager = GameStateManager(self.room_code)
+            # Initialize game state manager and presence tracking
+            self.game_state_manager = GameStateManager(self.room_code, room_id=self.room_id)
+            self.presence = PresenceTracker(self.room_code)
 
             # Check if this is a new connection or reconnection BEFORE updating status
-            room = await self.get_room()
-            is_first_connection = (
-                (self.player_role == 'guest' and not room.guest_connected) or
-                (self.player_role == 'host' and not room.host_connected)
+            # (the room row is only the fallback until the player has live presence)
+            is_first_connection = not self.presence.is_connected(
+                self.player_role, default=getattr(room, f'{self.player_role}_connected')
             )
 
             # Update connection status
@@ -97,9 +110,11 @@ class GameConsumer(AsyncWebsocketConsumer):
             # Cancel any pending disconnect timer
             await self.cancel_disconnect_timer()
 
-            # Send connection confirmation with current state
-            current_state = await self.game_state_manager.get_state()
-            await self.send(text_data=json.dumps({
+            # Send connection confirmation with current state (restored from
+            # the latest snapshot if the live state was lost)
+            current_state = await self.game_state_manager.get_state() or \
+                await self.game_state_manager.replay_actions(ScopeRequest(self.scope))
+            await self.send(text_data=dumps({
                 'type': 'connection_established',
                 'player_role': self.player_role,
                 'room_code': self.room_code,
@@ -110,26 +125,24 @@ class GameConsumer(AsyncWebsocketConsumer):
             if is_first_connection:
                 # First time connecting - send player_joined
                 logger.info(f"[WS CONNECT] First connection for {self.player_role}, sending player_joined")
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'player_joined',
-                        'player_role': self.player_role,
-                    }
-                )
+                await self.broadcast({
+                    'type': 'player_joined',
+                    'player_role': self.player_role,
+                }, exclude_role=self.player_role)
             else:
                 # Reconnecting - send player_reconnected
                 logger.info(f"[WS CONNECT] Reconnection for {self.player_role}, sending player_reconnected")
-                await self.channel_layer.group_send(
-                    self.room_group_name,
-                    {
-                        'type': 'player_reconnected',
-                        'player_role': self.player_role,
-                    }
-                )
+                await self.broadcast({
+                    'type': 'player_reconnected',
+                    'player_role': self.player_role,
+                }, exclude_role=self.player_role)
+
+            # Start heartbeat (pinged by the shared per-process scheduler)
+            get_scheduler().register(self)
+            self.heartbeat_registered = True
 
-            # Start heartbeat
-            self.heartbeat_task = asyncio.create_task(self.send_heartbeat())
+            # Start time-based flushing of buffered game actions
+            self.schedule_periodic_flush()
 
             logger.info(f"[WS CONNECT] Player {self.player_role} connected to room {self.room_code}")
 
@@ -142,24 +155,33 @@ class GameConsumer(AsyncWebsocketConsumer):
         """Handle WebSocket disconnection"""
         logger.info(f"Player {self.player_role} disconnected from room {self.room_code} (code: {close_code})")
 
-        # Cancel heartbeat
-        if self.heartbeat_task:
-            self.heartbeat_task.cancel()
+        # Stop heartbeat
+        if self.heartbeat_registered:
+            get_scheduler().unregister(self)
+            self.heartbeat_registered = False
+
+        # Stop periodic flushing and write out anything still buffered
+        if self.flush_timer:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        if self.game_state_manager:
+            await self.game_state_manager.flush_actions()
 
         # Update connection status
-        await self.update_connection_status(False)
+        if self.presence:
+            await self.update_connection_status(False)
+            await database_sync_to_async(flush_presence_if_due)()
 
-        # Start disconnect timer (10 seconds grace period)
-        self.disconnect_timer = asyncio.create_task(self.handle_disconnect_timeout())
+            # Start disconnect timer (grace period)
+            self.disconnect_timer = get_scheduler().call_later(
+                DISCONNECT_GRACE_PERIOD, self.handle_disconnect_timeout
+            )
 
         # Notify other player
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'player_disconnected',
-                'player_role': self.player_role,
-            }
-        )
+        await self.broadcast({
+            'type': 'player_disconnected',
+            'player_role': self.player_role,
+        }, exclude_role=self.player_role)
 
         # Leave room group
         await self.channel_layer.group_discard(
@@ -175,7 +197,7 @@ class GameConsumer(AsyncWebsocketConsumer):
 
             # Reset disconnect timer on any message
             await self.cancel_disconnect_timer()
-            await self.update_last_seen()
+            self.update_last_seen()
 
             # Route message to appropriate handler
             if message_type == 'pong':
@@ -213,71 +235,69 @@ class GameConsumer(AsyncWebsocketConsumer):
         # Update room status
         await self.update_room_status('in_progress')
 
-        # Initialize game state
+        # Initialize game state with the server-held draw pool and room snapshot
         template_id = data.get('template_id')
-        anime_pool_ids = data.get('anime_pool_ids')
-        await self.game_state_manager.initialize_game(template_id, anime_pool_ids)
+        anime_pool_ids = data.get('anime_pool_ids') or []
+        room_pool = await database_sync_to_async(build_room_pool)(
+            template_id, anime_pool_ids, ScopeRequest(self.scope)
+        )
+        await self.game_state_manager.initialize_game(template_id, anime_pool_ids, room_pool)
 
         # Broadcast to both players
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'game_started',
-                'template_id': template_id,
-                'anime_pool_ids': anime_pool_ids,
-            }
-        )
+        await self.broadcast({
+            'type': 'game_started',
+            'template_id': template_id,
+            'anime_pool_ids': anime_pool_ids,
+        })
 
     async def handle_draw_character(self, data):
-        """Handle character draw action"""
-        character_data = data.get('character')
-
-        # Update game state
-        await self.game_state_manager.add_action(
-            'DRAW_CHARACTER',
-            self.player_role,
-            {'character': character_data}
-        )
+        """Handle character draw action (the server draws; any client character is ignored)"""
+        try:
+            character, rating = await self.game_state_manager.draw_character(self.player_role)
+        except ResponseError as e:
+            await self.send_error(str(e))
+            return
+        self.flush_actions_if_full()
 
         # Broadcast to both players
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'character_drawn',
-                'character': character_data,
-                'player_role': self.player_role,
-            }
-        )
+        await self.broadcast({
+            'type': 'character_drawn',
+            'character': character,
+            'rating': rating,
+            'player_role': self.player_role,
+        })
 
     async def handle_place_character(self, data):
-        """Handle character placement"""
+        """Handle character placement (rejected unless it is a character this player drew, on their turn)"""
         character_id = data.get('character_id')
         role_name = data.get('role_name')
 
-        # Update game state
-        await self.game_state_manager.add_action(
-            'PLACE_CHARACTER',
-            self.player_role,
-            {
-                'character_id': character_id,
-                'role_name': role_name,
-            }
-        )
+        # Update game state; the script validates the placement atomically
+        try:
+            await self.game_state_manager.add_action(
+                'PLACE_CHARACTER',
+                self.player_role,
+                {
+                    'character_id': character_id,
+                    'role_name': role_name,
+                }
+            )
+        except ResponseError as e:
+            await self.send_error(str(e))
+            return
+        self.flush_actions_if_full()
 
         # Check if game is complete
         is_complete = await self.game_state_manager.is_game_complete()
 
         # Broadcast to both players
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'character_placed',
-                'character_id': character_id,
-                'role_name': role_name,
-                'player_role': self.player_role,
-                'is_complete': is_complete,
-            }
-        )
+        await self.broadcast({
+            'type': 'character_placed',
+            'character_id': character_id,
+            'role_name': role_name,
+            'player_role': self.player_role,
+            'is_complete': is_complete,
+        })
 
         # If complete, calculate and send results
         if is_complete:
@@ -285,168 +305,127 @@ class GameConsumer(AsyncWebsocketConsumer):
 
     async def handle_reset_game(self, data):
         """Handle game reset"""
+        await self.game_state_manager.flush_actions()
         await self.game_state_manager.reset()
         await self.update_room_status('ready')
 
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'game_reset',
-            }
-        )
+        await self.broadcast({
+            'type': 'game_reset',
+        })
 
     async def handle_request_sync(self, data):
         """Handle state synchronization request (for reconnection)"""
-        current_state = await self.game_state_manager.get_state()
-        await self.send(text_data=json.dumps({
+        current_state = await self.game_state_manager.get_state() or \
+            await self.game_state_manager.replay_actions(ScopeRequest(self.scope))
+        await self.send(text_data=dumps({
             'type': 'state_sync',
             'state': current_state,
         }))
 
-    # Group message handlers (broadcast receivers)
-
-    async def player_joined(self, event):
-        """Broadcast when player joins for the first time"""
-        if event['player_role'] != self.player_role:
-            await self.send(text_data=json.dumps({
-                'type': 'player_joined',
-                'player_role': event['player_role'],
-            }))
-
-    async def player_reconnected(self, event):
-        """Broadcast when player reconnects"""
-        if event['player_role'] != self.player_role:
-            await self.send(text_data=json.dumps({
-                'type': 'player_reconnected',
-                'player_role': event['player_role'],
-            }))
+    # Group message handler (broadcast receiver)
 
-    async def player_disconnected(self, event):
-        """Broadcast when player disconnects"""
-        if event['player_role'] != self.player_role:
-            await self.send(text_data=json.dumps({
-                'type': 'player_disconnected',
-                'player_role': event['player_role'],
-            }))
+    async def forward_frame(self, event):
+        """Forward a frame encoded once by the sender, verbatim"""
+        if event.get('exclude_role') != self.player_role:
+            await self.send(text_data=event['text'])
 
-    async def game_started(self, event):
-        """Broadcast game start"""
-        await self.send(text_data=json.dumps({
-            'type': 'game_started',
-            'template_id': event['template_id'],
-            'anime_pool_ids': event['anime_pool_ids'],
-        }))
+    # Utility methods
 
-    async def character_drawn(self, event):
-        """Broadcast character draw"""
-        await self.send(text_data=json.dumps({
-            'type': 'character_drawn',
-            'character': event['character'],
-            'player_role': event['player_role'],
-        }))
+    async def broadcast(self, message, exclude_role=None):
+        """
+        Send a message to everyone in the room, encoding it only once
 
-    async def character_placed(self, event):
-        """Broadcast character placement"""
-        await self.send(text_data=json.dumps({
-            'type': 'character_placed',
-            'character_id': event['character_id'],
-            'role_name': event['role_name'],
-            'player_role': event['player_role'],
-            'is_complete': event.get('is_complete', False),
-        }))
+        The channel layer carries the finished text frame and every
+        receiving consumer forwards it as is (see forward_frame).
+        """
+        await self.channel_layer.group_send(
+            self.room_group_name,
+            {
+                'type': 'forward_frame',
+                'text': dumps(message),
+                'exclude_role': exclude_role,
+            }
+        )
 
-    async def game_reset(self, event):
-        """Broadcast game reset"""
-        await self.send(text_data=json.dumps({
-            'type': 'game_reset',
-        }))
+    def schedule_periodic_flush(self):
+        self.flush_timer = get_scheduler().call_later(ACTION_FLUSH_INTERVAL, self.flush_actions_periodically)
 
-    async def game_ended(self, event):
-        """Broadcast game end"""
-        await self.send(text_data=json.dumps({
-            'type': 'game_ended',
-            'reason': event['reason'],
-            'results': event.get('results'),
-        }))
+    async def flush_actions_periodically(self):
+        """Time-based flush of buffered game actions and (when due) presence"""
+        try:
+            await self.game_state_manager.flush_actions()
+            await database_sync_to_async(flush_presence_if_due)()
+        except Exception as e:
+            logger.exception(f"Periodic action flush failed for room {self.room_code}: {e}")
 
-    # Utility methods
+        # Reschedule unless the connection closed meanwhile
+        if self.flush_timer is not None:
+            self.schedule_periodic_flush()
 
-    async def send_heartbeat(self):
-        """Send periodic heartbeat to detect connection loss"""
-        try:
-            while True:
-                await asyncio.sleep(5)
-                await self.send(text_data=json.dumps({
-                    'type': 'ping',
-                    'timestamp': timezone.now().isoformat(),
-                }))
-        except asyncio.CancelledError:
-            pass
+    def flush_actions_if_full(self):
+        """Size-based flush, run in the background so the handler does not wait"""
+        if not self.game_state_manager.should_flush():
+            return
+        if self.size_flush_task and not self.size_flush_task.done():
+            return
+        self.size_flush_task = asyncio.create_task(self.game_state_manager.flush_actions())
 
     async def send_error(self, message):
         """Send error message to client"""
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=dumps({
             'type': 'error',
             'message': message,
         }))
 
     async def cancel_disconnect_timer(self):
         """Cancel pending disconnect timer"""
-        if self.disconnect_timer and not self.disconnect_timer.done():
+        if self.disconnect_timer:
             self.disconnect_timer.cancel()
             self.disconnect_timer = None
 
     async def handle_disconnect_timeout(self):
-        """Handle player disconnect after grace period"""
-        try:
-            await asyncio.sleep(10)  # 10 second grace period
-
-            # Check if both players disconnected
-            room = await self.get_room()
-            if not room.host_connected and not room.guest_connected:
-                # Both disconnected, end game
-                await self.update_room_status('abandoned')
-                logger.info(f"Room {self.room_code} abandoned - both players disconnected")
-            elif self.player_role == 'host' and not room.host_connected:
-                # Host disconnected, end game and show results
-                await self.force_end_game('Host disconnected')
-            elif self.player_role == 'guest' and not room.guest_connected:
-                # Guest disconnected, end game and show results
-                await self.force_end_game('Guest disconnected')
-
-        except asyncio.CancelledError:
-            pass
+        """Handle player disconnect after grace period (run by the scheduler)"""
+        # Check if both players disconnected
+        presence = self.presence.load()
+        host_connected = 'host' in presence and presence['host']['connected']
+        guest_connected = 'guest' in presence and presence['guest']['connected']
+        if not host_connected and not guest_connected:
+            # Both disconnected, end game
+            await self.update_room_status('abandoned')
+            logger.info(f"Room {self.room_code} abandoned - both players disconnected")
+        elif self.player_role == 'host' and not host_connected:
+            # Host disconnected, end game and show results
+            await self.force_end_game('Host disconnected')
+        elif self.player_role == 'guest' and not guest_connected:
+            # Guest disconnected, end game and show results
+            await self.force_end_game('Guest disconnected')
 
     async def force_end_game(self, reason):
         """Force end game due to disconnect"""
+        await self.game_state_manager.flush_actions()
         await self.update_room_status('completed')
 
         # Calculate results with current state
         results = await self.calculate_results()
 
         # Broadcast to remaining player
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'game_ended',
-                'reason': reason,
-                'results': results,
-            }
-        )
+        await self.broadcast({
+            'type': 'game_ended',
+            'reason': reason,
+            'results': results,
+        })
 
     async def calculate_and_send_results(self):
         """Calculate final results and broadcast"""
+        await self.game_state_manager.flush_actions()
         results = await self.calculate_results()
         await self.update_room_status('completed')
 
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'game_ended',
-                'reason': 'Game completed',
-                'results': results,
-            }
-        )
+        await self.broadcast({
+            'type': 'game_ended',
+            'reason': 'Game completed',
+            'results': results,
+        })
 
     # Database operations
 
@@ -511,50 +490,27 @@ class GameConsumer(AsyncWebsocketConsumer):
         logger.info(f"[DETERMINE ROLE] ✗ All checks failed")
         return None
 
-    @database_sync_to_async
-    def update_connection_status(self, connected):
-        """Update player connection status"""
-        room = MultiplayerRoom.objects.get(room_code=self.room_code)
-        if self.player_role == 'host':
-            room.host_connected = connected
-            room.host_last_seen = timezone.now()
-        else:
-            room.guest_connected = connected
-            room.guest_last_seen = timezone.now()
-        room.save()
+    async def update_connection_status(self, connected):
+        """Update player connection status (Redis; written to the database by the presence flush)"""
+        self.presence.set_connected(self.player_role, connected)
 
-    @database_sync_to_async
     def update_last_seen(self):
-        """Update last seen timestamp"""
-        room = MultiplayerRoom.objects.get(room_code=self.room_code)
-        if self.player_role == 'host':
-            room.host_last_seen = timezone.now()
-        else:
-            room.guest_last_seen = timezone.now()
-        room.save()
+        """Update last seen timestamp (Redis only)"""
+        self.presence.touch(self.player_role)
 
     @database_sync_to_async
     def update_room_status(self, status):
-        """Update room status"""
-        room = MultiplayerRoom.objects.get(room_code=self.room_code)
-        room.status = status
-        if status == 'in_progress' and not room.started_at:
-            room.started_at = timezone.now()
-        elif status == 'completed' and not room.completed_at:
-            room.completed_at = timezone.now()
-        room.save()
-
-    @database_sync_to_async
-    def calculate_results(self):
-        """Calculate game results - placeholder for now"""
-        state = cache.get(f'game_state:{self.room_code}')
+        """Update room status with a single UPDATE of the changed fields"""
+        updates = {'status': status}
+        if status == 'in_progress':
+            updates['started_at'] = Coalesce('started_at', Value(timezone.now()))
+        elif status == 'completed':
+            updates['completed_at'] = Coalesce('completed_at', Value(timezone.now()))
+        MultiplayerRoom.objects.filter(pk=self.room_id).update(**updates)
+
+    async def calculate_results(self):
+        """Score the final placements from the room snapshot taken at game start (no database access)"""
+        state = await self.game_state_manager.get_state()
         if not state:
             return None
-
-        # For now, return basic results
-        # This should integrate with your existing scoring logic
-        return {
-            'host_placements': state.get('host_placements', {}),
-            'guest_placements': state.get('guest_placements', {}),
-            'winner': None,  # To be implemented with actual scoring
-        }
+        return self.game_state_manager.score_game(state)
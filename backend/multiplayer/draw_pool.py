@@ -0,0 +1,76 @@
+from api.pool_index import get_pool_index
+from api.scoring import calculate_draw_score
+from api.serializers import CharacterDetailSerializer
+from collections import namedtuple
+from game.models import Character, GameTemplate
+from rest_framework.renderers import JSONRenderer
+from .room_snapshot import RoomSnapshot
+import json
+
+RoomPool = namedtuple('RoomPool', ['draw_pool', 'snapshot'])
+
+
+class ScopeRequest:
+    """Just enough of a request for serializers to build absolute media URLs from a websocket scope"""
+
+    def __init__(self, scope):
+        headers = dict(scope.get('headers') or [])
+        self.host = headers.get(b'host', b'').decode()
+        self.scheme = 'https' if scope.get('scheme') in ('wss', 'https') else 'http'
+
+    def build_absolute_uri(self, location):
+        if not self.host:
+            return location
+        return f'{self.scheme}://{self.host}{location}'
+
+
+def build_room_pool(template_id, anime_pool_ids, request=None):
+    """
+    Everything a game needs from the database, loaded once at game start
+
+    Args:
+        request: Builds absolute media URLs (a ScopeRequest in the consumer)
+
+    Returns:
+        RoomPool of the draw pool (see build_draw_pool) and the game's
+        RoomSnapshot
+    """
+    template = GameTemplate.objects.filter(id=template_id).first()
+    characters = list(Character.objects.filter(anime_id__in=anime_pool_ids).select_related('anime'))
+
+    return RoomPool(
+        draw_pool=build_draw_pool(template, anime_pool_ids, characters, request),
+        snapshot=RoomSnapshot(template, characters, request),
+    )
+
+
+def build_draw_pool(template, anime_pool_ids, characters, request=None):
+    """
+    Everything a server-side draw returns, for every character of a room's pool
+
+    Characters are serialized exactly as POST /api/draw/ returns them, and
+    the rating tier of each pull is precomputed against the whole pool, so
+    a draw is a single Redis script call (see GameStateManager.draw_character).
+
+    Returns:
+        {character_id: (character JSON, rating JSON)}; the rating is null
+        without a template
+    """
+    index = get_pool_index(anime_pool_ids) if template else None
+    renderer = JSONRenderer()
+
+    pool = {}
+    for character in characters:
+        rating = None
+        if index is not None:
+            draw_score = calculate_draw_score(
+                character.character_power,
+                character.anime.anime_power_scale if character.anime else None
+            )
+            tier, label = index.rating_tier(draw_score, template.rating_bands_json)
+            rating = {'tier': tier, 'label': label}
+
+        data = CharacterDetailSerializer(character, context={'request': request}).data
+        pool[character.id] = (renderer.render(data).decode(), json.dumps(rating))
+
+    return pool
@@ -0,0 +1,31 @@
+"""
+JSON encoding of WebSocket frames
+
+Uses orjson when it is installed (an optional dependency, see
+requirements-optional.txt) and the standard library otherwise. Both produce
+the same compact UTF-8 JSON: orjson hands datetimes, Decimals and other
+types it does not encode the same way to DjangoJSONEncoder, so they come
+out as in the REST API (Decimals as strings, datetimes in ISO 8601 with
+millisecond precision).
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+JSON_BACKEND = 'orjson' if orjson else 'json'
+
+_encoder = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+if orjson:
+    # Datetimes go to _encoder.default; non-string keys become strings, as in json
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(message):
+    """Encode a message as the text of one WebSocket frame"""
+    if orjson:
+        return orjson.dumps(message, default=_encoder.default, option=ORJSON_OPTIONS).decode()
+    return _encoder.encode(message)
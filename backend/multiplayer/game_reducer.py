@@ -0,0 +1,76 @@
+"""
+Pure game state reducer
+
+The same transitions ADD_ACTION_SCRIPT applies in Redis, as side-effect-free
+functions over the state dict returned by GameStateManager.get_state().
+Used to rebuild a game from a snapshot plus the tail of its action log.
+"""
+
+
+def initial_state(template_id, anime_pool_ids, remaining_character_ids=(), game_id=None):
+    """State of a game that has just been started"""
+    return {
+        'game_id': game_id,
+        'template_id': template_id,
+        'anime_pool_ids': anime_pool_ids,
+        'current_turn': 'host',
+        'host_placements': {},
+        'guest_placements': {},
+        'host_drawn_ids': [],
+        'guest_drawn_ids': [],
+        'drawn_characters': [],
+        'remaining_character_ids': sorted(remaining_character_ids),
+        'sequence_number': 0,
+    }
+
+
+def apply_action(state, action):
+    """
+    Return the state after one action, without modifying `state`
+
+    Args:
+        state: Game state dict
+        action: Dict with action_type, player_role, action_data and
+            sequence_number (as stored in GameAction)
+    """
+    action_type = action['action_type']
+    player_role = action['player_role']
+    action_data = action['action_data']
+
+    new_state = {
+        **state,
+        'host_placements': dict(state.get('host_placements', {})),
+        'guest_placements': dict(state.get('guest_placements', {})),
+        'host_drawn_ids': list(state.get('host_drawn_ids', [])),
+        'guest_drawn_ids': list(state.get('guest_drawn_ids', [])),
+        'drawn_characters': list(state.get('drawn_characters', [])),
+        'remaining_character_ids': list(state.get('remaining_character_ids', [])),
+        'sequence_number': action['sequence_number'],
+    }
+
+    if action_type == 'DRAW_CHARACTER':
+        character = action_data['character']
+        new_state['drawn_characters'].append(character)
+        new_state[f'{player_role}_drawn_ids'].append(character['id'])
+        new_state[f'{player_role}_drawn_ids'].sort()
+        if character['id'] in new_state['remaining_character_ids']:
+            new_state['remaining_character_ids'].remove(character['id'])
+
+    elif action_type == 'PLACE_CHARACTER':
+        new_state[f'{player_role}_placements'][action_data['role_name']] = action_data['character_id']
+        new_state['current_turn'] = 'guest' if player_role == 'host' else 'host'
+
+    return new_state
+
+
+def fold_actions(state, actions):
+    """
+    Apply actions in sequence order on top of `state`
+
+    Actions at or below the state's sequence number are already part of it
+    and are skipped, so overlapping log reads are harmless.
+    """
+    for action in sorted(actions, key=lambda action: action['sequence_number']):
+        if action['sequence_number'] > state.get('sequence_number', 0):
+            state = apply_action(state, action)
+    return state
@@ -1,127 +1,746 @@
+from api.scoring import calculate_match_result
+from api.serializers import ScoreResponseSerializer
 from django.core.cache import cache
+from django.db.models import Max
+from redis.exceptions import LockError
+from .game_reducer import fold_actions, initial_state
 from .models import GameAction, MultiplayerRoom
 import json
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+STATE_TIMEOUT = 900  # 15 minutes
+ACTION_LOG_TIMEOUT = 60 * 60 * 24  # unflushed actions survive a day without any flush
+ACTION_FLUSH_SIZE = 20  # flush as soon as this many actions are pending
+ACTION_FLUSH_INTERVAL = 2  # seconds between time-based flushes
+ACTION_FLUSH_CHUNK = 500  # rows per bulk_create
+FLUSH_LOCK_TIMEOUT = 30
+SNAPSHOT_INTERVAL = 10  # snapshot the state every N actions
+SNAPSHOT_TIMEOUT = 60 * 60 * 2  # 2 hours
+PENDING_ROOMS_KEY = 'game_actions:pending_rooms'
+
+# Atomic state transition for one action. Runs entirely inside Redis, so two
+# concurrent messages for the same room can neither lose an update nor share
+# a sequence number. In the same step the action is appended to the room's
+# durable action log, which is written to the database later (write-behind).
+#
+# KEYS: state hash, drawn characters list, remaining character IDs set,
+#       draw pool hash, draw ratings hash, action log list, pending rooms set
+# ARGV: action_type, player_role, state timeout, log timeout, room code,
+#       log row JSON (everything but the sequence number), then per type:
+#   DRAW_CHARACTER:  character JSON, character ID JSON
+#   PLACE_CHARACTER: slot key, character ID JSON, game_id field of the game
+#                    the slot keys belong to, then the template's slot keys
+# Returns: {sequence number, actions pending in the log}
+#
+# Draws record their player in a 'drawn:{character ID}' state field and the
+# character in the player's 'holding:{role}' field until it is placed;
+# placements mark theirs 'placed:{character ID}'. A placement is rejected,
+# before anything is written, unless it is the player's turn, the slot is
+# one of the template's and still empty, and the character was drawn by
+# that player and is not placed yet.
+ADD_ACTION_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return redis.error_reply('Game has not been started')
+end
+
+if ARGV[1] == 'PLACE_CHARACTER' then
+    if redis.call('HGET', KEYS[1], 'game_id') ~= ARGV[9] then
+        return redis.error_reply('Game has changed')
+    end
+    if redis.call('HGET', KEYS[1], 'current_turn') ~= ARGV[2] then
+        return redis.error_reply('Not your turn')
+    end
+    local valid_slot = false
+    for i = 10, #ARGV do
+        if ARGV[i] == ARGV[7] then
+            valid_slot = true
+            break
+        end
+    end
+    if not valid_slot then
+        return redis.error_reply('Unknown role slot')
+    end
+    if redis.call('HEXISTS', KEYS[1], 'placement:' .. ARGV[2] .. ':' .. ARGV[7]) == 1 then
+        return redis.error_reply('Role slot is already filled')
+    end
+    if redis.call('HGET', KEYS[1], 'drawn:' .. ARGV[8]) ~= ARGV[2] then
+        return redis.error_reply('Character was not drawn by this player')
+    end
+    if redis.call('HEXISTS', KEYS[1], 'placed:' .. ARGV[8]) == 1 then
+        return redis.error_reply('Character is already placed')
+    end
+end
+
+local sequence = redis.call('HINCRBY', KEYS[1], 'sequence_number', 1)
+
+if ARGV[1] == 'DRAW_CHARACTER' then
+    redis.call('RPUSH', KEYS[2], ARGV[7])
+    redis.call('SREM', KEYS[3], ARGV[8])
+    redis.call('HSET', KEYS[1], 'drawn:' .. ARGV[8], ARGV[2])
+    redis.call('HSET', KEYS[1], 'holding:' .. ARGV[2], ARGV[8])
+elseif ARGV[1] == 'PLACE_CHARACTER' then
+    redis.call('HSET', KEYS[1], 'placement:' .. ARGV[2] .. ':' .. ARGV[7], ARGV[8])
+    redis.call('HSET', KEYS[1], 'placed:' .. ARGV[8], ARGV[2])
+    redis.call('HDEL', KEYS[1], 'holding:' .. ARGV[2])
+    local next_turn = 'host'
+    if ARGV[2] == 'host' then
+        next_turn = 'guest'
+    end
+    redis.call('HSET', KEYS[1], 'current_turn', next_turn)
+end
+
+for i = 1, 5 do
+    redis.call('EXPIRE', KEYS[i], ARGV[3])
+end
+
+local pending = redis.call('RPUSH', KEYS[6], '[' .. sequence .. ',' .. ARGV[6] .. ']')
+redis.call('EXPIRE', KEYS[6], ARGV[4])
+redis.call('SADD', KEYS[7], ARGV[5])
+return {sequence, pending}
+"""
+
+# Server-side draw: pops a random character ID from the remaining set and
+# applies and logs the DRAW_CHARACTER action in one step, returning the
+# pool's pre-serialized character and rating. Clients never send a character.
+# A player may only draw on their turn and while holding no unplaced
+# character, so the pool cannot be drained for a better pull.
+#
+# KEYS: same as ADD_ACTION_SCRIPT
+# ARGV: player_role, state timeout, log timeout, room code
+# Returns: {sequence number, actions pending in the log, character JSON, rating JSON}
+DRAW_CHARACTER_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return redis.error_reply('Game has not been started')
+end
+if redis.call('HGET', KEYS[1], 'current_turn') ~= ARGV[1] then
+    return redis.error_reply('Not your turn')
+end
+if redis.call('HEXISTS', KEYS[1], 'holding:' .. ARGV[1]) == 1 then
+    return redis.error_reply('Place your drawn character first')
+end
+
+local character_id = redis.call('SPOP', KEYS[3])
+if not character_id then
+    return redis.error_reply('No characters remaining in pool')
+end
+local character = redis.call('HGET', KEYS[4], character_id)
+if not character then
+    redis.call('SADD', KEYS[3], character_id)
+    return redis.error_reply('Draw pool is not loaded')
+end
+local rating = redis.call('HGET', KEYS[5], character_id) or 'null'
+
+local sequence = redis.call('HINCRBY', KEYS[1], 'sequence_number', 1)
+redis.call('RPUSH', KEYS[2], character)
+redis.call('HSET', KEYS[1], 'drawn:' .. character_id, ARGV[1])
+redis.call('HSET', KEYS[1], 'holding:' .. ARGV[1], character_id)
+
+for i = 1, 5 do
+    redis.call('EXPIRE', KEYS[i], ARGV[2])
+end
+
+local row = '[' .. sequence .. ',{"action_type":"DRAW_CHARACTER","player_role":"' .. ARGV[1]
+    .. '","action_data":{"character":' .. character .. '}}]'
+local pending = redis.call('RPUSH', KEYS[6], row)
+redis.call('EXPIRE', KEYS[6], ARGV[3])
+redis.call('SADD', KEYS[7], ARGV[4])
+return {sequence, pending, character, rating}
+"""
+
+# Drop flushed rows from the head of an action log. The room leaves the
+# pending set only if no action was appended in the meantime.
+#
+# KEYS: action log list, pending rooms set
+# ARGV: number of flushed rows, room code
+TRIM_ACTION_LOG_SCRIPT = """
+redis.call('LTRIM', KEYS[1], ARGV[1], -1)
+local remaining = redis.call('LLEN', KEYS[1])
+if remaining == 0 then
+    redis.call('SREM', KEYS[2], ARGV[2])
+end
+return remaining
+"""
+
+_scripts = {}
+
+
+def placement_assignments(placements):
+    """
+    Scoring assignments from {role key: character ID} placements, in slot order
+
+    Role keys are 'ROLE-index' as the draft screen sends them (e.g.
+    'CAPTAIN-0'); plain role names are accepted too.
+    """
+    assignments = []
+    for role_key, character_id in placements.items():
+        role, separator, index = role_key.rpartition('-')
+        if not (separator and role and index.isdigit()):
+            role, index = role_key, '0'
+        assignments.append((int(index), {'role': role, 'characterId': character_id}))
+    return [assignment for _, assignment in sorted(assignments, key=lambda item: item[0])]
+
+
+def get_redis():
+    """Raw client of the CACHES['default'] Redis, for hash/list/set commands"""
+    return cache._cache.get_client(write=True)
+
+
+def run_script(client, source, keys, args):
+    """Run a Lua script via EVALSHA, registering it once per process"""
+    script = _scripts.get(source)
+    if script is None:
+        script = _scripts[source] = client.register_script(source)
+    return script(keys=keys, args=args, client=client)
+
+
+def flush_all_pending_actions():
+    """
+    Flush the action log of every room with unflushed actions (sync)
+
+    Recovers actions left behind by a crashed worker; used by the
+    flush_game_actions command.
+
+    Returns:
+        Number of actions written to the database
+    """
+    room_codes = [code.decode() for code in get_redis().smembers(cache.make_key(PENDING_ROOMS_KEY))]
+    room_ids = dict(
+        MultiplayerRoom.objects.filter(room_code__in=room_codes).values_list('room_code', 'id')
+    )
+    return sum(
+        GameStateManager(room_code, room_id=room_ids.get(room_code)).flush_pending_actions()
+        for room_code in room_codes
+    )
 
 
 class GameStateManager:
-    """Manages game state in Redis with event sourcing"""
+    """
+    Manages game state in Redis with event sourcing
+
+    State lives in three Redis keys per room instead of one pickled blob:
+    - game_state:{code}: hash of scalar fields (JSON-encoded), the
+      sequence_number counter, one 'placement:{role}:{slot}' field per
+      placement, 'drawn:{id}' / 'placed:{id}' fields naming the player
+      who drew / placed each character and 'holding:{role}' fields with
+      each player's drawn but unplaced character
+    - game_state:{code}:drawn: list of drawn character JSON
+    - game_state:{code}:remaining: set of remaining character IDs
+    - game_state:{code}:pool / :ratings: hashes of the pool's serialized
+      characters and precomputed rating tiers, by character ID, which
+      draw_character() hands out (see draw_pool.build_draw_pool)
+
+    Every transition is one Lua script call, and get_state() assembles the
+    familiar state dict with a single pipelined round trip.
 
-    def __init__(self, room_code):
+    Actions are persisted write-behind: the transition script appends each
+    action to the durable game_actions:{code} list, and flush_actions()
+    moves them to GameAction with bulk_create when ACTION_FLUSH_SIZE are
+    pending, every ACTION_FLUSH_INTERVAL seconds and when the game ends.
+    A flush is idempotent (unique room + sequence_number), so a worker that
+    dies mid-flush loses nothing; the next flush re-sends the same rows,
+    which are skipped. A stored row that differs from the one being flushed
+    is logged as a conflict rather than silently dropped.
+
+    Every SNAPSHOT_INTERVAL actions the state is snapshotted to
+    game_snapshot:{code}. If the live state is lost, replay_actions()
+    rebuilds it from the latest snapshot plus only the actions after it,
+    using the pure reducer in game_reducer.
+    """
+
+    def __init__(self, room_code, room_id=None):
         self.room_code = room_code
+        self.room_id = room_id  # MultiplayerRoom PK, looked up on first flush if not given
         self.state_key = f'game_state:{room_code}'
+        self.drawn_key = f'{self.state_key}:drawn'
+        self.remaining_key = f'{self.state_key}:remaining'
+        self.pool_key = f'{self.state_key}:pool'
+        self.ratings_key = f'{self.state_key}:ratings'
+        self.action_log_key = f'game_actions:{room_code}'
+        self.snapshot_key = f'game_snapshot:{room_code}'
+        self.room_snapshot_key = f'{self.state_key}:room'
+        self.pending_actions = 0  # actions in the log after our last transition
+        self._room_snapshot = None  # (game_id, RoomSnapshot) held for the running game
+
+    def redis_keys(self):
+        """Full Redis keys (with cache prefix) of this room's state and draw pool"""
+        return [
+            cache.make_key(key)
+            for key in (self.state_key, self.drawn_key, self.remaining_key, self.pool_key, self.ratings_key)
+        ]
+
+    async def initialize_game(self, template_id, anime_pool_ids, room_pool):
+        """
+        Initialize new game state
+
+        Args:
+            room_pool: draw_pool.RoomPool from build_room_pool; the draw
+                pool's characters are the remaining pool
+        """
+        from channels.db import database_sync_to_async
+
+        # Sequence numbers continue across games in the same room, so a new
+        # game's actions never collide with logged actions of the last one
+        last_sequence_number = await database_sync_to_async(self.last_sequence_number)()
+
+        state = initial_state(template_id, anime_pool_ids, room_pool.draw_pool, game_id=uuid.uuid4().hex)
+        state['sequence_number'] = last_sequence_number
+        self.store_state(state)
+        self.store_room_pool(room_pool, state['game_id'])
+        self.save_snapshot(state)
+        return state
+
+    def store_room_pool(self, room_pool, game_id):
+        """Store the draw pool and the room snapshot of a game (sync)"""
+        self.store_draw_pool(room_pool.draw_pool)
+        self._room_snapshot = (game_id, room_pool.snapshot)
+        cache.set(self.room_snapshot_key, self._room_snapshot, timeout=SNAPSHOT_TIMEOUT)
+
+    def room_snapshot(self, state):
+        """
+        The RoomSnapshot of the game in `state` (sync)
+
+        Held in memory once loaded, so Redis is only read again when a new
+        game starts in the room (its state carries a new game_id).
+
+        Returns:
+            RoomSnapshot, or None if it was lost
+        """
+        game_id = state.get('game_id')
+        if self._room_snapshot is None or self._room_snapshot[0] != game_id:
+            stored = cache.get(self.room_snapshot_key)
+            if stored is None or stored[0] != game_id:
+                return None
+            self._room_snapshot = stored
+        return self._room_snapshot[1]
+
+    def store_draw_pool(self, draw_pool):
+        """Replace the room's draw pool hashes (sync)"""
+        pool_key, ratings_key = self.redis_keys()[3:]
 
-    async def initialize_game(self, template_id, anime_pool_ids):
-        """Initialize new game state"""
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.delete(pool_key, ratings_key)
+        if draw_pool:
+            pipe.hset(pool_key, mapping={
+                json.dumps(char_id): character for char_id, (character, _) in draw_pool.items()
+            })
+            pipe.hset(ratings_key, mapping={
+                json.dumps(char_id): rating for char_id, (_, rating) in draw_pool.items()
+            })
+            pipe.expire(pool_key, STATE_TIMEOUT)
+            pipe.expire(ratings_key, STATE_TIMEOUT)
+        pipe.execute()
+
+    def has_draw_pool(self):
+        return bool(get_redis().exists(self.redis_keys()[3]))
+
+    def store_state(self, state):
+        """Replace the room's Redis state with a full state dict, keeping the draw pool (sync)"""
+        state_key, drawn_key, remaining_key = self.redis_keys()[:3]
+
+        fields = {
+            'game_id': json.dumps(state.get('game_id')),
+            'template_id': json.dumps(state.get('template_id')),
+            'anime_pool_ids': json.dumps(state.get('anime_pool_ids')),
+            'current_turn': state.get('current_turn', 'host'),
+            'sequence_number': state.get('sequence_number', 0),
+        }
+        for player_role in ('host', 'guest'):
+            placements = state.get(f'{player_role}_placements', {})
+            for character_id in state.get(f'{player_role}_drawn_ids', []):
+                fields[f'drawn:{json.dumps(character_id)}'] = player_role
+                if character_id not in placements.values():
+                    fields[f'holding:{player_role}'] = json.dumps(character_id)
+            for role_name, character_id in placements.items():
+                fields[f'placement:{player_role}:{role_name}'] = json.dumps(character_id)
+                fields[f'placed:{json.dumps(character_id)}'] = player_role
+
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.delete(state_key, drawn_key, remaining_key)
+        pipe.hset(state_key, mapping=fields)
+        if state.get('drawn_characters'):
+            pipe.rpush(drawn_key, *[json.dumps(character) for character in state['drawn_characters']])
+        if state.get('remaining_character_ids'):
+            pipe.sadd(remaining_key, *[json.dumps(char_id) for char_id in state['remaining_character_ids']])
+        for key in (state_key, drawn_key, remaining_key):
+            pipe.expire(key, STATE_TIMEOUT)
+        pipe.execute()
+
+    async def get_state(self):
+        """Get current game state"""
+        return self.load_state()
+
+    def load_state(self):
+        """Current game state as a dict, or {} when no game is running (sync)"""
+        state_key, drawn_key, remaining_key = self.redis_keys()[:3]
+
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.hgetall(state_key)
+        pipe.lrange(drawn_key, 0, -1)
+        pipe.smembers(remaining_key)
+        fields, drawn, remaining = pipe.execute()
+
+        if not fields:
+            return {}
+
+        fields = {key.decode(): value.decode() for key, value in fields.items()}
         state = {
-            'template_id': template_id,
-            'anime_pool_ids': anime_pool_ids,
-            'current_turn': 'host',
+            'game_id': json.loads(fields.get('game_id', 'null')),
+            'template_id': json.loads(fields.get('template_id', 'null')),
+            'anime_pool_ids': json.loads(fields.get('anime_pool_ids', '[]')),
+            'current_turn': fields.get('current_turn', 'host'),
             'host_placements': {},
             'guest_placements': {},
-            'drawn_characters': [],
-            'remaining_character_ids': anime_pool_ids.copy(),  # Will be updated as characters are drawn
-            'sequence_number': 0,
+            'host_drawn_ids': [],
+            'guest_drawn_ids': [],
+            'drawn_characters': [json.loads(character) for character in drawn],
+            'remaining_character_ids': sorted(json.loads(char_id) for char_id in remaining),
+            'sequence_number': int(fields.get('sequence_number', 0)),
         }
-        cache.set(self.state_key, state, timeout=900)  # 15 minutes
+        for field, value in fields.items():
+            if field.startswith('placement:'):
+                _, player_role, role_name = field.split(':', 2)
+                state[f'{player_role}_placements'][role_name] = json.loads(value)
+            elif field.startswith('drawn:'):
+                state[f'{value}_drawn_ids'].append(json.loads(field[len('drawn:'):]))
+        state['host_drawn_ids'].sort()
+        state['guest_drawn_ids'].sort()
+
         return state
 
-    async def get_state(self):
-        """Get current game state"""
-        return cache.get(self.state_key, {})
+    def apply_action(self, action_type, player_role, action_data):
+        """
+        Atomically apply an action to the Redis state and action log (sync)
 
-    async def add_action(self, action_type, player_role, action_data):
-        """Add action to state and event log"""
-        state = await self.get_state()
-        state['sequence_number'] = state.get('sequence_number', 0) + 1
+        Returns:
+            The action's sequence number, unique and gap-free per game
 
-        # Update state based on action type
+        Raises:
+            redis.exceptions.ResponseError: no game, or a placement out of
+                turn, into a slot the template does not have or that is
+                filled, or of a character the player did not draw or already placed
+        """
         if action_type == 'DRAW_CHARACTER':
-            state['drawn_characters'].append(action_data['character'])
-            # Remove from remaining
-            char_id = action_data['character']['id']
-            if char_id in state.get('remaining_character_ids', []):
-                state['remaining_character_ids'].remove(char_id)
-
+            character = action_data['character']
+            args = [json.dumps(character), json.dumps(character['id'])]
         elif action_type == 'PLACE_CHARACTER':
-            placements_key = f'{player_role}_placements'
-            if placements_key not in state:
-                state[placements_key] = {}
-            state[placements_key][action_data['role_name']] = action_data['character_id']
+            game_id, slot_keys = self.slot_keys()
+            args = [
+                str(action_data.get('role_name')), json.dumps(action_data.get('character_id')),
+                game_id, *slot_keys,
+            ]
+        else:
+            args = []
 
-            # Switch turn
-            state['current_turn'] = 'guest' if player_role == 'host' else 'host'
+        log_row = json.dumps({
+            'action_type': action_type,
+            'player_role': player_role,
+            'action_data': action_data,
+        })
+        sequence_number, self.pending_actions = run_script(
+            get_redis(),
+            ADD_ACTION_SCRIPT,
+            keys=[*self.redis_keys(), cache.make_key(self.action_log_key), cache.make_key(PENDING_ROOMS_KEY)],
+            args=[action_type, player_role, STATE_TIMEOUT, ACTION_LOG_TIMEOUT, self.room_code, log_row, *args],
+        )
+        return sequence_number
 
-        # Save to cache
-        cache.set(self.state_key, state, timeout=900)
+    def slot_keys(self):
+        """
+        Placement slot keys of the running game's template (sync)
 
-        # Save to database for persistence
-        await self.save_action_to_db(action_type, player_role, action_data, state['sequence_number'])
+        Returns:
+            (the state's raw game_id field, tuple of slot keys); no slots
+            if no game is running or its room snapshot was lost
+        """
+        game_id = get_redis().hget(self.redis_keys()[0], 'game_id')
+        if game_id is None:
+            return '', ()
+        snapshot = self.room_snapshot({'game_id': json.loads(game_id)})
+        return game_id.decode(), snapshot.slot_keys if snapshot else ()
 
-        return state
+    async def add_action(self, action_type, player_role, action_data):
+        """
+        Add action to state and event log
 
-    async def is_game_complete(self):
-        """Check if all placements are filled"""
-        state = await self.get_state()
-        # Get template to know how many roles
-        from game.models import GameTemplate
-        from channels.db import database_sync_to_async
+        The action is durable in Redis on return; the database write is
+        batched (see flush_actions). Once ACTION_FLUSH_SIZE actions are
+        pending, the caller should flush (see should_flush).
 
-        @database_sync_to_async
-        def get_template_roles():
-            template = GameTemplate.objects.get(id=state['template_id'])
-            return json.loads(template.roles_json)
+        Returns:
+            The action's sequence number
+        """
+        sequence_number = self.apply_action(action_type, player_role, action_data)
+        self.snapshot_if_due(sequence_number)
+        return sequence_number
 
-        try:
-            roles = await get_template_roles()
-            return (
-                len(state.get('host_placements', {})) == len(roles) and
-                len(state.get('guest_placements', {})) == len(roles)
-            )
-        except:
-            return False
+    async def draw_character(self, player_role):
+        """
+        Draw a random character from the room's remaining pool
+
+        The draw, the state update and the DRAW_CHARACTER log entry are one
+        atomic Redis script call; the character comes from the server-held
+        pool, never from the client.
+
+        Returns:
+            (character dict, rating dict or None)
+
+        Raises:
+            redis.exceptions.ResponseError: no game, the pool is empty, not
+                the player's turn, or the player holds an unplaced character
+        """
+        sequence_number, self.pending_actions, character, rating = run_script(
+            get_redis(),
+            DRAW_CHARACTER_SCRIPT,
+            keys=[*self.redis_keys(), cache.make_key(self.action_log_key), cache.make_key(PENDING_ROOMS_KEY)],
+            args=[player_role, STATE_TIMEOUT, ACTION_LOG_TIMEOUT, self.room_code],
+        )
+        self.snapshot_if_due(sequence_number)
+        return json.loads(character), json.loads(rating)
+
+    def snapshot_if_due(self, sequence_number):
+        if sequence_number % SNAPSHOT_INTERVAL == 0:
+            self.save_snapshot(self.load_state())
+
+    def save_snapshot(self, state):
+        """
+        Store a snapshot of the state (sync)
+
+        load_state() reads the state atomically, so a snapshot is always
+        consistent with its own sequence_number even if actions raced it.
+        """
+        if state:
+            cache.set(self.snapshot_key, state, timeout=SNAPSHOT_TIMEOUT)
+
+    def should_flush(self):
+        """Whether enough actions are pending for a size-triggered flush"""
+        return self.pending_actions >= ACTION_FLUSH_SIZE
+
+    async def is_game_complete(self):
+        """Check if all placements are filled (against the room snapshot, no database query)"""
+        state = await self.get_state()
+        snapshot = self.room_snapshot(state)
+        return bool(snapshot) and snapshot.is_complete(state)
 
     async def reset(self):
         """Reset game state"""
-        cache.delete(self.state_key)
+        self.delete_state()
 
-    async def save_action_to_db(self, action_type, player_role, action_data, sequence_number):
-        """Save action to database for replay"""
-        from channels.db import database_sync_to_async
+    def delete_state(self, include_action_log=False):
+        """
+        Delete every Redis key of this room's state and its snapshot (sync)
 
-        @database_sync_to_async
-        def _save():
-            room = MultiplayerRoom.objects.get(room_code=self.room_code)
-            GameAction.objects.create(
-                room=room,
-                action_type=action_type,
-                player_role=player_role,
-                action_data=action_data,
-                sequence_number=sequence_number,
-            )
+        The action log is kept by default so unflushed actions still reach
+        the database; drop it only when the room itself is being deleted.
+        """
+        client = get_redis()
+        if include_action_log:
+            client.srem(cache.make_key(PENDING_ROOMS_KEY), self.room_code)
+        client.delete(*self.state_keys(include_action_log))
 
-        await _save()
+    def state_keys(self, include_action_log=False):
+        """Full Redis keys delete_state() removes"""
+        keys = [*self.redis_keys(), cache.make_key(self.snapshot_key), cache.make_key(self.room_snapshot_key)]
+        if include_action_log:
+            keys.append(cache.make_key(self.action_log_key))
+        return keys
 
-    async def replay_actions(self, from_sequence=0):
-        """Replay actions from database for reconnection"""
+    async def flush_actions(self):
+        """Write pending actions to the database"""
         from channels.db import database_sync_to_async
 
-        @database_sync_to_async
-        def _get_actions():
-            room = MultiplayerRoom.objects.get(room_code=self.room_code)
-            return list(room.actions.filter(sequence_number__gt=from_sequence).values(
-                'action_type', 'player_role', 'action_data', 'sequence_number'
-            ))
+        return await database_sync_to_async(self.flush_pending_actions)()
+
+    def flush_pending_actions(self):
+        """
+        Move the room's pending actions from the Redis log to GameAction (sync)
 
-        actions = await _get_actions()
+        Rows are read from the head of the log, inserted with bulk_create and
+        only then trimmed, under a per-room lock. A crash between insert and
+        trim just means the next flush re-sends rows that are already stored;
+        see _insert_new_actions().
 
-        # Replay each action
+        Returns:
+            Number of actions flushed (0 if another flush holds the lock)
+        """
+        client = get_redis()
+        log_key = cache.make_key(self.action_log_key)
+        pending_key = cache.make_key(PENDING_ROOMS_KEY)
+
+        lock = client.lock(cache.make_key(f'{self.action_log_key}:flush_lock'), timeout=FLUSH_LOCK_TIMEOUT)
+        if not lock.acquire(blocking=False):
+            return 0
+
+        flushed = 0
+        try:
+            if self.resolve_room_id() is None:
+                # Room was deleted: nothing left to attach the actions to
+                client.delete(log_key)
+                client.srem(pending_key, self.room_code)
+                return 0
+
+            while True:
+                rows = client.lrange(log_key, 0, ACTION_FLUSH_CHUNK - 1)
+                if not rows:
+                    # Trims nothing; leaves the pending set unless an action just arrived
+                    run_script(client, TRIM_ACTION_LOG_SCRIPT, keys=[log_key, pending_key], args=[0, self.room_code])
+                    break
+
+                self._insert_new_actions([self._action_from_log_row(row) for row in rows])
+                flushed += len(rows)
+
+                remaining = run_script(
+                    client, TRIM_ACTION_LOG_SCRIPT, keys=[log_key, pending_key], args=[len(rows), self.room_code]
+                )
+                if not remaining:
+                    break
+        finally:
+            try:
+                lock.release()
+            except LockError:
+                logger.warning(f'Action flush lock for room {self.room_code} expired during flush')
+
+        self.pending_actions = 0
+        return flushed
+
+    def _insert_new_actions(self, actions):
+        """
+        bulk_create the actions not yet stored for this room (sync)
+
+        An action whose sequence number is already stored is a re-send after
+        a crashed flush when the stored row matches, and is skipped. If the
+        stored row differs, two writers disagree on the room's history: the
+        stored row is kept and the conflict logged with both versions.
+        """
+        stored = {
+            action.sequence_number: action
+            for action in GameAction.objects.filter(
+                room_id=self.room_id,
+                sequence_number__in=[action.sequence_number for action in actions],
+            ).only('sequence_number', 'action_type', 'player_role', 'action_data')
+        }
+
+        new_actions = []
         for action in actions:
-            # Re-apply action logic
-            await self.add_action(
-                action['action_type'],
-                action['player_role'],
-                action['action_data']
+            existing = stored.get(action.sequence_number)
+            if existing is None:
+                new_actions.append(action)
+            elif (existing.action_type, existing.player_role, existing.action_data) != (
+                action.action_type, action.player_role, action.action_data
+            ):
+                logger.warning(
+                    f'Conflicting action {action.sequence_number} in room {self.room_code}: '
+                    f'stored {existing.action_type} {existing.player_role} {existing.action_data}, '
+                    f'discarded {action.action_type} {action.player_role} {action.action_data}'
+                )
+
+        GameAction.objects.bulk_create(new_actions)
+        return len(new_actions)
+
+    def _action_from_log_row(self, row):
+        sequence_number, fields = json.loads(row)
+        return GameAction(room_id=self.room_id, sequence_number=sequence_number, **fields)
+
+    def resolve_room_id(self):
+        """MultiplayerRoom PK, looked up once if not given (sync)"""
+        if self.room_id is None:
+            self.room_id = (
+                MultiplayerRoom.objects.filter(room_code=self.room_code)
+                .values_list('id', flat=True).first()
             )
+        return self.room_id
 
-        state = await self.get_state()
+    def pending_log_actions(self):
+        """Actions in the Redis log that may not be in the database yet (sync)"""
+        rows = get_redis().lrange(cache.make_key(self.action_log_key), 0, -1)
+        actions = []
+        for row in rows:
+            sequence_number, fields = json.loads(row)
+            actions.append({**fields, 'sequence_number': sequence_number})
+        return actions
+
+    def last_sequence_number(self):
+        """Highest sequence number logged for this room, flushed or not (sync)"""
+        pending = [action['sequence_number'] for action in self.pending_log_actions()]
+        flushed = None
+        if self.resolve_room_id() is not None:
+            flushed = GameAction.objects.filter(room_id=self.room_id).aggregate(
+                last=Max('sequence_number')
+            )['last']
+        return max([*pending, flushed or 0])
+
+    def rebuild_state(self):
+        """
+        Latest snapshot with the tail of the action log folded on top (sync)
+
+        Reads only actions after the snapshot, from the database and the
+        unflushed Redis log, and writes nothing.
+
+        Returns:
+            The rebuilt state, or {} without a snapshot (no game to restore)
+        """
+        snapshot = cache.get(self.snapshot_key)
+        if not snapshot:
+            return {}
+
+        after = snapshot.get('sequence_number', 0)
+        tail = [action for action in self.pending_log_actions() if action['sequence_number'] > after]
+        if self.resolve_room_id() is not None:
+            tail.extend(GameAction.objects.filter(
+                room_id=self.room_id, sequence_number__gt=after
+            ).values('action_type', 'player_role', 'action_data', 'sequence_number'))
+
+        return fold_actions(snapshot, tail)
+
+    async def replay_actions(self, request=None):
+        """
+        Restore a lost game state for reconnection
+
+        Rebuilds the state from the latest snapshot plus the actions after
+        it and stores it back as the live state, reloading the draw pool if
+        it was lost as well (`request` builds its media URLs). The action
+        log, sequence counter and GameAction rows are left untouched.
+        """
+        from channels.db import database_sync_to_async
+        from .draw_pool import build_room_pool
+
+        state = await database_sync_to_async(self.rebuild_state)()
+        if state:
+            self.store_state(state)
+            if not self.has_draw_pool() or self.room_snapshot(state) is None:
+                self.store_room_pool(await database_sync_to_async(build_room_pool)(
+                    state['template_id'], state['anime_pool_ids'], request
+                ), state.get('game_id'))
         return state
+
+    def score_game(self, state):
+        """
+        Score the placements of a game state with api.scoring (sync)
+
+        Uses the room snapshot taken at game start, so it touches neither
+        the database nor any request.
+
+        Returns:
+            The POST /api/score/ response body (host = left, guest = right)
+            plus the raw placements, or None without a snapshot of the template
+        """
+        snapshot = self.room_snapshot(state)
+        if snapshot is None or not snapshot.has_template:
+            return None
+
+        host_assignments = placement_assignments(state.get('host_placements', {}))
+        guest_assignments = placement_assignments(state.get('guest_placements', {}))
+        result = calculate_match_result(
+            state.get('template_id'),
+            host_assignments,
+            guest_assignments,
+            snapshot.template_data(),
+            snapshot.characters_data({a['characterId'] for a in host_assignments + guest_assignments}),
+        )
+        return {
+            'host_placements': state.get('host_placements', {}),
+            'guest_placements': state.get('guest_placements', {}),
+            **ScoreResponseSerializer(result).data,
+        }
@@ -0,0 +1,141 @@
+"""
+Management command to benchmark heartbeat scheduling for idle connections
+Usage: python manage.py benchmark_heartbeat --connections 10000 --seconds 10
+"""
+import asyncio
+import json
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from multiplayer.scheduler import HEARTBEAT_INTERVAL, ConnectionScheduler
+
+
+class IdleConnection:
+    """Stands in for an idle GameConsumer: counts the pings it is sent"""
+
+    __slots__ = ('sent',)
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, text_data):
+        self.sent += 1
+
+
+async def heartbeat_task(connection, interval):
+    """The previous model: one task per connection, encoding its own ping"""
+    while True:
+        await asyncio.sleep(interval)
+        await connection.send(text_data=json.dumps({
+            'type': 'ping',
+            'timestamp': timezone.now().isoformat(),
+        }))
+
+
+class PerConnectionTasks:
+    label = 'One task per connection'
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.tasks = []
+
+    def start(self, connections):
+        self.tasks = [asyncio.create_task(heartbeat_task(c, self.interval)) for c in connections]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+
+class SharedScheduler:
+    label = 'Shared scheduler'
+
+    def __init__(self, interval):
+        self.scheduler = ConnectionScheduler(heartbeat_interval=interval)
+        self.connections = []
+
+    def start(self, connections):
+        self.connections = connections
+        for connection in connections:
+            self.scheduler.register(connection)
+            # Spread connections over the buckets as real connects would
+            self.scheduler.tick_count += 1
+
+    async def stop(self):
+        for connection in self.connections:
+            self.scheduler.unregister(connection)
+        if self.scheduler.task:
+            self.scheduler.task.cancel()
+            await asyncio.gather(self.scheduler.task, return_exceptions=True)
+
+
+class Command(BaseCommand):
+    help = 'Compare memory and CPU of per-connection heartbeat tasks and the shared scheduler'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--connections',
+            type=int,
+            default=10000,
+            help='Number of idle connections (default: 10000)',
+        )
+        parser.add_argument(
+            '--seconds',
+            type=float,
+            default=3 * HEARTBEAT_INTERVAL,
+            help=f'How long to measure CPU for (default: {3 * HEARTBEAT_INTERVAL})',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=HEARTBEAT_INTERVAL,
+            help=f'Heartbeat interval in seconds (default: {HEARTBEAT_INTERVAL})',
+        )
+
+    def handle(self, *args, **options):
+        count = options['connections']
+        seconds = options['seconds']
+        scale = 10000 / count
+
+        self.stdout.write(
+            f'{count:,} idle connections, {options["interval"]}s heartbeat, '
+            f'{seconds}s CPU window (figures per 10k connections)'
+        )
+
+        for model in (PerConnectionTasks, SharedScheduler):
+            memory = asyncio.run(self.measure_memory(model(options['interval']), count))
+            cpu, pings = asyncio.run(self.measure_cpu(model(options['interval']), count, seconds))
+            self.stdout.write(
+                f'  {model.label:<26} {memory * scale / 1024 / 1024:8.2f} MiB'
+                f'  {cpu * scale / seconds * 1000:8.2f} ms CPU/s'
+                f'  {pings:>10,} pings'
+            )
+
+    async def measure_memory(self, model, count):
+        """Bytes allocated to schedule `count` connections (connections excluded)"""
+        connections = [IdleConnection() for _ in range(count)]
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            model.start(connections)
+            await asyncio.sleep(0)  # let tasks reach their first sleep
+            used = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+        await model.stop()
+        return used
+
+    async def measure_cpu(self, model, count, seconds):
+        """Process CPU seconds spent over `seconds` of wall time, and pings sent"""
+        connections = [IdleConnection() for _ in range(count)]
+        model.start(connections)
+        start = time.process_time()
+        await asyncio.sleep(seconds)
+        cpu = time.process_time() - start
+        await model.stop()
+        return cpu, sum(connection.sent for connection in connections)
@@ -1,11 +1,18 @@
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from django.utils import timezone
-from django.core.cache import cache
-from multiplayer.models import MultiplayerRoom
+from multiplayer.game_state_manager import PENDING_ROOMS_KEY, GameStateManager, get_redis
+from multiplayer.models import GameAction, MultiplayerRoom
+from multiplayer.presence import DIRTY_ROOMS_KEY, PresenceTracker
+from multiplayer.room_codes import release_room_codes
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 500  # rooms per keyset batch
+
 
 class Command(BaseCommand):
     help = 'Clean up old/abandoned multiplayer rooms'
@@ -22,54 +29,110 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be deleted without actually deleting',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Rooms deleted per batch (default: {CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between batches, to yield to live traffic (default: 0)',
+        )
+        parser.add_argument(
+            '--loop',
+            type=float,
+            metavar='SECONDS',
+            help='Keep running, starting a new pass this many seconds after the last one finished',
+        )
 
     def handle(self, *args, **options):
-        hours = options['hours']
-        dry_run = options['dry_run']
+        while True:
+            self.cleanup(options)
+            if not options['loop'] or options['dry_run']:
+                return
+            time.sleep(options['loop'])
 
-        # Calculate cutoff time
+    def cleanup(self, options):
+        """
+        One pass over every room older than the cutoff
+
+        Rooms are walked in primary key order with keyset pagination, so
+        each batch is a bounded index range scan however large the table
+        is. Each batch is deleted in its own short transaction with raw
+        DELETEs (actions first, then rooms), so nothing is collected in
+        memory and no lock is held for longer than one batch.
+        """
+        hours = options['hours']
+        chunk_size = options['chunk_size']
         cutoff = timezone.now() - timezone.timedelta(hours=hours)
+        old_rooms = MultiplayerRoom.objects.filter(created_at__lt=cutoff).order_by('id')
+
+        if options['dry_run']:
+            count = old_rooms.count()
+            self.stdout.write(
+                self.style.WARNING(
+                    f'DRY RUN: Would have deleted {count} rooms older than {hours} hours. '
+                    f'Run without --dry-run to actually delete.'
+                )
+            )
+            return
+
+        last_id = 0
+        deleted_rooms = deleted_actions = 0
+
+        while True:
+            chunk = list(old_rooms.filter(id__gt=last_id).values_list('id', 'room_code')[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            room_ids = [room_id for room_id, _ in chunk]
+            room_codes = [room_code for _, room_code in chunk]
+
+            with transaction.atomic():
+                actions = GameAction.objects.filter(room_id__in=room_ids)
+                deleted_actions += actions._raw_delete(actions.db)
+                rooms = MultiplayerRoom.objects.filter(id__in=room_ids)
+                deleted_rooms += rooms._raw_delete(rooms.db)
 
-        # Find old rooms
-        old_rooms = MultiplayerRoom.objects.filter(created_at__lt=cutoff)
-        count = old_rooms.count()
+            delete_redis_state(room_codes)
+            # Their codes go back to the pool for new rooms
+            release_room_codes(room_codes)
 
-        if count == 0:
+            self.stdout.write(f'  Deleted {deleted_rooms} rooms ({deleted_actions} actions) so far...')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        if deleted_rooms == 0:
             self.stdout.write(
                 self.style.SUCCESS(f'No rooms older than {hours} hours found.')
             )
             return
 
         self.stdout.write(
-            self.style.WARNING(f'Found {count} rooms older than {hours} hours:')
+            self.style.SUCCESS(
+                f'Successfully deleted {deleted_rooms} rooms and {deleted_actions} game actions.'
+            )
         )
+        logger.info(f'Cleanup completed: deleted {deleted_rooms} old rooms')
 
-        # List rooms to be deleted
-        for room in old_rooms:
-            age_hours = (timezone.now() - room.created_at).total_seconds() / 3600
-            self.stdout.write(
-                f'  - Room {room.room_code} (Status: {room.status}, Age: {age_hours:.1f} hours)'
-            )
 
-            if not dry_run:
-                # Clean up Redis cache for this room
-                cache_key = f'game_state:{room.room_code}'
-                if cache.get(cache_key):
-                    cache.delete(cache_key)
-                    logger.info(f'Deleted Redis cache for room {room.room_code}')
+def delete_redis_state(room_codes):
+    """
+    Drop the game state, action log and presence of many rooms at once
 
-        # Delete rooms (this will cascade to GameAction due to foreign key)
-        if not dry_run:
-            deleted_count, _ = old_rooms.delete()
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Successfully deleted {deleted_count} rooms and their associated data.'
-                )
-            )
-            logger.info(f'Cleanup completed: deleted {deleted_count} old rooms')
-        else:
-            self.stdout.write(
-                self.style.WARNING(
-                    f'DRY RUN: Would have deleted {count} rooms. Run without --dry-run to actually delete.'
-                )
-            )
+    One pipelined UNLINK for every key of the batch, so Redis frees the
+    memory in the background instead of blocking on each DEL.
+    """
+    keys = []
+    for room_code in room_codes:
+        keys.extend(GameStateManager(room_code).state_keys(include_action_log=True))
+        keys.extend(PresenceTracker(room_code).keys())
+
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.unlink(*keys)
+    pipe.srem(cache.make_key(PENDING_ROOMS_KEY), *room_codes)
+    pipe.srem(cache.make_key(DIRTY_ROOMS_KEY), *room_codes)
+    pipe.execute()
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from multiplayer.game_state_manager import flush_all_pending_actions
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Write buffered game actions from the Redis action logs to the database'
+
+    def handle(self, *args, **options):
+        flushed = flush_all_pending_actions()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Flushed {flushed} buffered game actions to the database.')
+        )
+        logger.info(f'Action flush completed: {flushed} actions written')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from multiplayer.presence import flush_presence
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Write player connection flags and last seen times from Redis to the database'
+
+    def handle(self, *args, **options):
+        updated = flush_presence()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Flushed presence of {updated} rooms to the database.')
+        )
+        logger.info(f'Presence flush completed: {updated} rooms updated')
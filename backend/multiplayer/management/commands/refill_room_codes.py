@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from multiplayer.room_codes import ROOM_CODE_POOL_TARGET, refill_room_codes, room_code_pool_size
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Top up the Redis pool of pre-generated unused room codes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            type=int,
+            default=ROOM_CODE_POOL_TARGET,
+            help=f'Number of free codes to keep in the pool (default: {ROOM_CODE_POOL_TARGET})',
+        )
+
+    def handle(self, *args, **options):
+        added = refill_room_codes(options['target'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Added {added} room codes; {room_code_pool_size()} free codes in the pool.')
+        )
+        logger.info(f'Room code refill completed: {added} codes added')
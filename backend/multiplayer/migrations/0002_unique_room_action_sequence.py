@@ -0,0 +1,47 @@
+# Generated by Django 4.2.25 on 2026-10-16 22:54
+
+from django.db import migrations, models
+
+RENUMBER_BATCH_SIZE = 1000
+
+
+def renumber_action_sequences(apps, schema_editor):
+    """
+    Give every room's actions distinct sequence numbers before the constraint
+
+    Sequence numbers used to restart at 0 with every game, so a room that
+    was played more than once has duplicates. Rooms with duplicates are
+    renumbered 1..N in (timestamp, id) order, which keeps the order of play.
+    """
+    GameAction = apps.get_model('multiplayer', 'GameAction')
+
+    duplicated_rooms = (
+        GameAction.objects.order_by()
+        .values('room_id', 'sequence_number')
+        .annotate(rows=models.Count('id'))
+        .filter(rows__gt=1)
+        .values_list('room_id', flat=True)
+        .distinct()
+    )
+    for room_id in list(duplicated_rooms):
+        actions = list(
+            GameAction.objects.filter(room_id=room_id).order_by('timestamp', 'id').only('id', 'sequence_number')
+        )
+        for sequence_number, action in enumerate(actions, start=1):
+            action.sequence_number = sequence_number
+        GameAction.objects.bulk_update(actions, ['sequence_number'], batch_size=RENUMBER_BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('multiplayer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_action_sequences, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='gameaction',
+            constraint=models.UniqueConstraint(fields=('room', 'sequence_number'), name='unique_room_action_sequence'),
+        ),
+    ]
@@ -1,7 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-import shortuuid
 
 
 class MultiplayerRoom(models.Model):
@@ -65,11 +64,9 @@ class MultiplayerRoom(models.Model):
 
     @staticmethod
     def generate_room_code():
-        """Generate unique 6-character room code"""
-        while True:
-            code = shortuuid.ShortUUID().random(length=6).upper()
-            if not MultiplayerRoom.objects.filter(room_code=code).exists():
-                return code
+        """Allocate a unique 6-character room code from the pre-generated pool"""
+        from .room_codes import allocate_room_code
+        return allocate_room_code()
 
     def get_join_url(self, base_url='http://localhost:5174'):
         """Generate join URL for sharing"""
@@ -101,6 +98,10 @@ class GameAction(models.Model):
         indexes = [
             models.Index(fields=['room', 'sequence_number']),
         ]
+        constraints = [
+            # Makes write-behind flushes idempotent (see GameStateManager)
+            models.UniqueConstraint(fields=['room', 'sequence_number'], name='unique_room_action_sequence'),
+        ]
 
     def __str__(self):
         return f"{self.room.room_code} - {self.action_type} #{self.sequence_number}"
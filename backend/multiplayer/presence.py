@@ -0,0 +1,174 @@
+from datetime import datetime, timezone as dt_timezone
+from django.core.cache import cache
+from .game_state_manager import get_redis
+from .models import MultiplayerRoom
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_TIMEOUT = 60  # seconds without any message before a player counts as gone
+PRESENCE_FLUSH_INTERVAL = 30  # seconds between bulk writes to the database
+PRESENCE_FLUSH_CHUNK = 500  # rooms per bulk_update
+DIRTY_ROOMS_KEY = 'presence:dirty_rooms'
+FLUSH_DUE_KEY = 'presence:flush_due'
+ROLES = ('host', 'guest')
+
+
+def presence_key(room_code, role):
+    return f'presence:{room_code}:{role}'
+
+
+class PresenceTracker:
+    """
+    Tracks player presence (connected flag, last seen) in Redis
+
+    Each player has a presence:{code}:{role} hash ('connected', 'last_seen'
+    as epoch seconds) that expires PRESENCE_TIMEOUT after the player's last
+    message, so a player whose worker died without a disconnect simply ages
+    out. Heartbeats and other messages only refresh that key: they never
+    touch the database.
+
+    Connects and disconnects also add the room to the presence:dirty_rooms
+    set. flush_presence() writes the connected flags and last seen times of
+    dirty rooms to MultiplayerRoom with one bulk_update of just those fields,
+    at most every PRESENCE_FLUSH_INTERVAL seconds (see flush_presence_if_due).
+    """
+
+    def __init__(self, room_code):
+        self.room_code = room_code
+
+    def touch(self, role):
+        """Record a message from the player (Redis only)"""
+        key = cache.make_key(presence_key(self.room_code, role))
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hset(key, 'last_seen', time.time())
+        pipe.expire(key, PRESENCE_TIMEOUT)
+        pipe.execute()
+
+    def set_connected(self, role, connected):
+        """Record a connect or disconnect and queue the room for the next flush"""
+        key = cache.make_key(presence_key(self.room_code, role))
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hset(key, mapping={'connected': int(connected), 'last_seen': time.time()})
+        pipe.expire(key, PRESENCE_TIMEOUT)
+        pipe.sadd(cache.make_key(DIRTY_ROOMS_KEY), self.room_code)
+        pipe.execute()
+
+    def load(self):
+        """
+        Live presence of both players
+
+        Returns:
+            {role: {'connected': bool, 'last_seen': datetime}} for every
+            player with a live presence key
+        """
+        return load_presence([self.room_code])[self.room_code]
+
+    def is_connected(self, role, default=False):
+        """Live connected flag, or `default` if the player has no presence key"""
+        presence = self.load().get(role)
+        return presence['connected'] if presence else default
+
+    def apply_to(self, room):
+        """Overlay live presence on a MultiplayerRoom instance (not saved)"""
+        for role, presence in self.load().items():
+            setattr(room, f'{role}_connected', presence['connected'])
+            setattr(room, f'{role}_last_seen', presence['last_seen'])
+        return room
+
+    def delete(self):
+        """Drop both players' presence keys"""
+        client = get_redis()
+        client.delete(*self.keys())
+        client.srem(cache.make_key(DIRTY_ROOMS_KEY), self.room_code)
+
+    def keys(self):
+        """Full Redis keys of both players' presence"""
+        return [cache.make_key(presence_key(self.room_code, role)) for role in ROLES]
+
+
+def load_presence(room_codes):
+    """
+    Live presence of many rooms in one pipelined round trip
+
+    Returns:
+        {room_code: {role: {'connected': bool, 'last_seen': datetime}}},
+        with only the players that have a live presence key
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    for room_code in room_codes:
+        for role in ROLES:
+            pipe.hgetall(cache.make_key(presence_key(room_code, role)))
+    results = iter(pipe.execute())
+    return {
+        room_code: {
+            role: parse_presence(fields)
+            for role, fields in zip(ROLES, results) if fields
+        }
+        for room_code in room_codes
+    }
+
+
+def parse_presence(fields):
+    return {
+        'connected': fields.get(b'connected') == b'1',
+        'last_seen': datetime.fromtimestamp(float(fields[b'last_seen']), tz=dt_timezone.utc),
+    }
+
+
+def flush_presence():
+    """
+    Write the presence of every dirty room to the database (sync)
+
+    A room is taken off the dirty set before its keys are read, so a connect
+    or disconnect racing the flush just queues the room again. A player
+    whose presence key expired is written as disconnected.
+
+    Returns:
+        Number of rooms updated
+    """
+    client = get_redis()
+    dirty_key = cache.make_key(DIRTY_ROOMS_KEY)
+    updated = 0
+
+    while True:
+        room_codes = [code.decode() for code in client.spop(dirty_key, PRESENCE_FLUSH_CHUNK) or []]
+        if not room_codes:
+            return updated
+
+        rooms = list(
+            MultiplayerRoom.objects.filter(room_code__in=room_codes)
+            .only('id', 'room_code', 'host_last_seen', 'guest_last_seen')
+        )
+        presence_by_room = load_presence([room.room_code for room in rooms])
+        for room in rooms:
+            presence = presence_by_room[room.room_code]
+            for role in ROLES:
+                setattr(room, f'{role}_connected', role in presence and presence[role]['connected'])
+                if role in presence:
+                    setattr(room, f'{role}_last_seen', presence[role]['last_seen'])
+
+        MultiplayerRoom.objects.bulk_update(
+            rooms, ['host_connected', 'guest_connected', 'host_last_seen', 'guest_last_seen']
+        )
+        updated += len(rooms)
+
+
+def flush_presence_if_due():
+    """
+    Flush presence at most once per PRESENCE_FLUSH_INTERVAL across all workers
+
+    Every consumer may call this as often as it likes; only the first call
+    in each interval does any work.
+
+    Returns:
+        Number of rooms updated
+    """
+    if not get_redis().set(cache.make_key(FLUSH_DUE_KEY), 1, nx=True, ex=PRESENCE_FLUSH_INTERVAL):
+        return 0
+    try:
+        return flush_presence()
+    except Exception as e:
+        logger.exception(f'Presence flush failed: {e}')
+        return 0
@@ -0,0 +1,70 @@
+from django.core.cache import cache
+from rest_framework.renderers import BaseRenderer
+from io import BytesIO
+
+QR_CACHE_TIMEOUT = 60 * 60 * 24  # rendered images kept in Redis for a room's lifetime
+QR_MAX_AGE = 60 * 60 * 24 * 30  # browser/CDN cache lifetime; a code's image never changes
+
+
+class PNGRenderer(BaseRenderer):
+    """Passes pre-rendered PNG bytes through; enables the .png suffix"""
+    media_type = 'image/png'
+    format = 'png'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class SVGRenderer(BaseRenderer):
+    """Passes pre-rendered SVG bytes through; enables the .svg suffix"""
+    media_type = 'image/svg+xml'
+    format = 'svg'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+def qr_cache_key(room_code, image_format):
+    return f'room_qr:{room_code}:{image_format}'
+
+
+def get_cached_qr_code(room_code, image_format):
+    """Rendered QR code of a room, or None if it is not cached"""
+    return cache.get(qr_cache_key(room_code, image_format))
+
+
+def cache_qr_code(room_code, image_format, join_url):
+    """Render a room's QR code and cache it in Redis"""
+    image = render_qr_code(join_url, image_format)
+    cache.set(qr_cache_key(room_code, image_format), image, timeout=QR_CACHE_TIMEOUT)
+    return image
+
+
+def render_qr_code(data, image_format='png'):
+    """
+    Render a QR code as PNG or SVG bytes
+
+    qrcode (and Pillow, for PNG) are imported here rather than at module
+    level, so only the first render in a worker pays for loading them.
+    """
+    import qrcode
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    buffer = BytesIO()
+    if image_format == 'svg':
+        from qrcode.image.svg import SvgPathImage
+        qr.make_image(image_factory=SvgPathImage).save(buffer)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+    return buffer.getvalue()
@@ -0,0 +1,119 @@
+from django.core.cache import cache
+from .game_state_manager import get_redis, run_script
+from .models import MultiplayerRoom
+import logging
+import shortuuid
+
+logger = logging.getLogger(__name__)
+
+ROOM_CODE_LENGTH = 6
+ROOM_CODE_POOL_TARGET = 5000  # free codes the refill command tops the pool up to
+ROOM_CODE_REFILL_BATCH = 1000  # candidates checked against the database per query
+ROOM_CODE_EMERGENCY_REFILL = 100  # codes generated inline when the pool runs dry
+FREE_CODES_KEY = 'room_codes:free'
+ALLOCATED_CODES_KEY = 'room_codes:allocated'
+
+# Hand out one free code. Moving it to the allocated set in the same step
+# means a refill can never put a code back while its room is being created.
+#
+# KEYS: free codes set, allocated codes set
+# Returns: the code, or nil if the pool is empty
+ALLOCATE_CODE_SCRIPT = """
+local code = redis.call('SPOP', KEYS[1])
+if code then
+    redis.call('SADD', KEYS[2], code)
+end
+return code
+"""
+
+# Add fresh candidates to the pool, skipping any that are allocated.
+#
+# KEYS: free codes set, allocated codes set
+# ARGV: candidate codes (already checked against the database)
+# Returns: number of codes added
+ADD_CODES_SCRIPT = """
+local added = 0
+for i = 1, #ARGV do
+    if redis.call('SISMEMBER', KEYS[2], ARGV[i]) == 0 then
+        added = added + redis.call('SADD', KEYS[1], ARGV[i])
+    end
+end
+return added
+"""
+
+# Return the codes of deleted rooms to the pool.
+#
+# KEYS: free codes set, allocated codes set
+# ARGV: released codes
+RELEASE_CODES_SCRIPT = """
+for i = 1, #ARGV do
+    redis.call('SREM', KEYS[2], ARGV[i])
+    redis.call('SADD', KEYS[1], ARGV[i])
+end
+return #ARGV
+"""
+
+
+def pool_keys():
+    return [cache.make_key(FREE_CODES_KEY), cache.make_key(ALLOCATED_CODES_KEY)]
+
+
+def generate_code():
+    return shortuuid.ShortUUID().random(length=ROOM_CODE_LENGTH).upper()
+
+
+def allocate_room_code():
+    """
+    Take an unused room code from the Redis pool
+
+    A single SPOP, so allocation is O(1) and two concurrent creates can
+    never receive the same code. If the pool has run dry (the refill
+    command is not keeping up), a small batch is generated inline first.
+    """
+    client = get_redis()
+    code = run_script(client, ALLOCATE_CODE_SCRIPT, pool_keys(), [])
+    if code is None:
+        logger.warning('Room code pool is empty; refilling inline')
+        refill_room_codes(ROOM_CODE_EMERGENCY_REFILL)
+        code = run_script(client, ALLOCATE_CODE_SCRIPT, pool_keys(), [])
+    if code is None:
+        raise RuntimeError('Could not allocate a room code')
+    return code.decode()
+
+
+def refill_room_codes(target=ROOM_CODE_POOL_TARGET):
+    """
+    Top the pool up to `target` free codes (sync)
+
+    Candidates are checked against existing rooms with one query per
+    ROOM_CODE_REFILL_BATCH codes, and against allocated codes inside Redis.
+
+    Returns:
+        Number of codes added
+    """
+    client = get_redis()
+    free_key, _ = pool_keys()
+    added = 0
+
+    while True:
+        missing = target - client.scard(free_key)
+        if missing <= 0:
+            return added
+
+        candidates = {generate_code() for _ in range(min(missing, ROOM_CODE_REFILL_BATCH))}
+        candidates -= set(
+            MultiplayerRoom.objects.filter(room_code__in=candidates).values_list('room_code', flat=True)
+        )
+        if candidates:
+            added += run_script(client, ADD_CODES_SCRIPT, pool_keys(), list(candidates))
+
+
+def release_room_codes(room_codes):
+    """Recycle the codes of deleted rooms into the pool (sync)"""
+    room_codes = list(room_codes)
+    if room_codes:
+        run_script(get_redis(), RELEASE_CODES_SCRIPT, pool_keys(), room_codes)
+
+
+def room_code_pool_size():
+    return get_redis().scard(pool_keys()[0])
@@ -0,0 +1,101 @@
+from api.scoring import normalize_specialty
+from collections import namedtuple
+
+# One row of the snapshot's character table. Specialties are kept as
+# entered, for the score breakdown, and normalized once into specialty_set
+# instead of on every match check.
+SnapshotCharacter = namedtuple('SnapshotCharacter', [
+    'character_power', 'anime_power_scale', 'specialties', 'specialty_set', 'name', 'image', 'anime_name',
+])
+
+
+class RoomSnapshot:
+    """
+    Immutable template configuration and character table of one game
+
+    Built once when the host starts a game (see draw_pool.build_room_pool),
+    stored in Redis next to game_state:{code} and kept in memory by each
+    consumer's GameStateManager, so no mid-game message queries the
+    database: completion checks read the roles, scoring reads the table.
+    """
+
+    __slots__ = ('template_id', 'roles', 'specialty_match_multiplier', 'rating_bands', 'characters')
+
+    def __init__(self, template, characters, request=None):
+        """
+        Args:
+            template: GameTemplate, or None if it does not exist
+            characters: Characters of the pool, with their anime selected
+            request: Builds absolute image URLs for the score breakdown
+        """
+        self.template_id = template.id if template else None
+        self.roles = tuple(template.roles_json) if template else ()
+        self.specialty_match_multiplier = template.specialty_match_multiplier if template else None
+        self.rating_bands = template.rating_bands_json if template else {}
+        self.characters = {
+            character.id: SnapshotCharacter(
+                character_power=character.character_power,
+                anime_power_scale=character.anime.anime_power_scale if character.anime else None,
+                specialties=tuple(character.specialties or []),
+                specialty_set=frozenset(normalize_specialty(s) for s in character.specialties or []),
+                name=character.name,
+                image=request.build_absolute_uri(character.image.url) if request and character.image else None,
+                anime_name=character.anime.name if character.anime else None,
+            )
+            for character in characters
+        }
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError(f'RoomSnapshot is immutable; cannot set {name}')
+        super().__setattr__(name, value)
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+    @property
+    def has_template(self):
+        return self.template_id is not None
+
+    @property
+    def slot_keys(self):
+        """Placement keys of the template's slots, 'ROLE-index' as the draft screen sends them"""
+        return tuple(f'{role}-{index}' for index, role in enumerate(self.roles))
+
+    def is_complete(self, state):
+        """Whether both players have filled every role of the template"""
+        role_count = len(self.roles)
+        return bool(role_count) and (
+            len(state.get('host_placements', {})) == role_count and
+            len(state.get('guest_placements', {})) == role_count
+        )
+
+    def template_data(self):
+        """Template configuration in the shape api.scoring expects"""
+        return {
+            'specialty_match_multiplier': self.specialty_match_multiplier,
+            'roles_json': list(self.roles),
+        }
+
+    def characters_data(self, character_ids):
+        """The given characters in the dict shape api.scoring expects"""
+        characters_data = {}
+        for character_id in character_ids:
+            character = self.characters.get(character_id)
+            if character is None:
+                continue
+            characters_data[character_id] = {
+                'id': character_id,
+                'name': character.name,
+                'image': character.image,
+                'anime': {'name': character.anime_name} if character.anime_name else None,
+                'anime_power_scale': character.anime_power_scale,
+                'character_power': character.character_power,
+                'specialties': list(character.specialties),
+                'specialty_set': character.specialty_set,
+            }
+        return characters_data
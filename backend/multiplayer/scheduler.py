@@ -0,0 +1,172 @@
+from django.utils import timezone
+from .encoding import dumps
+import asyncio
+import logging
+import weakref
+
+logger = logging.getLogger(__name__)
+
+TICK_INTERVAL = 1  # seconds per wheel slot
+WHEEL_SLOTS = 64  # slots per revolution; longer delays wait extra rounds
+HEARTBEAT_INTERVAL = 5  # seconds between pings to each connection
+
+
+class Timer:
+    """A callback scheduled on a TimerWheel; cancel() is O(1)"""
+
+    __slots__ = ('wheel', 'slot', 'rounds', 'callback', 'args')
+
+    def __init__(self, wheel, slot, rounds, callback, args):
+        self.wheel = wheel
+        self.slot = slot
+        self.rounds = rounds
+        self.callback = callback
+        self.args = args
+
+    def cancel(self):
+        if self.wheel is not None:
+            self.wheel.slots[self.slot].pop(self, None)
+            self.wheel = None
+
+    def cancelled(self):
+        return self.wheel is None
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: one slot per tick, each a dict of pending timers
+
+    Scheduling and cancelling are O(1), and a tick only looks at one slot,
+    so thousands of grace-period timers cost one dict entry each instead of
+    one asyncio task and loop timer each. Resolution is one tick.
+    """
+
+    def __init__(self, slots=WHEEL_SLOTS):
+        self.slots = [{} for _ in range(slots)]
+        self.position = 0
+
+    def __len__(self):
+        return sum(len(slot) for slot in self.slots)
+
+    def call_later(self, ticks, callback, *args):
+        """Run callback(*args) after `ticks` ticks (at least one)"""
+        ticks = max(1, int(ticks))
+        slot = (self.position + ticks) % len(self.slots)
+        timer = Timer(self, slot, (ticks - 1) // len(self.slots), callback, args)
+        self.slots[slot][timer] = None
+        return timer
+
+    def advance(self):
+        """Move to the next slot and return the timers that are due there"""
+        self.position = (self.position + 1) % len(self.slots)
+        slot = self.slots[self.position]
+        due = []
+        for timer in list(slot):
+            if timer.rounds:
+                timer.rounds -= 1
+            else:
+                del slot[timer]
+                timer.wheel = None
+                due.append(timer)
+        return due
+
+
+class ConnectionScheduler:
+    """
+    Per-event-loop heartbeat and grace-period scheduler for GameConsumers
+
+    A single task ticks every TICK_INTERVAL seconds:
+    - Heartbeats: connections are spread over HEARTBEAT_INTERVAL buckets and
+      each tick pings one bucket with the same pre-encoded frame, so every
+      connection is pinged once per interval with one encode per tick.
+    - Timers: call_later() puts coroutine callbacks (the disconnect grace
+      period) on a TimerWheel; a task is only created when a timer fires.
+
+    The task runs only while something is registered. Use get_scheduler().
+    """
+
+    def __init__(self, tick=TICK_INTERVAL, heartbeat_interval=HEARTBEAT_INTERVAL):
+        self.tick = tick
+        self.heartbeat_buckets = [set() for _ in range(max(1, round(heartbeat_interval / tick)))]
+        self.bucket_of = {}
+        self.wheel = TimerWheel()
+        self.tick_count = 0
+        self.task = None
+
+    def register(self, consumer):
+        """Start pinging a connection (it must have an async send())"""
+        bucket = self.tick_count % len(self.heartbeat_buckets)
+        self.heartbeat_buckets[bucket].add(consumer)
+        self.bucket_of[consumer] = bucket
+        self.ensure_running()
+
+    def unregister(self, consumer):
+        bucket = self.bucket_of.pop(consumer, None)
+        if bucket is not None:
+            self.heartbeat_buckets[bucket].discard(consumer)
+
+    def call_later(self, delay, callback, *args):
+        """Run coroutine function callback(*args) after `delay` seconds (rounded up to ticks)"""
+        timer = self.wheel.call_later(-(-delay // self.tick), callback, *args)
+        self.ensure_running()
+        return timer
+
+    def ensure_running(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def idle(self):
+        return not self.bucket_of and not len(self.wheel)
+
+    async def run(self):
+        try:
+            while not self.idle():
+                await asyncio.sleep(self.tick)
+                await self.on_tick()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.task = None
+
+    async def on_tick(self):
+        self.tick_count += 1
+
+        for timer in self.wheel.advance():
+            asyncio.get_running_loop().create_task(self.fire(timer))
+
+        bucket = self.heartbeat_buckets[self.tick_count % len(self.heartbeat_buckets)]
+        if bucket:
+            frame = ping_frame()
+            results = await asyncio.gather(
+                *[consumer.send(text_data=frame) for consumer in list(bucket)],
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.debug(f'Heartbeat send failed: {result}')
+
+    async def fire(self, timer):
+        try:
+            await timer.callback(*timer.args)
+        except Exception as e:
+            logger.exception(f'Scheduled callback {timer.callback} failed: {e}')
+
+
+def ping_frame():
+    """The heartbeat message, encoded once and sent to a whole bucket"""
+    return dumps({
+        'type': 'ping',
+        'timestamp': timezone.now().isoformat(),
+    })
+
+
+_schedulers = weakref.WeakKeyDictionary()
+
+
+def get_scheduler():
+    """The ConnectionScheduler of the running event loop"""
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = _schedulers[loop] = ConnectionScheduler()
+    return scheduler
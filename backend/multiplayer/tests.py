@@ -13,15 +13,43 @@ from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth.models import User
 from channels.testing import WebsocketCommunicator
+from channels.layers import InMemoryChannelLayer
 from channels.routing import URLRouter
 from django.urls import path
 from rest_framework.test import APITestCase
 from rest_framework import status
+import asyncio
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from decimal import Decimal
 
+from io import StringIO
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import call_command
+
+from redis.exceptions import ResponseError
+
+from game.models import Anime, Character, GameTemplate
 from .models import MultiplayerRoom, GameAction
 from .consumers import GameConsumer
+from .draw_pool import RoomPool, build_room_pool
+from .encoding import dumps
+from .game_reducer import apply_action as reduce_action, fold_actions, initial_state
+from .game_state_manager import (
+    ACTION_FLUSH_SIZE, SNAPSHOT_INTERVAL, GameStateManager, flush_all_pending_actions, get_redis,
+    placement_assignments,
+)
+from .presence import (
+    DIRTY_ROOMS_KEY, FLUSH_DUE_KEY, PresenceTracker, flush_presence, flush_presence_if_due, presence_key
+)
+from .qr_codes import qr_cache_key
+from .room_codes import allocate_room_code, pool_keys, refill_room_codes, room_code_pool_size
+from .room_snapshot import RoomSnapshot
+from .scheduler import ConnectionScheduler, TimerWheel
 
 
 # =============================================================================
@@ -498,3 +526,898 @@ class IntegrationTestCase(TestCase):
         room.save()
 
         self.assertEqual(room.status, 'abandoned')
+
+
+# =============================================================================
+# Game State Tests
+# =============================================================================
+
+def fake_room_pool(character_ids, roles=()):
+    """A RoomPool of bare characters, with a snapshot of an unsaved template of `roles` (none if empty)"""
+    draw_pool = {
+        character_id: (json.dumps({'id': character_id, 'name': f'Char {character_id}'}), 'null')
+        for character_id in character_ids
+    }
+    template = GameTemplate(id=1, roles_json=list(roles)) if roles else None
+    return RoomPool(draw_pool, RoomSnapshot(template, []))
+
+
+class GameStateManagerTestCase(TestCase):
+    """Test atomic Redis game state transitions"""
+
+    ROLES = ['CAPTAIN', 'VICE CAPTAIN', 'TANK']
+
+    def setUp(self):
+        self.room = MultiplayerRoom.objects.create()
+        self.manager = GameStateManager(self.room.room_code, room_id=self.room.id)
+        async_to_sync(self.manager.initialize_game)(1, [1], fake_room_pool([10, 11, 12], self.ROLES))
+
+    def tearDown(self):
+        self.manager.delete_state(include_action_log=True)
+
+    def draw(self, character_id, player_role='host'):
+        return self.manager.apply_action(
+            'DRAW_CHARACTER', player_role, {'character': {'id': character_id, 'name': f'Char {character_id}'}}
+        )
+
+    def place(self, character_id, role_name, player_role='host'):
+        return self.manager.apply_action(
+            'PLACE_CHARACTER', player_role, {'character_id': character_id, 'role_name': role_name}
+        )
+
+    def test_initial_state(self):
+        """Initialized state has the same shape as before"""
+        state = self.manager.load_state()
+        self.assertEqual(state['template_id'], 1)
+        self.assertEqual(state['current_turn'], 'host')
+        self.assertEqual(state['remaining_character_ids'], [10, 11, 12])
+        self.assertEqual(state['drawn_characters'], [])
+        self.assertEqual(state['host_placements'], {})
+        self.assertEqual(state['sequence_number'], 0)
+
+    def test_draw_and_place(self):
+        """Draws and placements update the state and switch turns"""
+        self.assertEqual(self.draw(11), 1)
+        self.assertEqual(self.place(11, 'CAPTAIN-0'), 2)
+        self.assertEqual(self.draw(12, player_role='guest'), 3)
+        self.assertEqual(self.place(12, 'VICE CAPTAIN-1', player_role='guest'), 4)
+
+        state = self.manager.load_state()
+        self.assertEqual(state['remaining_character_ids'], [10])
+        self.assertEqual(state['drawn_characters'], [{'id': 11, 'name': 'Char 11'}, {'id': 12, 'name': 'Char 12'}])
+        self.assertEqual(state['host_drawn_ids'], [11])
+        self.assertEqual(state['guest_drawn_ids'], [12])
+        self.assertEqual(state['host_placements'], {'CAPTAIN-0': 11})
+        self.assertEqual(state['guest_placements'], {'VICE CAPTAIN-1': 12})
+        self.assertEqual(state['current_turn'], 'host')
+        self.assertEqual(state['sequence_number'], 4)
+
+    def test_invalid_placements_rejected(self):
+        """Only the player on turn can place a character they drew, once"""
+        self.draw(10)
+        self.draw(11, player_role='guest')
+
+        invalid = [
+            (12, 'host', 'Character was not drawn by this player'),
+            (11, 'host', 'Character was not drawn by this player'),
+            (11, 'guest', 'Not your turn'),
+        ]
+        for character_id, player_role, message in invalid:
+            with self.assertRaisesMessage(ResponseError, message):
+                self.place(character_id, 'CAPTAIN-0', player_role=player_role)
+
+        self.place(10, 'CAPTAIN-0')
+        self.place(11, 'CAPTAIN-0', player_role='guest')
+        with self.assertRaisesMessage(ResponseError, 'Character is already placed'):
+            self.place(10, 'TANK-2')
+
+        state = self.manager.load_state()
+        self.assertEqual(state['host_placements'], {'CAPTAIN-0': 10})
+        self.assertEqual(state['sequence_number'], 4)
+        self.assertEqual(len(self.manager.pending_log_actions()), 4)
+
+    def test_placement_slot_checked(self):
+        """A placement must name an empty slot of the template"""
+        self.draw(10)
+        self.place(10, 'CAPTAIN-0')
+        self.draw(11, player_role='guest')
+        self.place(11, 'TANK-2', player_role='guest')
+        self.draw(12)
+
+        invalid = [
+            ('BOGUS-99', 'Unknown role slot'),
+            ('CAPTAIN', 'Unknown role slot'),
+            ('TANK-0', 'Unknown role slot'),
+            ('CAPTAIN-0', 'Role slot is already filled'),
+        ]
+        for slot, message in invalid:
+            with self.assertRaisesMessage(ResponseError, message):
+                self.place(12, slot)
+
+        state = self.manager.load_state()
+        self.assertEqual(state['host_placements'], {'CAPTAIN-0': 10})
+        self.assertEqual(state['sequence_number'], 5)
+        self.place(12, 'TANK-2')
+        self.assertEqual(self.manager.load_state()['host_placements'], {'CAPTAIN-0': 10, 'TANK-2': 12})
+
+    def test_placement_needs_room_snapshot(self):
+        """Without the template's slots no placement can be validated, so none is accepted"""
+        self.draw(10)
+        cache.delete(self.manager.room_snapshot_key)
+        with self.assertRaisesMessage(ResponseError, 'Unknown role slot'):
+            GameStateManager(self.room.room_code, room_id=self.room.id).apply_action(
+                'PLACE_CHARACTER', 'host', {'character_id': 10, 'role_name': 'CAPTAIN-0'}
+            )
+
+    def test_action_without_game_fails(self):
+        """Actions on a room with no state are rejected, not half-applied"""
+        self.manager.delete_state()
+        with self.assertRaises(Exception):
+            self.draw(10)
+        self.assertEqual(self.manager.load_state(), {})
+
+    def test_add_action_persists_on_flush(self):
+        """add_action buffers the action; a flush stores it with its sequence number"""
+        self.draw(10)
+        sequence_number = async_to_sync(self.manager.add_action)(
+            'PLACE_CHARACTER', 'host', {'character_id': 10, 'role_name': 'TANK-2'}
+        )
+        self.assertFalse(GameAction.objects.filter(room=self.room).exists())
+
+        self.assertEqual(async_to_sync(self.manager.flush_actions)(), 2)
+        action = GameAction.objects.get(room=self.room, action_type='PLACE_CHARACTER')
+        self.assertEqual(sequence_number, 2)
+        self.assertEqual(action.sequence_number, 2)
+        self.assertEqual(action.action_data, {'character_id': 10, 'role_name': 'TANK-2'})
+
+    def test_flush_size_threshold(self):
+        """should_flush turns on once ACTION_FLUSH_SIZE actions are pending"""
+        for character_id in range(ACTION_FLUSH_SIZE - 1):
+            self.draw(character_id)
+        self.assertFalse(self.manager.should_flush())
+        self.draw(ACTION_FLUSH_SIZE)
+        self.assertTrue(self.manager.should_flush())
+
+        self.manager.flush_pending_actions()
+        self.assertFalse(self.manager.should_flush())
+        self.assertEqual(GameAction.objects.filter(room=self.room).count(), ACTION_FLUSH_SIZE)
+
+    def test_flush_is_idempotent_after_crash(self):
+        """Rows inserted but not trimmed before a crash are not duplicated"""
+        for character_id in range(5):
+            self.draw(character_id)
+
+        # Simulate a worker dying after bulk_create but before trimming the log
+        rows = get_redis().lrange(cache.make_key(self.manager.action_log_key), 0, 2)
+        GameAction.objects.bulk_create([self.manager._action_from_log_row(row) for row in rows])
+
+        flushed = flush_all_pending_actions()
+        self.assertEqual(flushed, 5)
+        self.assertEqual(
+            list(GameAction.objects.filter(room=self.room).values_list('sequence_number', flat=True)),
+            [1, 2, 3, 4, 5],
+        )
+        self.assertEqual(flush_all_pending_actions(), 0)
+
+    def test_flush_logs_conflicting_actions(self):
+        """A stored action that differs from the flushed one is kept and logged"""
+        GameAction.objects.create(
+            room=self.room, action_type='PLACE_CHARACTER', player_role='guest',
+            action_data={'characterId': 99}, sequence_number=1,
+        )
+        self.draw(1)
+        self.draw(2)
+
+        with self.assertLogs('multiplayer.game_state_manager', level='WARNING') as logs:
+            self.assertEqual(flush_all_pending_actions(), 2)
+        self.assertIn('Conflicting action 1', logs.output[0])
+        self.assertEqual(
+            list(GameAction.objects.filter(room=self.room).values_list('sequence_number', 'action_type')),
+            [(1, 'PLACE_CHARACTER'), (2, 'DRAW_CHARACTER')],
+        )
+
+    def test_reset_keeps_unflushed_actions(self):
+        """Resetting the game state does not drop buffered actions"""
+        self.draw(10)
+        async_to_sync(self.manager.reset)()
+
+        call_command('flush_game_actions', stdout=StringIO())
+        self.assertEqual(GameAction.objects.filter(room=self.room).count(), 1)
+
+    def test_concurrent_actions_gap_free(self):
+        """Concurrent actions never lose an update or share a sequence number"""
+        workers, actions_per_worker = 16, 25
+
+        def fire(worker):
+            sequences = []
+            for i in range(actions_per_worker):
+                character_id = worker * 1000 + i
+                sequences.append(self.draw(character_id))
+                sequences.append(self.draw(character_id + 500, player_role='guest'))
+            return sequences
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            sequences = [seq for result in executor.map(fire, range(workers)) for seq in result]
+
+        total = workers * actions_per_worker * 2
+        self.assertEqual(sorted(sequences), list(range(1, total + 1)))
+
+        state = self.manager.load_state()
+        self.assertEqual(state['sequence_number'], total)
+        self.assertEqual(len(state['drawn_characters']), total)
+        self.assertEqual(len(state['guest_drawn_ids']), total // 2)
+
+
+class ServerDrawTestCase(TestCase):
+    """Test server-authoritative draws from the room's Redis pool"""
+
+    def setUp(self):
+        # Committed writes bump the pool version, so no earlier test's cached index is reused
+        with self.captureOnCommitCallbacks(execute=True):
+            self.template = GameTemplate.objects.create(name='Standard', is_published=True)
+            self.anime = Anime.objects.create(name='Naruto', anime_power_scale=Decimal('1.00'))
+            self.characters = [
+                Character.objects.create(name=f'Char {i}', anime=self.anime, character_power=Decimal(i * 10))
+                for i in range(1, 4)
+            ]
+        self.room = MultiplayerRoom.objects.create()
+        self.manager = GameStateManager(self.room.room_code, room_id=self.room.id)
+
+    def tearDown(self):
+        self.manager.delete_state(include_action_log=True)
+
+    def start(self):
+        room_pool = build_room_pool(self.template.id, [self.anime.id])
+        async_to_sync(self.manager.initialize_game)(self.template.id, [self.anime.id], room_pool)
+
+    def draw_and_place(self, player_role, slot):
+        """Draw on the player's turn and place the character, handing the turn over"""
+        character, rating = async_to_sync(self.manager.draw_character)(player_role)
+        self.manager.apply_action(
+            'PLACE_CHARACTER', player_role, {'character_id': character['id'], 'role_name': slot}
+        )
+        return character, rating
+
+    def test_pool_is_the_characters_of_the_anime(self):
+        """The remaining set holds character IDs, not anime IDs"""
+        self.start()
+        self.assertEqual(
+            self.manager.load_state()['remaining_character_ids'],
+            sorted(character.id for character in self.characters)
+        )
+
+    def test_draw_pops_from_pool_with_rating(self):
+        """Every character is drawn exactly once, rated and logged, then the pool is empty"""
+        self.start()
+        drawn = []
+        for player_role, slot in [('host', 'CAPTAIN-0'), ('guest', 'CAPTAIN-0'), ('host', 'VICE CAPTAIN-1')]:
+            character, rating = self.draw_and_place(player_role, slot)
+            self.assertIn(rating['tier'], ['S', 'A', 'B', 'C', 'D'])
+            drawn.append(character['id'])
+
+        self.assertCountEqual(drawn, [character.id for character in self.characters])
+        state = self.manager.load_state()
+        self.assertEqual(state['remaining_character_ids'], [])
+        self.assertEqual([character['id'] for character in state['drawn_characters']], drawn)
+
+        with self.assertRaisesMessage(ResponseError, 'No characters remaining in pool'):
+            async_to_sync(self.manager.draw_character)('guest')
+
+        self.manager.flush_pending_actions()
+        self.assertEqual(
+            [
+                action.action_data['character']['id']
+                for action in GameAction.objects.filter(room=self.room, action_type='DRAW_CHARACTER')
+            ],
+            drawn
+        )
+
+    def test_draw_out_of_turn_rejected(self):
+        """The guest cannot draw on the host's turn"""
+        self.start()
+        with self.assertRaisesMessage(ResponseError, 'Not your turn'):
+            async_to_sync(self.manager.draw_character)('guest')
+        state = self.manager.load_state()
+        self.assertEqual(len(state['remaining_character_ids']), 3)
+        self.assertEqual(state['sequence_number'], 0)
+
+    def test_draw_while_holding_rejected(self):
+        """A player must place their drawn character before drawing again"""
+        self.start()
+        character, _ = async_to_sync(self.manager.draw_character)('host')
+        with self.assertRaisesMessage(ResponseError, 'Place your drawn character first'):
+            async_to_sync(self.manager.draw_character)('host')
+        self.assertEqual(len(self.manager.load_state()['remaining_character_ids']), 2)
+
+        self.manager.apply_action(
+            'PLACE_CHARACTER', 'host', {'character_id': character['id'], 'role_name': 'CAPTAIN-0'}
+        )
+        async_to_sync(self.manager.draw_character)('guest')
+
+    def test_strongest_character_rates_top_tier(self):
+        """Ratings are precomputed against the whole pool"""
+        pool = build_room_pool(self.template.id, [self.anime.id]).draw_pool
+        self.assertEqual(json.loads(pool[self.characters[-1].id][1])['tier'], 'S')
+        self.assertEqual(json.loads(pool[self.characters[0].id][0])['name'], 'Char 1')
+
+    def test_draw_without_game_fails(self):
+        with self.assertRaisesMessage(ResponseError, 'Game has not been started'):
+            async_to_sync(self.manager.draw_character)('host')
+
+    def test_replay_reloads_lost_pool(self):
+        """A rebuilt game can keep drawing"""
+        self.start()
+        self.draw_and_place('host', 'CAPTAIN-0')
+        async_to_sync(self.manager.draw_character)('guest')
+        live = self.manager.load_state()
+        self.manager.save_snapshot(live)
+        get_redis().delete(*self.manager.redis_keys())
+
+        self.assertEqual(async_to_sync(self.manager.replay_actions)(), live)
+        with self.assertRaisesMessage(ResponseError, 'Place your drawn character first'):
+            async_to_sync(self.manager.draw_character)('guest')
+        guest_character = live['drawn_characters'][-1]['id']
+        self.manager.apply_action(
+            'PLACE_CHARACTER', 'guest', {'character_id': guest_character, 'role_name': 'CAPTAIN-0'}
+        )
+        character, _ = async_to_sync(self.manager.draw_character)('host')
+        self.assertEqual([character['id']], live['remaining_character_ids'])
+
+
+class ServerScoringTestCase(TestCase):
+    """Test completion checks and end-of-game scoring from the room snapshot"""
+
+    def setUp(self):
+        self.template = GameTemplate.objects.create(
+            name='Duel', roles_json=['CAPTAIN', 'TANK'], specialty_match_multiplier=Decimal('2.00')
+        )
+        anime = Anime.objects.create(name='Naruto', anime_power_scale=Decimal('1.00'))
+        self.captain = Character.objects.create(
+            name='Captain', anime=anime, character_power=Decimal('50.00'), specialties=['CAPTAIN']
+        )
+        self.tank = Character.objects.create(
+            name='Tank', anime=anime, character_power=Decimal('40.00'), specialties=['TANK']
+        )
+        self.weak = Character.objects.create(name='Weak', anime=anime, character_power=Decimal('10.00'))
+        self.other = Character.objects.create(name='Other', anime=anime, character_power=Decimal('20.00'))
+
+        self.room = MultiplayerRoom.objects.create()
+        self.manager = GameStateManager(self.room.room_code, room_id=self.room.id)
+        room_pool = build_room_pool(self.template.id, [anime.id])
+        async_to_sync(self.manager.initialize_game)(self.template.id, [anime.id], room_pool)
+
+    def tearDown(self):
+        self.manager.delete_state(include_action_log=True)
+
+    def place(self, player_role, role_key, character):
+        self.manager.apply_action('DRAW_CHARACTER', player_role, {'character': {'id': character.id}})
+        self.manager.apply_action(
+            'PLACE_CHARACTER', player_role, {'character_id': character.id, 'role_name': role_key}
+        )
+
+    def test_placement_assignments(self):
+        """Draft screen slot keys map to role names in slot order"""
+        self.assertEqual(
+            placement_assignments({'TANK-1': 2, 'CAPTAIN-0': 1, 'VICE-CAPTAIN-2': 3}),
+            [
+                {'role': 'CAPTAIN', 'characterId': 1},
+                {'role': 'TANK', 'characterId': 2},
+                {'role': 'VICE-CAPTAIN', 'characterId': 3},
+            ]
+        )
+
+    def test_results_match_score_endpoint_without_queries(self):
+        """Same body as POST /api/score/, computed without touching the database"""
+        self.place('host', 'CAPTAIN-0', self.captain)
+        self.place('guest', 'CAPTAIN-0', self.weak)
+        self.place('host', 'TANK-1', self.tank)
+        self.place('guest', 'TANK-1', self.other)
+        state = self.manager.load_state()
+
+        with self.assertNumQueries(0):
+            results = self.manager.score_game(state)
+
+        self.assertEqual(results['winner'], 'left')
+        self.assertEqual(results['leftTeam']['total'], '180.00')
+        self.assertEqual(results['rightTeam']['total'], '30.00')
+        self.assertEqual(
+            [entry['character_name'] for entry in results['leftTeam']['breakdown']], ['Captain', 'Tank']
+        )
+        self.assertEqual(results['host_placements'], state['host_placements'])
+
+        response = self.client.post(reverse('api:calculate_score'), {
+            'templateId': self.template.id,
+            'leftTeam': {'assignments': placement_assignments(state['host_placements'])},
+            'rightTeam': {'assignments': placement_assignments(state['guest_placements'])},
+        }, content_type='application/json')
+        self.assertEqual(response.json()['leftTeam'], json.loads(dumps(results['leftTeam'])))
+        self.assertEqual(response.json()['rightTeam'], json.loads(dumps(results['rightTeam'])))
+
+    def test_no_template_no_results(self):
+        """Without a template there is nothing to score against"""
+        state = self.manager.load_state()
+        self.manager.store_room_pool(fake_room_pool([]), state['game_id'])
+        self.assertIsNone(self.manager.score_game(state))
+
+    def test_game_complete_without_queries(self):
+        """Completion is checked against the snapshot's roles, not the database"""
+        self.place('host', 'CAPTAIN-0', self.captain)
+        self.place('guest', 'CAPTAIN-0', self.weak)
+        self.place('host', 'TANK-1', self.tank)
+        with self.assertNumQueries(0):
+            self.assertFalse(async_to_sync(self.manager.is_game_complete)())
+
+        self.place('guest', 'TANK-1', self.other)
+        with self.assertNumQueries(0):
+            self.assertTrue(async_to_sync(self.manager.is_game_complete)())
+
+    def test_snapshot_held_in_memory(self):
+        """Another consumer loads the snapshot from Redis once, then keeps it"""
+        other = GameStateManager(self.room.room_code, room_id=self.room.id)
+        state = other.load_state()
+        snapshot = other.room_snapshot(state)
+        self.assertEqual(snapshot.roles, ('CAPTAIN', 'TANK'))
+        self.assertEqual(snapshot.characters[self.captain.id].specialties, ('CAPTAIN',))
+        self.assertEqual(snapshot.characters[self.captain.id].specialty_set, frozenset({'captain'}))
+
+        cache.delete(other.room_snapshot_key)
+        self.assertIs(other.room_snapshot(state), snapshot)
+
+    def test_snapshot_of_previous_game_ignored(self):
+        """A new game in the room invalidates the held snapshot"""
+        state = self.manager.load_state()
+        self.manager.room_snapshot(state)
+        async_to_sync(self.manager.initialize_game)(self.template.id, [], fake_room_pool([]))
+
+        new_state = self.manager.load_state()
+        self.assertNotEqual(new_state['game_id'], state['game_id'])
+        self.assertFalse(self.manager.room_snapshot(new_state).has_template)
+
+    def test_snapshot_immutable(self):
+        snapshot = self.manager.room_snapshot(self.manager.load_state())
+        with self.assertRaises(AttributeError):
+            snapshot.roles = ('CAPTAIN',)
+
+
+class GameReplayTestCase(TestCase):
+    """Test snapshot + tail replay and the pure reducer"""
+
+    ROLES = ['SLOT'] * 20
+
+    def setUp(self):
+        self.room = MultiplayerRoom.objects.create()
+        self.manager = GameStateManager(self.room.room_code, room_id=self.room.id)
+        async_to_sync(self.manager.initialize_game)(1, [1], fake_room_pool([10, 11, 12, 13], self.ROLES))
+
+    def tearDown(self):
+        self.manager.delete_state(include_action_log=True)
+
+    def play(self, count):
+        """Alternate draws and placements through add_action, continuing the game"""
+        state = self.manager.load_state()
+        start = len(state['drawn_characters']) + len(state['host_placements']) + len(state['guest_placements'])
+        for i in range(start, start + count):
+            player_role = 'host' if i % 4 < 2 else 'guest'
+            if i % 2 == 0:
+                action_data = {'character': {'id': 100 + i, 'name': f'Char {i}'}}
+                async_to_sync(self.manager.add_action)('DRAW_CHARACTER', player_role, action_data)
+            else:
+                action_data = {'character_id': 100 + i - 1, 'role_name': f'SLOT-{i}'}
+                async_to_sync(self.manager.add_action)('PLACE_CHARACTER', player_role, action_data)
+
+    def test_reducer_is_pure(self):
+        """apply_action returns a new state and leaves its input alone"""
+        state = initial_state(1, [1], [10, 11])
+        action = {
+            'action_type': 'DRAW_CHARACTER', 'player_role': 'host',
+            'action_data': {'character': {'id': 10}}, 'sequence_number': 1,
+        }
+        new_state = reduce_action(state, action)
+
+        self.assertEqual(state, initial_state(1, [1], [10, 11]))
+        self.assertEqual(new_state['remaining_character_ids'], [11])
+        self.assertEqual(new_state['sequence_number'], 1)
+        self.assertEqual(fold_actions(new_state, [action]), new_state)
+
+    def test_replay_matches_live_state(self):
+        """Snapshot + tail (flushed and unflushed) rebuilds the live state"""
+        self.play(SNAPSHOT_INTERVAL + 3)
+        self.manager.flush_pending_actions()
+        self.play(2)  # still only in the Redis log
+        live = self.manager.load_state()
+
+        get_redis().delete(*self.manager.redis_keys())  # lose the live state
+        restored = async_to_sync(self.manager.replay_actions)()
+
+        self.assertEqual(restored, live)
+        self.assertEqual(self.manager.load_state(), live)
+
+    def test_replay_reads_only_the_tail(self):
+        """Actions before the snapshot are never needed"""
+        self.play(SNAPSHOT_INTERVAL + 3)
+        self.manager.flush_pending_actions()
+        live = self.manager.load_state()
+
+        GameAction.objects.filter(room=self.room, sequence_number__lte=SNAPSHOT_INTERVAL).delete()
+        get_redis().delete(*self.manager.redis_keys())
+
+        self.assertEqual(async_to_sync(self.manager.replay_actions)(), live)
+
+    def test_replay_leaves_log_untouched(self):
+        """Replaying neither appends actions nor bumps the sequence"""
+        self.play(5)
+        self.manager.flush_pending_actions()
+        get_redis().delete(*self.manager.redis_keys())
+
+        async_to_sync(self.manager.replay_actions)()
+        self.manager.flush_pending_actions()
+
+        self.assertEqual(GameAction.objects.filter(room=self.room).count(), 5)
+        self.assertEqual(self.manager.load_state()['sequence_number'], 5)
+
+    def test_new_game_continues_sequence(self):
+        """A game started after a reset does not reuse logged sequence numbers"""
+        self.play(3)
+        async_to_sync(self.manager.reset)()
+        async_to_sync(self.manager.initialize_game)(1, [1], fake_room_pool([10], self.ROLES))
+        self.play(2)
+        self.manager.flush_pending_actions()
+
+        self.assertEqual(
+            list(GameAction.objects.filter(room=self.room).values_list('sequence_number', flat=True)),
+            [1, 2, 3, 4, 5],
+        )
+
+    def test_no_snapshot_no_replay(self):
+        """After a reset there is nothing to restore"""
+        self.play(3)
+        async_to_sync(self.manager.reset)()
+        self.assertEqual(async_to_sync(self.manager.replay_actions)(), {})
+
+
+class PresenceTestCase(TestCase):
+    """Test Redis presence tracking and its bulk flush"""
+
+    def setUp(self):
+        self.room = MultiplayerRoom.objects.create(host_connected=False)
+        self.presence = PresenceTracker(self.room.room_code)
+        get_redis().delete(cache.make_key(DIRTY_ROOMS_KEY), cache.make_key(FLUSH_DUE_KEY))
+
+    def tearDown(self):
+        self.presence.delete()
+        get_redis().delete(cache.make_key(FLUSH_DUE_KEY))
+
+    def test_heartbeat_makes_no_queries(self):
+        """Touching presence never reaches the database or queues a flush"""
+        self.presence.set_connected('host', True)
+        flush_presence()
+
+        with self.assertNumQueries(0):
+            for _ in range(50):
+                self.presence.touch('host')
+        with self.assertNumQueries(0):
+            self.assertEqual(flush_presence(), 0)
+
+    def test_flush_writes_connection_changes(self):
+        """Connects and disconnects reach the database in one bulk flush"""
+        other_room = MultiplayerRoom.objects.create()
+        self.presence.set_connected('host', True)
+        self.presence.set_connected('guest', True)
+        PresenceTracker(other_room.room_code).set_connected('host', False)
+
+        self.assertEqual(flush_presence(), 2)
+
+        self.room.refresh_from_db()
+        other_room.refresh_from_db()
+        self.assertTrue(self.room.host_connected)
+        self.assertTrue(self.room.guest_connected)
+        self.assertIsNotNone(self.room.guest_last_seen)
+        self.assertFalse(other_room.host_connected)
+        PresenceTracker(other_room.room_code).delete()
+
+    def test_expired_presence_flushes_as_disconnected(self):
+        """A player whose key aged out is written as disconnected"""
+        self.presence.set_connected('host', True)
+        get_redis().delete(cache.make_key(presence_key(self.room.room_code, 'host')))
+
+        self.assertNotIn('host', self.presence.load())
+        flush_presence()
+        self.room.refresh_from_db()
+        self.assertFalse(self.room.host_connected)
+
+    def test_flush_if_due_runs_once_per_interval(self):
+        """Only the first caller in an interval flushes"""
+        self.presence.set_connected('host', True)
+        self.assertEqual(flush_presence_if_due(), 1)
+
+        self.presence.set_connected('host', False)
+        self.assertEqual(flush_presence_if_due(), 0)
+        self.room.refresh_from_db()
+        self.assertTrue(self.room.host_connected)
+
+    def test_room_status_reports_live_presence(self):
+        """The status endpoint does not wait for the flush"""
+        self.presence.set_connected('guest', True)
+
+        url = reverse('api:multiplayer-room-room-status', kwargs={'room_code': self.room.room_code})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['guest_connected'])
+        self.room.refresh_from_db()
+        self.assertFalse(self.room.guest_connected)
+
+
+class ConnectionSchedulerTestCase(TestCase):
+    """Test the timer wheel and the shared heartbeat scheduler"""
+
+    def test_wheel_fires_after_delay(self):
+        """Timers fire on their tick, including delays longer than one revolution"""
+        wheel = TimerWheel(slots=4)
+        short = wheel.call_later(2, 'short')
+        long = wheel.call_later(9, 'long')
+
+        fired = {}
+        for tick in range(1, 10):
+            for timer in wheel.advance():
+                fired[timer.callback] = tick
+
+        self.assertEqual(fired, {'short': 2, 'long': 9})
+        self.assertTrue(short.cancelled() and long.cancelled())
+        self.assertEqual(len(wheel), 0)
+
+    def test_wheel_cancel(self):
+        """A cancelled timer never fires"""
+        wheel = TimerWheel(slots=4)
+        timer = wheel.call_later(1, 'cancelled')
+        timer.cancel()
+        self.assertEqual(wheel.advance(), [])
+
+    def test_heartbeat_and_grace_timer(self):
+        """Registered connections share one ping frame; timers run their coroutine"""
+        class Connection:
+            def __init__(self):
+                self.frames = []
+
+            async def send(self, text_data):
+                self.frames.append(text_data)
+
+        async def scenario():
+            scheduler = ConnectionScheduler(tick=0.01, heartbeat_interval=0.01)
+            connections = [Connection() for _ in range(3)]
+            for connection in connections:
+                scheduler.register(connection)
+
+            fired = asyncio.Event()
+
+            async def on_timeout():
+                fired.set()
+
+            scheduler.call_later(0.02, on_timeout)
+            await asyncio.wait_for(fired.wait(), timeout=1)
+
+            for connection in connections:
+                scheduler.unregister(connection)
+            await asyncio.wait_for(scheduler.task, timeout=1)  # stops once idle
+            return connections
+
+        connections = asyncio.run(scenario())
+        frame = connections[0].frames[0]
+        self.assertEqual(json.loads(frame)['type'], 'ping')
+        self.assertTrue(all(connection.frames[0] is frame for connection in connections))
+
+
+class BroadcastTestCase(TestCase):
+    """Test encode-once group broadcasts"""
+
+    def test_dumps_is_compact_and_handles_decimals(self):
+        """Both JSON backends produce the same compact frame"""
+        frame = dumps({'type': 'game_ended', 'total': Decimal('12.50'), 'ids': [1, 2]})
+        self.assertEqual(frame, '{"type":"game_ended","total":"12.50","ids":[1,2]}')
+
+    def test_dumps_matches_standard_library(self):
+        """orjson frames are byte-for-byte those of the json fallback"""
+        from django.core.serializers.json import DjangoJSONEncoder
+
+        message = {
+            'at': timezone.now(),
+            'day': timezone.now().date(),
+            'total': Decimal('1.50'),
+            'name': 'Lelouch vi Britannia ゼロ',
+            'placements': {1: 'CAPTAIN'},
+        }
+        expected = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False).encode(message)
+        self.assertEqual(dumps(message), expected)
+
+    def test_broadcast_carries_one_encoded_frame(self):
+        """Receivers forward the sender's frame, minus the excluded role"""
+        async def scenario():
+            layer = InMemoryChannelLayer()
+            sender = GameConsumer()
+            sender.channel_layer = layer
+            sender.room_group_name = 'game_TEST01'
+
+            receivers = {}
+            for role in ('host', 'guest'):
+                receiver = GameConsumer()
+                receiver.player_role = role
+                receiver.sent = []
+
+                async def send(text_data, receiver=receiver):
+                    receiver.sent.append(text_data)
+
+                receiver.send = send
+                receiver.channel_name = await layer.new_channel()
+                await layer.group_add(sender.room_group_name, receiver.channel_name)
+                receivers[role] = receiver
+
+            await sender.broadcast({'type': 'player_joined', 'player_role': 'guest'}, exclude_role='guest')
+            for receiver in receivers.values():
+                event = await layer.receive(receiver.channel_name)
+                self.assertEqual(event['type'], 'forward_frame')
+                await receiver.forward_frame(event)
+            return receivers
+
+        receivers = asyncio.run(scenario())
+        self.assertEqual(receivers['host'].sent, ['{"type":"player_joined","player_role":"guest"}'])
+        self.assertEqual(receivers['guest'].sent, [])
+
+
+class RoomCodePoolTestCase(TestCase):
+    """Test the pre-generated room code pool"""
+
+    def setUp(self):
+        get_redis().delete(*pool_keys())
+
+    def tearDown(self):
+        get_redis().delete(*pool_keys())
+
+    def test_refill_skips_codes_in_use(self):
+        """Refills never add codes of existing rooms or codes already handed out"""
+        MultiplayerRoom.objects.create(room_code='TAKEN1')
+        get_redis().sadd(pool_keys()[1], 'ALLOC1')
+
+        with patch('multiplayer.room_codes.generate_code', side_effect=['TAKEN1', 'ALLOC1', 'FRESH1']):
+            self.assertEqual(refill_room_codes(1), 1)
+
+        self.assertEqual(get_redis().smembers(pool_keys()[0]), {b'FRESH1'})
+
+    def test_allocation_without_queries(self):
+        """Creating a room pops a code from the pool instead of probing the table"""
+        refill_room_codes(10)
+
+        with self.assertNumQueries(0):
+            code = allocate_room_code()
+
+        self.assertEqual(len(code), 6)
+        self.assertTrue(code.isupper())
+        self.assertEqual(room_code_pool_size(), 9)
+        self.assertTrue(get_redis().sismember(pool_keys()[1], code))
+
+    def test_concurrent_allocations_unique(self):
+        refill_room_codes(200)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            codes = list(executor.map(lambda _: allocate_room_code(), range(200)))
+
+        self.assertEqual(len(set(codes)), 200)
+        self.assertEqual(room_code_pool_size(), 0)
+
+    def test_empty_pool_refills_inline(self):
+        room = MultiplayerRoom.objects.create()
+        self.assertEqual(len(room.room_code), 6)
+        self.assertGreater(room_code_pool_size(), 0)
+
+    def test_cleanup_recycles_codes(self):
+        """Codes of rooms deleted by cleanup_old_rooms return to the pool"""
+        room = MultiplayerRoom.objects.create()
+        MultiplayerRoom.objects.filter(id=room.id).update(created_at=timezone.now() - timedelta(hours=48))
+
+        call_command('cleanup_old_rooms', stdout=StringIO())
+
+        self.assertTrue(get_redis().sismember(pool_keys()[0], room.room_code))
+        self.assertFalse(get_redis().sismember(pool_keys()[1], room.room_code))
+
+    def test_refill_command(self):
+        out = StringIO()
+        call_command('refill_room_codes', target=25, stdout=out)
+        self.assertEqual(room_code_pool_size(), 25)
+        self.assertIn('Added 25 room codes', out.getvalue())
+
+
+class CleanupOldRoomsTestCase(TestCase):
+    """Test the chunked cleanup_old_rooms command"""
+
+    def setUp(self):
+        self.old_rooms = [MultiplayerRoom.objects.create() for _ in range(5)]
+        MultiplayerRoom.objects.filter(id__in=[room.id for room in self.old_rooms]).update(
+            created_at=timezone.now() - timedelta(hours=48)
+        )
+        self.recent_room = MultiplayerRoom.objects.create()
+
+        for room in [*self.old_rooms, self.recent_room]:
+            GameAction.objects.create(
+                room=room, action_type='DRAW_CHARACTER', player_role='host', action_data={}, sequence_number=1
+            )
+            manager = GameStateManager(room.room_code, room_id=room.id)
+            async_to_sync(manager.initialize_game)(1, [1], fake_room_pool([10], ['CAPTAIN']))
+            manager.apply_action('DRAW_CHARACTER', 'host', {'character': {'id': 10}})
+            manager.apply_action('PLACE_CHARACTER', 'host', {'character_id': 10, 'role_name': 'CAPTAIN-0'})
+            PresenceTracker(room.room_code).set_connected('host', True)
+
+    def tearDown(self):
+        GameStateManager(self.recent_room.room_code).delete_state(include_action_log=True)
+        PresenceTracker(self.recent_room.room_code).delete()
+
+    def test_deletes_old_rooms_in_chunks(self):
+        out = StringIO()
+        call_command('cleanup_old_rooms', chunk_size=2, stdout=out)
+
+        self.assertEqual(list(MultiplayerRoom.objects.all()), [self.recent_room])
+        self.assertEqual(GameAction.objects.count(), 1)
+        self.assertEqual(out.getvalue().count('so far'), 3)
+        self.assertIn('deleted 5 rooms and 5 game actions', out.getvalue())
+
+        client = get_redis()
+        for room in self.old_rooms:
+            keys = [
+                *GameStateManager(room.room_code).state_keys(include_action_log=True),
+                *PresenceTracker(room.room_code).keys(),
+            ]
+            self.assertEqual(client.exists(*keys), 0)
+            self.assertFalse(client.sismember(cache.make_key(DIRTY_ROOMS_KEY), room.room_code))
+        self.assertEqual(
+            GameStateManager(self.recent_room.room_code).load_state()['host_placements'], {'CAPTAIN-0': 10}
+        )
+
+    def test_dry_run_deletes_nothing(self):
+        out = StringIO()
+        call_command('cleanup_old_rooms', dry_run=True, stdout=out)
+
+        self.assertEqual(MultiplayerRoom.objects.count(), 6)
+        self.assertIn('Would have deleted 5 rooms', out.getvalue())
+        self.assertTrue(GameStateManager(self.old_rooms[0].room_code).load_state())
+
+
+class RoomQRCodeTestCase(APITestCase):
+    """Test the lazily rendered, cached room QR code endpoint"""
+
+    def setUp(self):
+        self.room = MultiplayerRoom.objects.create()
+        self.url = reverse('api:multiplayer-room-qr', kwargs={'room_code': self.room.room_code, 'format': 'png'})
+
+    def tearDown(self):
+        for image_format in ('png', 'svg'):
+            cache.delete(qr_cache_key(self.room.room_code, image_format))
+
+    def test_png_rendered_once_then_cached(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached.content, response.content)
+
+    def test_svg_format(self):
+        response = self.client.get(self.url.replace('.png', '.svg'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('image/svg+xml'))
+        self.assertIn(b'<svg', response.content)
+
+    def test_create_room_links_qr_code(self):
+        """create_room returns the endpoint URL instead of an inline image"""
+        response = self.client.post(reverse('api:multiplayer-room-create-room'), {
+            'template_id': 1, 'anime_pool_ids': [1],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['qr_code'].endswith(f'/rooms/{response.data["room_code"]}/qr.png'))
+
+    def test_unknown_room(self):
+        url = reverse('api:multiplayer-room-qr', kwargs={'room_code': 'NOROOM', 'format': 'png'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json(), {'error': 'Room not found'})
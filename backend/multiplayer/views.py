@@ -2,15 +2,23 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from .models import MultiplayerRoom
+from .presence import PresenceTracker
+from .qr_codes import (
+    QR_MAX_AGE,
+    PNGRenderer,
+    SVGRenderer,
+    cache_qr_code,
+    get_cached_qr_code,
+)
 from .serializers import (
     MultiplayerRoomSerializer,
     CreateRoomSerializer,
     JoinRoomSerializer
 )
-import qrcode
-from io import BytesIO
-import base64
 
 
 class MultiplayerRoomViewSet(viewsets.ModelViewSet):
@@ -45,18 +53,15 @@ class MultiplayerRoomViewSet(viewsets.ModelViewSet):
         room.host_session_id = request.session.session_key
         room.save()
 
-        # Generate join URL
-        from django.conf import settings
-        frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
-        join_url = room.get_join_url(base_url=frontend_url)
-
-        # Generate QR code
-        qr_code_data = self.generate_qr_code(join_url)
+        # The QR code is rendered on demand by the qr endpoint
+        qr_code_url = request.build_absolute_uri(reverse(
+            'api:multiplayer-room-qr', kwargs={'room_code': room.room_code, 'format': 'png'}
+        ))
 
         return Response({
             'room_code': room.room_code,
-            'join_url': join_url,
-            'qr_code': qr_code_data,
+            'join_url': self.get_join_url(room),
+            'qr_code': qr_code_url,
             'status': room.status,
         }, status=status.HTTP_201_CREATED)
 
@@ -117,23 +122,33 @@ class MultiplayerRoomViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        # Connection flags are live in Redis and only periodically flushed
+        PresenceTracker(room.room_code).apply_to(room)
         serializer = self.get_serializer(room)
         return Response(serializer.data)
 
-    def generate_qr_code(self, data):
-        """Generate QR code as base64 image"""
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        img_str = base64.b64encode(buffer.getvalue()).decode()
-
-        return f"data:image/png;base64,{img_str}"
+    @action(detail=True, methods=['get'], renderer_classes=[PNGRenderer, SVGRenderer])
+    def qr(self, request, room_code=None, format=None):
+        """
+        QR code of the room's join URL, as /rooms/{code}/qr.png or qr.svg
+
+        Rendered on first request and cached in Redis; the room is only
+        looked up on a cache miss. A code's image never changes, so it is
+        served with a long-lived public Cache-Control.
+        """
+        image_format = request.accepted_renderer.format
+        image = get_cached_qr_code(room_code, image_format)
+        if image is None:
+            room = MultiplayerRoom.objects.filter(room_code=room_code).first()
+            if room is None:
+                return JsonResponse({'error': 'Room not found'}, status=status.HTTP_404_NOT_FOUND)
+            image = cache_qr_code(room_code, image_format, self.get_join_url(room))
+
+        response = Response(image)
+        patch_cache_control(response, public=True, max_age=QR_MAX_AGE, immutable=True)
+        return response
+
+    def get_join_url(self, room):
+        from django.conf import settings
+        frontend_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:5173')
+        return room.get_join_url(base_url=frontend_url)
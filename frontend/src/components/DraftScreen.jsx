@@ -36,6 +36,9 @@ const DraftScreen = () => {
     drawnCharacter,
     drawnCharacterRating,
     isDrawing,
+    setDrawnCharacter,
+    setDrawnCharacterRating,
+    setIsDrawing,
     drawCharacter: gameDrawCharacter,
     assignCharacter: gameAssignCharacter,
     showResults,
@@ -70,17 +73,26 @@ const DraftScreen = () => {
       }
     }
 
-    // Call the original draw function
-    console.log('[DraftScreen] Drawing character...');
-    const character = await gameDrawCharacter();
-
-    // If multiplayer, broadcast the drawn character
-    if (isMultiplayer && ws && character) {
-      console.log('[DraftScreen] Broadcasting drawn character:', character.name);
-      ws.drawCharacter(character);
+    // Multiplayer: the server draws from the room's pool and broadcasts the
+    // result (see the character_drawn sync below)
+    if (isMultiplayer && ws) {
+      if (isDrawing) return;
+      setIsDrawing(true);
+      try {
+        // Wait 4 seconds for shuffle animation
+        await new Promise(resolve => setTimeout(resolve, 4000));
+        console.log('[DraftScreen] Requesting server draw...');
+        ws.drawCharacter();
+      } catch (err) {
+        console.error('[DraftScreen] Draw request failed:', err);
+        setIsDrawing(false);
+      }
+      return;
     }
 
-    return character;
+    // Call the original draw function
+    console.log('[DraftScreen] Drawing character...');
+    return gameDrawCharacter();
   };
 
   const assignCharacter = (playerNum, roleKey, character) => {
@@ -143,6 +155,25 @@ const DraftScreen = () => {
     }
   }, [isMultiplayer, opponentConnected, opponentWasConnected, disconnectCountdown, showResults]);
 
+  // Multiplayer: Show the character drawn by the server
+  useEffect(() => {
+    if (!isMultiplayer || !mpGameState?.drawn_character) return;
+
+    console.log('[DraftScreen] Server drew character:', mpGameState.drawn_character.name);
+    setDrawnCharacter(mpGameState.drawn_character);
+    setDrawnCharacterRating(mpGameState.drawn_rating);
+    setIsDrawing(false);
+  }, [isMultiplayer, mpGameState?.drawn_character, mpGameState?.drawn_rating, setDrawnCharacter, setDrawnCharacterRating, setIsDrawing]);
+
+  // Multiplayer: A rejected request (e.g. an empty pool) ends the draw too,
+  // so the Draw button is enabled again
+  useEffect(() => {
+    if (!isMultiplayer || !mpGameState?.last_error) return;
+
+    console.log('[DraftScreen] Server error:', mpGameState.last_error.message);
+    setIsDrawing(false);
+  }, [isMultiplayer, mpGameState?.last_error, setIsDrawing]);
+
   // Multiplayer: Sync WebSocket events to GameContext
   useEffect(() => {
     if (!isMultiplayer || !mpGameState) return;
@@ -252,7 +252,7 @@ const ResultScreen = () => {
     playDefeatSound,
   } = useGame();
 
-  const { isMultiplayerGame, disconnect, playerRole } = useMultiplayer();
+  const { isMultiplayerGame, disconnect, playerRole, gameState: mpGameState } = useMultiplayer();
 
   const [scoreData, setScoreData] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -292,7 +292,9 @@ const ResultScreen = () => {
         setLoading(true);
         setError(null);
 
-        const result = await calculateFinalScore();
+        // Multiplayer results are scored by the server and arrive with game_ended
+        const serverResults = isMultiplayerGame ? mpGameState?.results : null;
+        const result = serverResults?.leftTeam ? serverResults : await calculateFinalScore();
         setScoreData(result);
 
         // Play victory/defeat sounds
@@ -316,7 +318,7 @@ const ResultScreen = () => {
     };
 
     fetchScore();
-  }, [calculateFinalScore, playVictorySound, playDefeatSound]);
+  }, [calculateFinalScore, playVictorySound, playDefeatSound, isMultiplayerGame, mpGameState?.results]);
 
   if (loading) {
     return (
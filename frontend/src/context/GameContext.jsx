@@ -226,6 +226,8 @@ export const GameProvider = ({ children }) => {
 
       const response = await axios.post(`${API_BASE_URL}/draw/`, {
         remainingCharacterIds: remainingCharacterIds,
+        templateId: selectedTemplate?.id,
+        animeIds: selectedAnimeIds,
       });
 
       const character = response.data.character;
@@ -241,7 +243,8 @@ export const GameProvider = ({ children }) => {
         drawScore: (parseFloat(character.character_power) || 0) * (parseFloat(character.anime_power_scale) || 0)
       });
 
-      const rating = calculateRating(character);
+      // Prefer the server-side rating (ranked against the cached pool distribution)
+      const rating = response.data.rating || calculateRating(character);
 
       setDrawnCharacter(character);
       setDrawnCharacterRating(rating);
@@ -101,6 +101,7 @@ export const MultiplayerProvider = ({ children }) => {
         setGameState((prev) => ({
           ...prev,
           drawn_character: data.character,
+          drawn_rating: data.rating,
           current_turn: data.player_role === 'host' ? 'guest' : 'host',
         }));
         break;
@@ -136,6 +137,11 @@ export const MultiplayerProvider = ({ children }) => {
 
       case 'error':
         console.error('[Multiplayer] Error:', data.message);
+        // A new object per error, so screens waiting on a request can react
+        setGameState((prev) => ({
+          ...prev,
+          last_error: { message: data.message },
+        }));
         break;
 
       default:
@@ -8,17 +8,22 @@ const LibraryPage = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [sortBy, setSortBy] = useState('newest');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadAnime();
   }, [sortBy]);
 
+  // First page only; loadMore fetches the next one when the user asks for it
   const loadAnime = async () => {
     setLoading(true);
     setError(null);
+    setNextCursor(null);
     try {
       const response = await api.getLibraryAnime(sortBy);
-      setAnimeList(response.data);
+      setAnimeList(response.data.results);
+      setNextCursor(response.data.next_cursor);
     } catch (err) {
       console.error('Error loading library anime:', err);
       setError('Failed to load anime library. Please try again.');
@@ -27,6 +32,20 @@ const LibraryPage = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await api.getLibraryAnime(sortBy, nextCursor);
+      setAnimeList((current) => [...current, ...response.data.results]);
+      setNextCursor(response.data.next_cursor);
+    } catch (err) {
+      console.error('Error loading more library anime:', err);
+      setError('Failed to load more anime. Please try again.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const sortOptions = [
     { value: 'newest', label: 'Newest First' },
     { value: 'highest_rated', label: 'Highest Rated' },
@@ -67,7 +86,7 @@ const LibraryPage = () => {
           </div>
 
           <div className="text-sm text-neutral-600">
-            {animeList.length} {animeList.length === 1 ? 'anime' : 'anime'} found
+            {animeList.length}{nextCursor ? '+' : ''} {animeList.length === 1 ? 'anime' : 'anime'} found
           </div>
         </div>
 
@@ -111,12 +130,26 @@ const LibraryPage = () => {
             </p>
           </div>
         ) : (
-          /* Anime Grid */
-          <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
-            {animeList.map((anime) => (
-              <LibraryAnimeCard key={anime.id} anime={anime} />
-            ))}
-          </div>
+          <>
+            {/* Anime Grid */}
+            <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6">
+              {animeList.map((anime) => (
+                <LibraryAnimeCard key={anime.id} anime={anime} />
+              ))}
+            </div>
+
+            {nextCursor && (
+              <div className="mt-8 flex justify-center">
+                <button
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                  className="px-6 py-2 bg-white border border-neutral-300 rounded-md text-sm font-medium text-neutral-700 hover:bg-neutral-50 disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
+          </>
         )}
       </div>
     </div>
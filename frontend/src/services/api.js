@@ -74,6 +74,9 @@ apiClient.interceptors.response.use(
   }
 );
 
+// Page size of paginated list requests (the API sends a full list without limit)
+const LIST_PAGE_SIZE = 20;
+
 // API endpoints
 export const api = {
   // Templates
@@ -89,10 +92,12 @@ export const api = {
   },
 
   // Draw
-  drawCharacter: (remainingCharacterIds, seed = null) => {
+  drawCharacter: (remainingCharacterIds, seed = null, templateId = null, animeIds = null) => {
     return apiClient.post('/api/draw/', {
       remainingCharacterIds,
       seed,
+      templateId,
+      ...(animeIds?.length ? { animeIds } : {}),
     });
   },
 
@@ -125,7 +130,9 @@ export const api = {
   deleteCharacter: (animeId, charId) => apiClient.delete(`/api/my/anime/${animeId}/characters/${charId}/`),
 
   // Public Library
-  getLibraryAnime: (sortBy = 'newest') => apiClient.get(`/api/library/anime/?sort=${sortBy}`),
+  getLibraryAnime: (sortBy = 'newest', cursor = null) => apiClient.get('/api/library/anime/', {
+    params: { sort: sortBy, limit: LIST_PAGE_SIZE, ...(cursor ? { cursor } : {}) },
+  }),
   getLibraryAnimeDetail: (id) => apiClient.get(`/api/library/anime/${id}/`),
   rateAnime: (id, rating) => apiClient.post(`/api/library/anime/${id}/rate/`, { rating }),
   getMyAnimeRating: (id) => apiClient.get(`/api/library/anime/${id}/my-rating/`),
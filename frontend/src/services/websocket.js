@@ -214,10 +214,10 @@ class GameWebSocket {
     });
   }
 
-  drawCharacter(characterData) {
+  drawCharacter() {
+    // The server draws from the room's pool and broadcasts character_drawn
     this.send({
       type: 'draw_character',
-      character: characterData,
     });
   }
 